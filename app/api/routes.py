@@ -1,22 +1,39 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, UploadFile, File, Header
+from fastapi.responses import JSONResponse, StreamingResponse
+import os
+import json
+import time
+import hashlib
 import logging
-from typing import List
-from app.models import PQRSRequest, PQRSResponse, ChatMessage, DocumentoBase, CategoriaPQRS
+import tempfile
+from typing import List, Dict, Any, AsyncIterator, Tuple, Optional
+from app.config import settings
+from app.models import PQRSRequest, PQRSResponse, PQRSBatchRequest, PQRSBatchResponse, ChatMessage, DocumentoBase, CategoriaPQRS
 from app.services.llm_service import llm_service
 from app.services.vector_store import vector_store
+from app.services.executor import run_blocking
+from app.services.document_extraction import SUPPORTED_EXTENSIONS
+from app.services.ingestion_jobs import ingestion_jobs
+from app.services.metrics import collect_stages
+from app.services.deadline import deadline_scope
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Tamaño de bloque al copiar las subidas al archivo temporal
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 @router.post("/pqrs/submit", response_model=PQRSResponse)
-async def submit_pqrs(pqrs: PQRSRequest):
+async def submit_pqrs(pqrs: PQRSRequest, detalle_etapas: bool = False, x_request_timeout: Optional[float] = Header(None)):
     """Procesa una nueva PQRS y genera respuesta automática"""
     try:
         logger.info(f"Procesando nueva PQRS: {pqrs.titulo}")
         
-        # Generar respuesta usando RAG
-        response = llm_service.generate_pqrs_response(pqrs)
+        # Generar respuesta usando RAG dentro del plazo de la solicitud
+        with collect_stages() as etapas, deadline_scope(_request_deadline(x_request_timeout)):
+            response = await llm_service.generate_pqrs_response(pqrs)
+        if detalle_etapas:
+            response.etapas = {etapa: round(segundos * 1000, 2) for etapa, segundos in etapas.items()}
         
         logger.info(f"PQRS procesada exitosamente: {response.pqrs_id}")
         return response
@@ -25,17 +42,109 @@ async def submit_pqrs(pqrs: PQRSRequest):
         logger.error(f"Error procesando PQRS: {e}")
         raise HTTPException(status_code=500, detail="Error interno procesando la PQRS")
 
+@router.post("/pqrs/submit/stream")
+async def submit_pqrs_stream(pqrs: PQRSRequest, detalle_etapas: bool = False, x_request_timeout: Optional[float] = Header(None)):
+    """Procesa una nueva PQRS enviando la respuesta como Server-Sent Events"""
+    logger.info(f"Procesando nueva PQRS en streaming: {pqrs.titulo}")
+    plazo = _request_deadline(x_request_timeout)
+    
+    async def eventos() -> AsyncIterator[Dict[str, Any]]:
+        # El cuerpo del generador corre después de devolver la respuesta: el plazo se activa aquí dentro
+        with collect_stages() as etapas, deadline_scope(plazo):
+            async for evento in llm_service.stream_pqrs_response(pqrs):
+                if evento["event"] == "final" and detalle_etapas:
+                    evento["data"]["etapas"] = {etapa: round(segundos * 1000, 2) for etapa, segundos in etapas.items()}
+                yield evento
+    
+    return _sse_response(eventos())
+
+@router.post("/pqrs/submit/batch", response_model=PQRSBatchResponse)
+async def submit_pqrs_batch(lote: PQRSBatchRequest, stream: bool = False, x_request_timeout: Optional[float] = Header(None)):
+    """Procesa un lote de PQRS; con stream=true emite cada resultado como NDJSON al terminar"""
+    if len(lote.solicitudes) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El lote supera el máximo de {settings.batch_max_items} PQRS"
+        )
+    
+    logger.info(f"Procesando lote de {len(lote.solicitudes)} PQRS")
+    plazo = _request_deadline(x_request_timeout)
+    
+    async def resultados() -> AsyncIterator[Any]:
+        # Todo el lote comparte el plazo de la solicitud; cada PQRS registra sus degradaciones aparte
+        with deadline_scope(plazo):
+            async for item in llm_service.generate_pqrs_batch(lote.solicitudes):
+                yield item
+    
+    if stream:
+        return StreamingResponse(
+            _ndjson_lines(resultados()),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    inicio = time.time()
+    items = sorted([item async for item in resultados()], key=lambda item: item.indice)
+    exitosos = sum(1 for item in items if item.success)
+    return PQRSBatchResponse(
+        resultados=items,
+        total=len(items),
+        exitosos=exitosos,
+        fallidos=len(items) - exitosos,
+        tiempo_total=time.time() - inicio
+    )
+
+async def _ndjson_lines(items: AsyncIterator[Any]) -> AsyncIterator[str]:
+    """Serializa cada resultado como una línea JSON"""
+    async for item in items:
+        yield json.dumps(item.dict(), ensure_ascii=False, default=str) + "\n"
+
 @router.post("/chat")
-async def chat_with_assistant(message: ChatMessage):
+async def chat_with_assistant(message: ChatMessage, x_request_timeout: Optional[float] = Header(None)):
     """Chat interactivo con el asistente de infraestructura"""
     try:
-        response = llm_service.chat_response(message.mensaje, message.contexto)
-        return {"respuesta": response}
+        with deadline_scope(_request_deadline(x_request_timeout)) as deadline:
+            response = await llm_service.chat_response(message.mensaje, message.contexto)
+        return {"respuesta": response, "degradaciones": deadline.degradaciones}
         
     except Exception as e:
         logger.error(f"Error en chat: {e}")
         raise HTTPException(status_code=500, detail="Error en el chat")
 
+@router.post("/chat/stream")
+async def chat_with_assistant_stream(message: ChatMessage, x_request_timeout: Optional[float] = Header(None)):
+    """Chat interactivo enviando los tokens como Server-Sent Events"""
+    plazo = _request_deadline(x_request_timeout)
+    
+    async def eventos() -> AsyncIterator[Dict[str, Any]]:
+        # El cuerpo del generador corre después de devolver la respuesta: el plazo se activa aquí dentro
+        with deadline_scope(plazo) as deadline:
+            async for evento in llm_service.stream_chat_response(message.mensaje, message.contexto):
+                if evento["event"] == "final":
+                    evento["data"]["degradaciones"] = list(deadline.degradaciones)
+                yield evento
+    
+    return _sse_response(eventos())
+
+def _request_deadline(x_request_timeout: Optional[float]) -> Optional[float]:
+    """Plazo en segundos: el del encabezado X-Request-Timeout o, si no viene, el configurado"""
+    if x_request_timeout is not None and x_request_timeout > 0:
+        return x_request_timeout
+    return settings.request_deadline or None
+
+def _sse_response(eventos: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """Convierte un flujo de eventos del servicio LLM en una respuesta SSE"""
+    async def event_stream():
+        async for evento in eventos:
+            data = json.dumps(evento["data"], ensure_ascii=False)
+            yield f"event: {evento['event']}\ndata: {data}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/documents/upload")
 async def upload_document(
     file: UploadFile = File(...),
@@ -43,59 +152,122 @@ async def upload_document(
     categoria: CategoriaPQRS = CategoriaPQRS.OTROS
 ):
     """Sube un nuevo documento a la base de conocimiento"""
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato no soportado. Use: {', '.join(sorted(SUPPORTED_EXTENSIONS))}"
+        )
+    
+    spool_path = None
     try:
-        # Leer contenido del archivo
-        content = await file.read()
+        # Guardar la subida por bloques en el directorio de trabajos, sin tenerla completa en memoria
+        spool_path, size, content_hash = await _spool_upload(file, extension, ingestion_jobs.uploads_dir)
         
-        # Procesar según tipo de archivo
-        if file.filename.endswith('.txt'):
-            contenido = content.decode('utf-8')
-        else:
-            # Para otros tipos, usar el nombre del archivo como indicador
-            contenido = f"Archivo: {file.filename}\nTipo: {file.content_type}\nTamaño: {len(content)} bytes"
-        
-        # Crear documento
-        documento = DocumentoBase(
+        # Encolar la extracción e indexación; el cliente consulta el progreso con el job_id
+        job = await ingestion_jobs.submit(
+            path=spool_path,
+            size=size,
+            content_hash=content_hash,
             titulo=titulo or file.filename,
-            contenido=contenido,
             categoria=categoria,
-            metadatos={
-                "filename": file.filename,
-                "content_type": file.content_type,
-                "size": len(content)
-            }
+            filename=file.filename,
+            content_type=file.content_type,
+            extension=extension
         )
         
-        # Añadir a la base vectorial
-        success = vector_store.add_document(documento)
-        
-        if success:
-            return {"mensaje": "Documento subido exitosamente", "titulo": documento.titulo}
-        else:
-            raise HTTPException(status_code=500, detail="Error añadiendo documento")
+        return JSONResponse(status_code=202, content={
+            "mensaje": "Documento recibido; procesando en segundo plano",
+            "job_id": job["job_id"],
+            "titulo": job["titulo"],
+            "estado": job["estado"]
+        })
             
     except Exception as e:
         logger.error(f"Error subiendo documento: {e}")
+        if spool_path:
+            _remove_file(spool_path)
         raise HTTPException(status_code=500, detail="Error subiendo documento")
 
+@router.get("/documents/jobs")
+async def list_ingestion_jobs(limit: int = 20):
+    """Lista los trabajos de ingesta más recientes"""
+    return {"trabajos": await ingestion_jobs.list(limit=limit), **ingestion_jobs.get_stats()}
+
+@router.get("/documents/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Consulta la etapa, los chunks procesados y el rendimiento de un trabajo de ingesta"""
+    job = await ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo de ingesta no encontrado")
+    return job
+
+async def _spool_upload(file: UploadFile, extension: str, spool_dir: str) -> Tuple[str, int, str]:
+    """Copia la subida a un archivo en spool_dir por bloques; devuelve (ruta, tamaño, hash)"""
+    os.makedirs(spool_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=extension, dir=spool_dir)
+    
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while True:
+                bloque = await file.read(UPLOAD_CHUNK_SIZE)
+                if not bloque:
+                    break
+                sha.update(bloque)
+                size += len(bloque)
+                await run_blocking(spool.write, bloque)
+    except Exception:
+        _remove_file(path)
+        raise
+    return path, size, sha.hexdigest()[:32]
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"No se pudo eliminar el archivo temporal {path}: {e}")
+
 @router.get("/documents/stats")
-async def get_documents_stats():
-    """Obtiene estadísticas de los documentos en la base de conocimiento"""
+async def get_documents_stats(detalle: bool = False):
+    """Obtiene estadísticas de los documentos en la base de conocimiento (con detalle=true, también por documento)"""
     try:
         stats = vector_store.get_collection_stats()
+        if detalle:
+            stats["documentos"] = vector_store.kb_stats.get_documents()
         return stats
     except Exception as e:
         logger.error(f"Error obteniendo estadísticas: {e}")
         raise HTTPException(status_code=500, detail="Error obteniendo estadísticas")
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Obtiene métricas de las cachés del sistema"""
+    return {
+        "embeddings": vector_store.embedding_cache.get_stats(),
+        "respuestas": llm_service.response_cache.get_stats()
+    }
+
+@router.get("/embeddings/stats")
+async def get_embeddings_stats():
+    """Obtiene estadísticas del micro-batching de embeddings de consultas"""
+    return vector_store.embedding_batcher.get_stats()
+
+@router.get("/llm/stats")
+async def get_llm_stats():
+    """Obtiene el estado del circuito y los reintentos y hedges de las llamadas al LLM"""
+    return llm_service.llm.get_stats()
+
 @router.post("/documents/search")
-async def search_documents(query: str, categoria: CategoriaPQRS = None, limit: int = 5):
-    """Busca documentos similares en la base de conocimiento"""
+async def search_documents(query: str, categoria: CategoriaPQRS = None, limit: int = 5, hibrido: bool = None):
+    """Busca documentos similares en la base de conocimiento (híbrida léxica + vectorial por defecto)"""
     try:
-        results = vector_store.search_similar(
+        results = await vector_store.search_similar_async(
             query=query,
             n_results=limit,
-            categoria=categoria
+            categoria=categoria,
+            hibrido=hibrido
         )
         
         return {
@@ -108,20 +280,62 @@ async def search_documents(query: str, categoria: CategoriaPQRS = None, limit: i
         logger.error(f"Error buscando documentos: {e}")
         raise HTTPException(status_code=500, detail="Error en búsqueda")
 
-@router.delete("/documents/clear")
-async def clear_documents():
-    """Limpia todos los documentos de la base de conocimiento"""
+@router.delete("/documents")
+async def clear_documents(categoria: CategoriaPQRS = None, titulo: str = None, filtro: str = None, confirmar: bool = False):
+    """Limpia la base de conocimiento filtrada por categoría, título o metadatos (JSON); sin filtro, completa con confirmar=true"""
+    where = None
+    if filtro:
+        try:
+            where = json.loads(filtro)
+        except json.JSONDecodeError:
+            where = None
+        # Cualquier otro valor JSON (lista, texto, número) no es un filtro de metadatos
+        if not isinstance(where, dict) or not where:
+            raise HTTPException(status_code=400, detail="El filtro debe ser un objeto JSON válido")
+    
+    if not (categoria or titulo or where or confirmar):
+        raise HTTPException(
+            status_code=400,
+            detail="Indique un filtro (categoria, titulo o filtro) o confirmar=true para limpiar toda la base"
+        )
+    
     try:
-        success = vector_store.clear_collection()
-        if success:
-            return {"mensaje": "Base de conocimiento limpiada exitosamente"}
+        if categoria or titulo or where:
+            resultado = await run_blocking(vector_store.delete_documents, titulo=titulo, categoria=categoria, where=where)
+        else:
+            resultado = await run_blocking(vector_store.clear_collection)
+        
+        if resultado["success"]:
+            return {
+                "mensaje": "Base de conocimiento limpiada exitosamente",
+                "eliminados": resultado["eliminados"],
+                "tiempo": resultado["tiempo"]
+            }
         else:
             raise HTTPException(status_code=500, detail="Error limpiando documentos")
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error limpiando documentos: {e}")
         raise HTTPException(status_code=500, detail="Error limpiando documentos")
 
+@router.delete("/documents/{titulo:path}")
+async def delete_document(titulo: str):
+    """Elimina un documento de la base de conocimiento por su título (puede contener "/")"""
+    resultado = await run_blocking(vector_store.delete_documents, titulo=titulo)
+    
+    if not resultado["success"]:
+        raise HTTPException(status_code=500, detail="Error eliminando documento")
+    if resultado["eliminados"] == 0:
+        raise HTTPException(status_code=404, detail=f"Documento '{titulo}' no encontrado")
+    
+    return {
+        "mensaje": f"Documento '{titulo}' eliminado exitosamente",
+        "eliminados": resultado["eliminados"],
+        "tiempo": resultado["tiempo"]
+    }
+
 @router.get("/categories")
 async def get_categories():
     """Obtiene las categorías disponibles para PQRS"""
@@ -154,8 +368,11 @@ def _get_category_description(categoria: CategoriaPQRS) -> str:
 async def health_check():
     """Endpoint de verificación de salud del sistema"""
     try:
-        # Verificar base vectorial
-        stats = vector_store.get_collection_stats()
+        # Verificar base vectorial sin forzar su carga durante el arranque
+        if vector_store.initialized:
+            stats = vector_store.get_collection_stats()
+        else:
+            stats = {"status": "inicializando"}
         
         return {
             "status": "ok",
@@ -167,4 +384,18 @@ async def health_check():
         return {
             "status": "error",
             "mensaje": "Error en verificación de salud"
-        }
\ No newline at end of file
+        }
+
+@router.get("/ready")
+async def readiness_check():
+    """Indica si los servicios están cargados y calentados para atender tráfico"""
+    if not vector_store.ready:
+        return JSONResponse(status_code=503, content={
+            "status": "iniciando",
+            "tiempos_inicio": vector_store.startup_timings
+        })
+    
+    return {
+        "status": "ready",
+        "tiempos_inicio": vector_store.startup_timings
+    }
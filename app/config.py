@@ -7,9 +7,90 @@ load_dotenv()
 class Settings(BaseSettings):
     # OpenAI Configuration
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_base_url: str = os.getenv("OPENAI_BASE_URL", "")
+    
+    # LLM Client Configuration
+    llm_timeout: float = float(os.getenv("LLM_TIMEOUT", "30"))
+    llm_connect_timeout: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+    llm_max_keepalive: int = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+    llm_keepalive_expiry: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    llm_retry_base_delay: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    llm_retry_max_delay: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+    llm_hedge_enabled: bool = os.getenv("LLM_HEDGE_ENABLED", "False").lower() == "true"
+    llm_hedge_percentile: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    llm_hedge_min_delay: float = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+    llm_hedge_min_samples: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    llm_breaker_failures: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    llm_breaker_cooldown: float = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+    llm_first_token_seconds: float = float(os.getenv("LLM_FIRST_TOKEN_SECONDS", "1.0"))
+    llm_tokens_per_second: float = float(os.getenv("LLM_TOKENS_PER_SECOND", "40"))
     
     # Database Configuration
     chroma_db_path: str = os.getenv("CHROMA_DB_PATH", "./data/vectordb")
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "chroma")
+    vector_partitioned: bool = os.getenv("VECTOR_PARTITIONED", "False").lower() == "true"
+    numpy_index_dtype: str = os.getenv("NUMPY_INDEX_DTYPE", "float32")
+    numpy_index_compact_ratio: float = float(os.getenv("NUMPY_INDEX_COMPACT_RATIO", "0.3"))
+    
+    # Ingestion Configuration
+    embedding_batch_size: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "1024"))
+    extraction_workers: int = int(os.getenv("EXTRACTION_WORKERS", "2"))
+    extraction_pages_per_task: int = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "10"))
+    extraction_block_chars: int = int(os.getenv("EXTRACTION_BLOCK_CHARS", "20000"))
+    extraction_docx_elements_per_task: int = int(os.getenv("EXTRACTION_DOCX_ELEMENTS_PER_TASK", "2000"))
+    ingestion_jobs_dir: str = os.getenv("INGESTION_JOBS_DIR", "./data/ingestion_jobs")
+    kb_stats_save_interval: float = float(os.getenv("KB_STATS_SAVE_INTERVAL", "30"))
+    ingestion_workers: int = int(os.getenv("INGESTION_WORKERS", "1"))
+    
+    # Embeddings Configuration
+    embedding_model: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "sentence_transformers")
+    embedding_onnx_path: str = os.getenv("EMBEDDING_ONNX_PATH", "./data/models/all-MiniLM-L6-v2-onnx-int8")
+    embedding_onnx_threads: int = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+    embedding_cache_size: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+    embedding_cache_ttl: float = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+    embedding_cache_persist: bool = os.getenv("EMBEDDING_CACHE_PERSIST", "True").lower() == "true"
+    embedding_cache_disk_max_rows: int = int(os.getenv("EMBEDDING_CACHE_DISK_MAX_ROWS", "200000"))
+    embedding_microbatch_enabled: bool = os.getenv("EMBEDDING_MICROBATCH_ENABLED", "True").lower() == "true"
+    embedding_microbatch_size: int = int(os.getenv("EMBEDDING_MICROBATCH_SIZE", "32"))
+    embedding_microbatch_wait_ms: float = float(os.getenv("EMBEDDING_MICROBATCH_WAIT_MS", "2"))
+    
+    # Response Cache Configuration
+    response_cache_enabled: bool = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+    response_cache_threshold: float = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+    response_cache_size: int = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+    response_cache_ttl: float = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    
+    # Retrieval Configuration
+    speculative_retrieval: bool = os.getenv("SPECULATIVE_RETRIEVAL", "True").lower() == "true"
+    speculative_overfetch: int = int(os.getenv("SPECULATIVE_OVERFETCH", "4"))
+    hybrid_search: bool = os.getenv("HYBRID_SEARCH", "True").lower() == "true"
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "3"))
+    hybrid_rrf_k: int = int(os.getenv("HYBRID_RRF_K", "60"))
+    lexical_index_save_interval: float = float(os.getenv("LEXICAL_INDEX_SAVE_INTERVAL", "60"))
+    
+    # Prompt Configuration
+    pqrs_prompt_max_tokens: int = int(os.getenv("PQRS_PROMPT_MAX_TOKENS", "1800"))
+    chat_prompt_max_tokens: int = int(os.getenv("CHAT_PROMPT_MAX_TOKENS", "1000"))
+    
+    # Batch Configuration
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+    batch_generation_concurrency: int = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "8"))
+    
+    # Deadline Configuration
+    request_deadline: float = float(os.getenv("REQUEST_DEADLINE", "30"))
+    deadline_classify_min_seconds: float = float(os.getenv("DEADLINE_CLASSIFY_MIN_SECONDS", "8"))
+    deadline_retrieval_min_seconds: float = float(os.getenv("DEADLINE_RETRIEVAL_MIN_SECONDS", "5"))
+    deadline_reduced_results: int = int(os.getenv("DEADLINE_REDUCED_RESULTS", "2"))
+    deadline_min_generation_tokens: int = int(os.getenv("DEADLINE_MIN_GENERATION_TOKENS", "150"))
+    deadline_safety_seconds: float = float(os.getenv("DEADLINE_SAFETY_SECONDS", "0.5"))
+    
+    # Classification Configuration
+    local_classifier_enabled: bool = os.getenv("LOCAL_CLASSIFIER_ENABLED", "True").lower() == "true"
+    local_classifier_min_margin: float = float(os.getenv("LOCAL_CLASSIFIER_MIN_MARGIN", "0.05"))
     
     # Application Configuration
     app_name: str = os.getenv("APP_NAME", "RAG PQRS Secretaría de Infraestructura")
@@ -20,6 +101,9 @@ class Settings(BaseSettings):
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
     
+    # Concurrency Configuration
+    blocking_workers: int = int(os.getenv("BLOCKING_WORKERS", "4"))
+    
     # Logging
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
     
@@ -1,13 +1,21 @@
+import time
+import asyncio
 import logging
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.api.routes import router
+from app.services.executor import blocking_executor, ingestion_executor, run_blocking
+from app.services.vector_store import vector_store
+from app.services.llm_service import llm_service
+from app.services.document_extraction import shutdown_process_pool
+from app.services.ingestion_jobs import ingestion_jobs
+from app.services.metrics import metrics, http_request_seconds
 
 # Configurar logging
 logging.basicConfig(
@@ -42,6 +50,26 @@ app.include_router(router, prefix="/api/v1", tags=["PQRS RAG API"])
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    """Registra la duración de cada petición por plantilla de ruta (no por URL, para acotar las series)"""
+    inicio = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    if route is not None and not request.url.path.startswith("/static"):
+        http_request_seconds.observe(
+            time.perf_counter() - inicio,
+            metodo=request.method,
+            ruta=getattr(route, "path", request.url.path),
+            estado=str(response.status_code)
+        )
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """Página principal del sistema"""
@@ -63,12 +91,35 @@ async def admin(request: Request):
 async def startup_event():
     """Eventos de inicio de la aplicación"""
     logger.info(f"Iniciando {settings.app_name} v{settings.app_version}")
-    logger.info("Sistema RAG PQRS listo para recibir solicitudes")
+    # Cargar servicios en segundo plano para que el servidor acepte conexiones de inmediato
+    app.state.warmup_task = asyncio.create_task(warm_up_services())
+    # Arrancar los workers de ingesta y reanudar los trabajos pendientes
+    await ingestion_jobs.start()
+
+async def warm_up_services():
+    """Inicializa y calienta los servicios pesados; /ready responde 200 al terminar"""
+    inicio = time.perf_counter()
+    try:
+        await run_blocking(vector_store.initialize)
+        await run_blocking(vector_store.warm_up)
+        await run_blocking(llm_service.context_packer.warm_up)
+        logger.info(f"Sistema RAG PQRS listo para recibir solicitudes ({time.perf_counter() - inicio:.2f}s)")
+    except Exception as e:
+        logger.error(f"Error durante el arranque de servicios: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Eventos de cierre de la aplicación"""
     logger.info("Cerrando aplicación...")
+    await ingestion_jobs.stop()
+    await llm_service.llm.aclose()
+    if vector_store.initialized:
+        vector_store.kb_stats.save(vector_store.version)
+        vector_store.lexical_index.save(vector_store.version)
+    vector_store.embedding_cache.flush()
+    blocking_executor.shutdown(wait=False)
+    ingestion_executor.shutdown(wait=False)
+    shutdown_process_pool()
 
 if __name__ == "__main__":
     uvicorn.run(
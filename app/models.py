@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from enum import Enum
 
@@ -37,6 +37,24 @@ class PQRSResponse(BaseModel):
     categoria_detectada: CategoriaPQRS = Field(..., description="Categoría detectada automáticamente")
     tiempo_respuesta: float = Field(..., description="Tiempo de procesamiento en segundos")
     recomendaciones: List[str] = Field(default=[], description="Recomendaciones adicionales")
+    etapas: Optional[Dict[str, float]] = Field(None, description="Milisegundos por etapa del pipeline (solo si se solicitan)")
+    degradaciones: List[str] = Field(default=[], description="Degradaciones aplicadas para cumplir el plazo de la solicitud")
+
+class PQRSBatchRequest(BaseModel):
+    solicitudes: List[PQRSRequest] = Field(..., min_items=1, description="PQRS a procesar en lote")
+
+class PQRSBatchItem(BaseModel):
+    indice: int = Field(..., description="Posición de la PQRS en el lote")
+    success: bool = Field(..., description="Indica si la PQRS se procesó correctamente")
+    respuesta: Optional[PQRSResponse] = Field(None, description="Respuesta generada")
+    error: Optional[str] = Field(None, description="Error al procesar la PQRS")
+
+class PQRSBatchResponse(BaseModel):
+    resultados: List[PQRSBatchItem] = Field(..., description="Resultados en el orden de la solicitud")
+    total: int = Field(..., description="Número de PQRS recibidas")
+    exitosos: int = Field(..., description="PQRS procesadas correctamente")
+    fallidos: int = Field(..., description="PQRS con error")
+    tiempo_total: float = Field(..., description="Tiempo de procesamiento del lote en segundos")
 
 class DocumentoBase(BaseModel):
     titulo: str = Field(..., description="Título del documento")
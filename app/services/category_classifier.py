@@ -0,0 +1,157 @@
+import os
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class CentroidClassifier:
+    """Clasificador local de categorías por centroide más cercano sobre los embeddings de la colección"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._sums: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+        self._centroids: Optional[Tuple[List[str], np.ndarray]] = None
+        self._lock = threading.Lock()
+        # Cada cambio conocido de la colección avanza la generación; las sumas son válidas mientras
+        # reflejen la generación actual. Empieza desactualizado hasta cargar o reconstruir
+        self._generacion = 1
+        self._vigente = 0
+
+    @property
+    def stale(self) -> bool:
+        """Indica que los centroides deben reconstruirse desde la colección"""
+        with self._lock:
+            return self._vigente != self._generacion
+
+    def update(self, embeddings: List[List[float]], categorias: List[str]):
+        """Actualiza incrementalmente las sumas por categoría con nuevos chunks"""
+        vectores = self._normalize_rows(np.asarray(embeddings, dtype=np.float64))
+        with self._lock:
+            vigentes = self._vigente == self._generacion
+            self._generacion += 1
+            if not vigentes:
+                # Las sumas ya no valen: la próxima reconstrucción incluirá estos chunks
+                return
+            self._accumulate(self._sums, self._counts, vectores, categorias)
+            self._vigente = self._generacion
+            self._centroids = None
+
+    def rebuild(self, lotes: Iterable[Tuple[List[List[float]], List[str]]]):
+        """Recalcula los centroides a partir de lotes (embeddings, categorías)
+
+        Acumula en diccionarios locales y los sustituye al final, así que las clasificaciones
+        concurrentes siguen usando los centroides anteriores. Si la colección cambió mientras se
+        recorría, los nuevos centroides se usan pero quedan marcados como desactualizados.
+        """
+        with self._lock:
+            generacion = self._generacion
+        sums: Dict[str, np.ndarray] = {}
+        counts: Dict[str, int] = {}
+        for embeddings, categorias in lotes:
+            if embeddings:
+                self._accumulate(sums, counts, self._normalize_rows(np.asarray(embeddings, dtype=np.float64)), categorias)
+        with self._lock:
+            self._sums, self._counts = sums, counts
+            self._centroids = None
+            if self._generacion == generacion:
+                self._vigente = generacion
+        logger.info(f"Centroides de categorías reconstruidos: {self.get_stats()['chunks_por_categoria']}")
+
+    def reset(self):
+        """Descarta todos los centroides (la colección quedó vacía)"""
+        with self._lock:
+            self._sums = {}
+            self._counts = {}
+            self._centroids = None
+            self._generacion += 1
+            self._vigente = self._generacion
+
+    def invalidate(self):
+        """Marca los centroides como desactualizados (p. ej. tras reemplazar o borrar chunks)"""
+        with self._lock:
+            self._generacion += 1
+
+    @staticmethod
+    def _accumulate(sums: Dict[str, np.ndarray], counts: Dict[str, int], vectores: np.ndarray, categorias: List[str]):
+        for vector, categoria in zip(vectores, categorias):
+            if categoria not in sums:
+                sums[categoria] = np.zeros_like(vector)
+                counts[categoria] = 0
+            sums[categoria] += vector
+            counts[categoria] += 1
+
+    def classify(self, embedding: List[float]) -> Tuple[Optional[str], float, float]:
+        """Devuelve (categoría, margen sobre la segunda, similitud) para un embedding"""
+        with self._lock:
+            if self._centroids is None:
+                categorias = [c for c in self._sums if self._counts[c] > 0]
+                if not categorias:
+                    return None, 0.0, 0.0
+                matrix = self._normalize_rows(np.stack([self._sums[c] for c in categorias]))
+                self._centroids = (categorias, matrix)
+            categorias, matrix = self._centroids
+
+        # Con una sola categoría no hay nada que discriminar
+        if len(categorias) < 2:
+            return None, 0.0, 0.0
+
+        query = self._normalize_rows(np.asarray([embedding], dtype=np.float64))[0]
+        similitudes = matrix @ query
+        orden = np.argsort(similitudes)[::-1]
+        mejor, segunda = similitudes[orden[0]], similitudes[orden[1]]
+        return categorias[orden[0]], float(mejor - segunda), float(mejor)
+
+    def save(self, total_chunks: int, revision: int):
+        """Persiste las sumas por categoría junto al número de chunks y la revisión de la colección"""
+        if not self.path:
+            return
+        with self._lock:
+            # Unas sumas desactualizadas guardadas con el total actual se cargarían como válidas
+            if self._vigente != self._generacion:
+                return
+            categorias = list(self._sums)
+            sums = np.stack([self._sums[c] for c in categorias]) if categorias else np.zeros((0, 0))
+            counts = np.asarray([self._counts[c] for c in categorias], dtype=np.int64)
+        try:
+            tmp_path = f"{self.path}.tmp.npz"
+            np.savez(
+                tmp_path, categorias=np.asarray(categorias), sums=sums, counts=counts,
+                total=total_chunks, revision=revision
+            )
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"No se pudieron guardar los centroides: {e}")
+
+    def load(self, total_chunks: int, revision: int) -> bool:
+        """Carga los centroides persistidos si corresponden al estado actual de la colección"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            data = np.load(self.path)
+            guardada = int(data["revision"]) if "revision" in data.files else None
+            if guardada != revision or int(data["total"]) != total_chunks:
+                logger.info("Centroides persistidos desactualizados; se reconstruirán")
+                return False
+            with self._lock:
+                self._sums = {str(c): s for c, s in zip(data["categorias"], data["sums"])}
+                self._counts = {str(c): int(n) for c, n in zip(data["categorias"], data["counts"])}
+                self._centroids = None
+                self._vigente = self._generacion
+            return True
+        except Exception as e:
+            logger.warning(f"No se pudieron cargar los centroides: {e}")
+            return False
+
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Devuelve el número de chunks usados por cada centroide"""
+        with self._lock:
+            return {"chunks_por_categoria": dict(self._counts), "desactualizado": self._vigente != self._generacion}
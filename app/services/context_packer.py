@@ -0,0 +1,111 @@
+import re
+import logging
+import threading
+from typing import Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Por debajo de este espacio no vale la pena incluir un fragmento recortado
+MIN_TOKENS_RECORTE = 40
+
+# Aproximación de caracteres por token cuando tiktoken no está disponible
+CHARS_POR_TOKEN = 4
+
+FIN_DE_FRASE = re.compile(r"[.!?…](?=\s)|\n")
+
+class ContextPacker:
+    """Arma el bloque de contexto de un prompt dentro de un presupuesto de tokens"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._encoding = None
+        self._encoding_loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        """Codificador de tiktoken del modelo, cargado en el primer uso (None si no está disponible)"""
+        if not self._encoding_loaded:
+            with self._lock:
+                if not self._encoding_loaded:
+                    try:
+                        import tiktoken
+                        try:
+                            self._encoding = tiktoken.encoding_for_model(self.model)
+                        except KeyError:
+                            self._encoding = tiktoken.get_encoding("cl100k_base")
+                    except Exception as e:
+                        logger.warning(f"tiktoken no disponible, se estimarán los tokens por longitud: {e}")
+                    self._encoding_loaded = True
+        return self._encoding
+
+    def warm_up(self):
+        """Carga el codificador fuera del event loop (tiktoken puede descargar su vocabulario)"""
+        return self.encoding is not None
+
+    def count(self, texto: str) -> int:
+        """Cuenta los tokens de un texto"""
+        if self.encoding is None:
+            return (len(texto) + CHARS_POR_TOKEN - 1) // CHARS_POR_TOKEN
+        return len(self.encoding.encode(texto))
+
+    def truncate(self, texto: str, max_tokens: int) -> str:
+        """Recorta un texto a max_tokens, cortando en el último final de frase si queda cerca"""
+        if self.encoding is None:
+            recortado = texto[:max_tokens * CHARS_POR_TOKEN]
+        else:
+            recortado = self.encoding.decode(self.encoding.encode(texto)[:max_tokens])
+
+        finales = [m.end() for m in FIN_DE_FRASE.finditer(recortado)]
+        if finales and finales[-1] >= len(recortado) // 2:
+            recortado = recortado[:finales[-1]]
+        return recortado.strip()
+
+    @staticmethod
+    def format_block(documento: Dict[str, Any], contenido: str) -> str:
+        return f"Documento: {documento['metadata']['titulo']}\nContenido: {contenido}"
+
+    def pack(self, documentos: List[Dict[str, Any]], presupuesto: int) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+        """Llena el presupuesto con los documentos en orden de relevancia
+
+        Devuelve (contexto, documentos incluidos, estadísticas). El último documento
+        que no cabe entero se recorta en un final de frase si queda espacio suficiente.
+        """
+        separador = "\n\n"
+        tokens_separador = self.count(separador)
+        bloques, usados = [], []
+        restante = presupuesto
+        recortado = False
+
+        for documento in documentos:
+            costo_separador = tokens_separador if bloques else 0
+            bloque = self.format_block(documento, documento["documento"])
+            tokens_bloque = self.count(bloque)
+
+            if tokens_bloque + costo_separador <= restante:
+                bloques.append(bloque)
+                usados.append(documento)
+                restante -= tokens_bloque + costo_separador
+                continue
+
+            # No cabe entero: recortar el contenido al espacio que queda
+            tokens_encabezado = self.count(self.format_block(documento, ""))
+            disponible = restante - costo_separador - tokens_encabezado
+            if disponible >= MIN_TOKENS_RECORTE:
+                contenido = self.truncate(documento["documento"], disponible)
+                if contenido:
+                    bloque = self.format_block(documento, contenido)
+                    bloques.append(bloque)
+                    usados.append(documento)
+                    restante -= self.count(bloque) + costo_separador
+                    recortado = True
+            break
+
+        contexto = separador.join(bloques)
+        return contexto, usados, {
+            "tokens_contexto": self.count(contexto) if contexto else 0,
+            "presupuesto_contexto": presupuesto,
+            "documentos_incluidos": len(usados),
+            "documentos_recuperados": len(documentos),
+            "recortado": recortado
+        }
@@ -0,0 +1,72 @@
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, List, Iterator
+
+class Deadline:
+    """Plazo de una solicitud y degradaciones aplicadas para cumplirlo"""
+
+    def __init__(self, segundos: Optional[float] = None):
+        self.expira = time.monotonic() + segundos if segundos else None
+        self.degradaciones: List[str] = []
+
+    def remaining(self) -> Optional[float]:
+        """Segundos restantes (None si la solicitud no tiene plazo)"""
+        if self.expira is None:
+            return None
+        return max(0.0, self.expira - time.monotonic())
+
+    def has_time(self, segundos: float) -> bool:
+        restante = self.remaining()
+        return restante is None or restante >= segundos
+
+    def degrade(self, nombre: str):
+        if nombre not in self.degradaciones:
+            self.degradaciones.append(nombre)
+
+# Plazo de la solicitud en curso; las tareas creadas con asyncio heredan el mismo objeto
+_deadline_actual: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline_scope(segundos: Optional[float]) -> Iterator[Deadline]:
+    """Activa un plazo para el bloque; segundos None o 0 solo registra degradaciones"""
+    yield from _activate(Deadline(segundos))
+
+@contextmanager
+def item_scope() -> Iterator[Deadline]:
+    """Plazo de un elemento de un lote: vence con la solicitud, pero registra sus degradaciones aparte
+
+    Parte de las degradaciones ya aplicadas a todo el lote (p. ej. la recuperación reducida).
+    """
+    padre = _deadline_actual.get()
+    deadline = Deadline()
+    if padre is not None:
+        deadline.expira = padre.expira
+        deadline.degradaciones = list(padre.degradaciones)
+    yield from _activate(deadline)
+
+def _activate(deadline: Deadline) -> Iterator[Deadline]:
+    token = _deadline_actual.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline_actual.reset(token)
+
+def current_deadline() -> Optional[Deadline]:
+    return _deadline_actual.get()
+
+def remaining() -> Optional[float]:
+    """Segundos restantes de la solicitud en curso (None sin plazo)"""
+    deadline = _deadline_actual.get()
+    return deadline.remaining() if deadline is not None else None
+
+def has_time(segundos: float) -> bool:
+    """Indica si quedan al menos `segundos`; siempre True fuera de una solicitud con plazo"""
+    deadline = _deadline_actual.get()
+    return deadline is None or deadline.has_time(segundos)
+
+def degrade(nombre: str):
+    """Registra una degradación en la solicitud en curso (no hace nada fuera de una)"""
+    deadline = _deadline_actual.get()
+    if deadline is not None:
+        deadline.degrade(nombre)
@@ -0,0 +1,186 @@
+import re
+import codecs
+import logging
+import multiprocessing
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {".txt", ".md", ".pdf", ".docx"}
+
+# Tamaño de bloque para leer archivos de texto plano
+TEXT_BLOCK_SIZE = 256 * 1024
+
+# Tope de caracteres acumulados sin un límite de párrafo: a partir de ahí se corta en un salto de
+# línea, en un espacio o, si no hay ninguno en la segunda mitad, en seco
+TEXT_MAX_SEGMENT = 4 * TEXT_BLOCK_SIZE
+
+_ULTIMO_ESPACIO = re.compile(r"\s\S*\Z")
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Pool de procesos para el parseo de documentos, fuera del GIL del servidor"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.extraction_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+def count_pdf_pages(path: str) -> int:
+    """Cuenta las páginas de un PDF (se ejecuta en el pool de procesos)"""
+    from PyPDF2 import PdfReader
+    return len(PdfReader(path).pages)
+
+def extract_pdf_pages(path: str, start: int, end: int) -> str:
+    """Extrae el texto de un rango de páginas de un PDF (se ejecuta en el pool de procesos)"""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    paginas = []
+    for i in range(start, min(end, len(reader.pages))):
+        try:
+            paginas.append(reader.pages[i].extract_text() or "")
+        except Exception as e:
+            logger.warning(f"No se pudo extraer la página {i + 1} de {path}: {e}")
+    return "\n\n".join(p for p in paginas if p.strip())
+
+def _docx_body_elements(documento) -> Iterator:
+    """Párrafos y tablas del cuerpo de un DOCX en el orden en que aparecen"""
+    for elemento in documento.element.body.iterchildren():
+        if elemento.tag.endswith("}p") or elemento.tag.endswith("}tbl"):
+            yield elemento
+
+def split_docx_body(path: str, paso: int) -> List[List[bytes]]:
+    """Parsea un DOCX una sola vez y devuelve el XML de sus párrafos y tablas en rangos de `paso` elementos (se ejecuta en el pool de procesos)"""
+    from docx import Document
+    from lxml import etree
+    elementos = [etree.tostring(elemento) for elemento in _docx_body_elements(Document(path))]
+    return [elementos[i:i + paso] for i in range(0, len(elementos), paso)]
+
+def extract_docx_blocks(elementos: List[bytes], block_chars: int) -> List[str]:
+    """Extrae el texto de un rango de párrafos y tablas de un DOCX, en orden y agrupado en bloques (se ejecuta en el pool de procesos)"""
+    from docx.oxml import parse_xml
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    textos = []
+    for xml in elementos:
+        elemento = parse_xml(xml)
+        if elemento.tag.endswith("}tbl"):
+            for fila in Table(elemento, None).rows:
+                celdas = [c.text.strip() for c in fila.cells if c.text.strip()]
+                if celdas:
+                    textos.append(" | ".join(celdas))
+        else:
+            texto = Paragraph(elemento, None).text
+            if texto.strip():
+                textos.append(texto)
+
+    bloques, actual, longitud = [], [], 0
+    for texto in textos:
+        actual.append(texto)
+        longitud += len(texto)
+        if longitud >= block_chars:
+            bloques.append("\n\n".join(actual))
+            actual, longitud = [], 0
+    if actual:
+        bloques.append("\n\n".join(actual))
+    return bloques
+
+def iter_text_segments(path: str, extension: str) -> Iterator[str]:
+    """Produce el texto de un archivo por segmentos a medida que se extrae"""
+    extension = extension.lower()
+    if extension == ".pdf":
+        yield from _iter_pdf_segments(path)
+    elif extension == ".docx":
+        yield from _iter_docx_segments(path)
+    elif extension in (".txt", ".md"):
+        yield from _iter_text_file(path)
+    else:
+        raise ValueError(f"Formato no soportado: {extension}")
+
+def _iter_pdf_segments(path: str) -> Iterator[str]:
+    """Reparte rangos de páginas en el pool y los entrega en orden"""
+    pool = get_process_pool()
+    total_paginas = pool.submit(count_pdf_pages, path).result()
+    paso = settings.extraction_pages_per_task
+    tareas = (partial(extract_pdf_pages, path, start, start + paso) for start in range(0, total_paginas, paso))
+    for texto in _iter_in_order(pool, tareas):
+        if texto:
+            yield texto
+
+def _iter_docx_segments(path: str) -> Iterator[str]:
+    """Parsea el DOCX una vez y reparte el XML de cada rango de párrafos y tablas en el pool, entregando sus bloques en orden"""
+    pool = get_process_pool()
+    rangos = pool.submit(split_docx_body, path, settings.extraction_docx_elements_per_task).result()
+    # Cada rango sale de la lista al enviarse, para no retener el XML de todo el cuerpo hasta el final
+    rangos.reverse()
+    tareas = (partial(extract_docx_blocks, rangos.pop(), settings.extraction_block_chars) for _ in range(len(rangos)))
+    for bloques in _iter_in_order(pool, tareas):
+        yield from bloques
+
+def _iter_in_order(pool: ProcessPoolExecutor, tareas: Iterator[Callable[[], Any]]) -> Iterator:
+    """Ejecuta las tareas en el pool y entrega los resultados en orden, con pocas tareas en vuelo"""
+    max_en_vuelo = settings.extraction_workers * 2
+    en_vuelo = deque()
+
+    for tarea in tareas:
+        en_vuelo.append(pool.submit(tarea))
+        if len(en_vuelo) >= max_en_vuelo:
+            break
+
+    while en_vuelo:
+        resultado = en_vuelo.popleft().result()
+        siguiente = next(tareas, None)
+        if siguiente is not None:
+            en_vuelo.append(pool.submit(siguiente))
+        yield resultado
+
+def _long_text_cut(texto: str) -> Tuple[int, int]:
+    """(fin del segmento, inicio del resto) para un texto sin párrafos que pasó el tope
+
+    Busca en la segunda mitad del tope el último salto de línea y luego el último espacio,
+    para que cada corte avance al menos medio tope; si no hay ninguno, corta en seco.
+    """
+    minimo = TEXT_MAX_SEGMENT // 2
+    corte = texto.rfind("\n", minimo)
+    if corte < 0:
+        espacio = _ULTIMO_ESPACIO.search(texto, minimo)
+        corte = espacio.start() if espacio else -1
+    if corte < 0:
+        return TEXT_MAX_SEGMENT, TEXT_MAX_SEGMENT
+    return corte, corte + 1
+
+def _iter_text_file(path: str) -> Iterator[str]:
+    """Lee un archivo de texto por bloques cortando en límites de párrafo (o en líneas y espacios si no los hay)"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    resto = ""
+    with open(path, "rb") as f:
+        while True:
+            bloque = f.read(TEXT_BLOCK_SIZE)
+            if not bloque:
+                break
+            resto += decoder.decode(bloque)
+            corte = resto.rfind("\n\n")
+            if corte > 0:
+                yield resto[:corte]
+                resto = resto[corte + 2:]
+            while len(resto) >= TEXT_MAX_SEGMENT:
+                fin, inicio = _long_text_cut(resto)
+                yield resto[:fin]
+                resto = resto[inicio:]
+    resto += decoder.decode(b"", final=True)
+    if resto.strip():
+        yield resto
@@ -0,0 +1,76 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+class DocumentManifest:
+    """Manifiesto de documentos ingestados con el hash de contenido de cada chunk"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # False cuando el manifiesto puede no reflejar todo lo que hay en la colección
+        self.complete = False
+
+    def load(self, collection_empty: bool):
+        """Carga el manifiesto persistido; sin archivo solo es completo si la colección está vacía"""
+        with self._lock:
+            self._docs = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    self._docs = data.get("documentos", {})
+                    self.complete = data.get("completo", True)
+                    return
+                except Exception as e:
+                    logger.warning(f"No se pudo leer el manifiesto de documentos: {e}")
+            self.complete = collection_empty
+
+    def get(self, titulo: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._docs.get(titulo)
+
+    def set(self, titulo: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._docs[titulo] = entry
+
+    def remove(self, titulo: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._docs.pop(titulo, None)
+
+    def titles(self) -> List[str]:
+        with self._lock:
+            return list(self._docs)
+
+    def clear(self, complete: bool = True):
+        """Vacía el manifiesto; complete=False obliga a verificar contra la colección"""
+        with self._lock:
+            self._docs = {}
+            self.complete = complete
+
+    def save(self):
+        """Persiste el manifiesto con escritura atómica"""
+        # Instantánea y escritura van juntas para que un guardado anterior no pise a uno posterior
+        with self._save_lock:
+            with self._lock:
+                # Se serializa bajo el lock: una ingesta concurrente no puede cambiar el diccionario a medias
+                contenido = json.dumps({"completo": self.complete, "documentos": self._docs}, ensure_ascii=False)
+            tmp_path = None
+            try:
+                directorio = os.path.dirname(self.path) or "."
+                os.makedirs(directorio, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directorio, prefix=".manifest_", suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(contenido)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar el manifiesto de documentos: {e}")
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
@@ -0,0 +1,151 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores de los buckets del histograma de tamaño de lote
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+class _LoopFuture:
+    """Resuelve un asyncio.Future desde el hilo del batcher, en el hilo de su event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.loop = loop
+        self.future = future
+
+    def set_result(self, value):
+        self._call(self._settle, value, None)
+
+    def set_exception(self, exc: BaseException):
+        self._call(self._settle, None, exc)
+
+    def _call(self, *args):
+        try:
+            self.loop.call_soon_threadsafe(*args)
+        except RuntimeError:
+            # El loop ya se cerró: nadie espera el resultado
+            pass
+
+    def _settle(self, value, exc: BaseException):
+        # La corrutina que esperaba pudo cancelarse mientras el lote se calculaba
+        if self.future.done():
+            return
+        if exc is not None:
+            self.future.set_exception(exc)
+        else:
+            self.future.set_result(value)
+
+class EmbeddingBatcher:
+    """Agrupa los textos de llamadas concurrentes en un único encode por lotes"""
+
+    def __init__(self, encode_fn: Callable[[List[str]], List[List[float]]], max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "lotes": 0,
+            "textos": 0,
+            "tamano_max_lote": 0,
+            "espera_total": 0.0,
+            "espera_max": 0.0,
+            "encode_total": 0.0
+        }
+        self._histograma = {f"<={bucket}": 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._histograma[f">{BATCH_SIZE_BUCKETS[-1]}"] = 0
+
+    def encode(self, text: str) -> List[float]:
+        """Encola un texto y espera su embedding (bloquea solo al hilo que llama)"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result()
+
+    async def encode_async(self, text: str) -> List[float]:
+        """Encola un texto desde el event loop y espera su embedding sin ocupar un hilo del executor"""
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((text, _LoopFuture(loop, future), time.perf_counter()))
+        return await future
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Bucle del hilo: junta textos hasta llenar el lote o agotar la ventana de espera"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            self._process(batch)
+
+    def _process(self, batch: List[tuple]):
+        inicio = time.perf_counter()
+        texts = [text for text, _, _ in batch]
+
+        try:
+            vectors = self.encode_fn(texts)
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+        except Exception as e:
+            logger.error(f"Error en encode por lotes de {len(batch)} textos: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+
+        fin = time.perf_counter()
+        esperas = [inicio - encolado for _, _, encolado in batch]
+        with self._stats_lock:
+            self._stats["lotes"] += 1
+            self._stats["textos"] += len(batch)
+            self._stats["tamano_max_lote"] = max(self._stats["tamano_max_lote"], len(batch))
+            self._stats["espera_total"] += sum(esperas)
+            self._stats["espera_max"] = max(self._stats["espera_max"], max(esperas))
+            self._stats["encode_total"] += fin - inicio
+            for bucket in BATCH_SIZE_BUCKETS:
+                if len(batch) <= bucket:
+                    self._histograma[f"<={bucket}"] += 1
+                    break
+            else:
+                self._histograma[f">{BATCH_SIZE_BUCKETS[-1]}"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Devuelve estadísticas de tamaño de lote y demora en cola"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            histograma = dict(self._histograma)
+
+        lotes, textos = stats["lotes"], stats["textos"]
+        return {
+            "lotes": lotes,
+            "textos": textos,
+            "tamano_promedio_lote": round(textos / lotes, 2) if lotes else 0.0,
+            "tamano_max_lote": stats["tamano_max_lote"],
+            "histograma_tamano_lote": histograma,
+            "espera_promedio_ms": round(stats["espera_total"] / textos * 1000, 3) if textos else 0.0,
+            "espera_max_ms": round(stats["espera_max"] * 1000, 3),
+            "encode_promedio_ms": round(stats["encode_total"] / lotes * 1000, 3) if lotes else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
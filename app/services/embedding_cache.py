@@ -0,0 +1,226 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Escrituras pendientes que disparan un volcado a disco, y antigüedad máxima de las pendientes
+FLUSH_BATCH_SIZE = 256
+FLUSH_INTERVAL = 2.0
+
+# Segundos mínimos entre podas de filas expiradas o por encima del límite
+PRUNE_INTERVAL = 300.0
+
+class EmbeddingCache:
+    """Caché de embeddings de consultas en dos niveles: LRU en memoria y SQLite en disco
+
+    Las escrituras a disco se acumulan y se vuelcan por lotes en un hilo aparte, fuera del lock
+    del LRU; el volcado también poda las filas expiradas y las más antiguas por encima de
+    max_disk_rows.
+    """
+
+    def __init__(self, model_name: str, max_size: int = 10000, ttl: float = 3600.0, db_path: Optional[str] = None, max_disk_rows: int = 200000):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_disk_rows = max_disk_rows
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._ultimo_volcado = time.monotonic()
+        self._ultima_poda = 0.0
+        self._flush_lock = threading.Lock()
+        self._stats = {"hits_memoria": 0, "hits_disco": 0, "misses": 0, "expirados": 0, "desalojados": 0, "podados_disco": 0}
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        """Abre (o crea) el almacén persistente de embeddings"""
+        try:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "clave TEXT PRIMARY KEY, vector BLOB NOT NULL, creado REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_creado ON embeddings (creado)")
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"Error abriendo caché de embeddings en disco: {e}")
+            self._db = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normaliza el texto para que variaciones triviales compartan entrada"""
+        text = unicodedata.normalize("NFC", text).lower()
+        return " ".join(text.split())
+
+    def key(self, text: str) -> str:
+        """Calcula la clave de caché a partir del modelo y el texto normalizado"""
+        payload = f"{self.model_name}\x00{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Obtiene el embedding cacheado de un texto, o None si no existe"""
+        clave = self.key(text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(clave)
+            if entry is not None:
+                vector, creado = entry
+                if now - creado <= self.ttl:
+                    self._memory.move_to_end(clave)
+                    self._stats["hits_memoria"] += 1
+                    return vector
+                del self._memory[clave]
+                self._stats["expirados"] += 1
+
+        if self._db is not None:
+            # La lectura no retiene el lock del LRU; las filas expiradas se borran en la poda
+            try:
+                with self._db_lock:
+                    row = self._db.execute(
+                        "SELECT vector, creado FROM embeddings WHERE clave = ?", (clave,)
+                    ).fetchone()
+            except Exception as e:
+                logger.warning(f"No se pudo leer la caché de embeddings en disco: {e}")
+                row = None
+            if row is not None:
+                with self._lock:
+                    if now - row[1] <= self.ttl:
+                        vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                        self._store_memory(clave, vector, row[1])
+                        self._stats["hits_disco"] += 1
+                        return vector
+                    self._stats["expirados"] += 1
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, text: str, vector: List[float]):
+        """Guarda el embedding en memoria y lo encola para persistirlo en el próximo volcado"""
+        clave = self.key(text)
+        now = time.time()
+
+        with self._lock:
+            self._store_memory(clave, vector, now)
+            if self._db is None:
+                return
+            self._pending.append((clave, np.asarray(vector, dtype=np.float32).tobytes(), now))
+            volcar = (
+                len(self._pending) >= FLUSH_BATCH_SIZE
+                or time.monotonic() - self._ultimo_volcado >= FLUSH_INTERVAL
+            )
+
+        if volcar:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Vuelca las escrituras pendientes en segundo plano; si ya hay un volcado en curso, no hace nada"""
+        if not self._flush_lock.acquire(blocking=False):
+            return
+
+        def volcar():
+            try:
+                self._flush_pending()
+            finally:
+                self._flush_lock.release()
+
+        threading.Thread(target=volcar, name="cache-embeddings", daemon=True).start()
+
+    def flush(self):
+        """Vuelca ahora las escrituras pendientes (p. ej. al apagar)"""
+        with self._flush_lock:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        with self._lock:
+            pendientes, self._pending = self._pending, []
+            self._ultimo_volcado = time.monotonic()
+        if self._db is None or not pendientes:
+            return
+
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (clave, vector, creado) VALUES (?, ?, ?)",
+                    pendientes
+                )
+                self._db.commit()
+        except Exception as e:
+            logger.warning(f"No se pudieron persistir {len(pendientes)} embeddings en caché: {e}")
+            return
+
+        if time.monotonic() - self._ultima_poda >= PRUNE_INTERVAL:
+            self._ultima_poda = time.monotonic()
+            self._prune()
+
+    def _prune(self):
+        """Borra del disco las filas expiradas y las más antiguas por encima de max_disk_rows"""
+        try:
+            with self._db_lock:
+                expiradas = self._db.execute(
+                    "DELETE FROM embeddings WHERE creado < ?", (time.time() - self.ttl,)
+                ).rowcount
+                total = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                sobrantes = max(0, total - self.max_disk_rows)
+                if sobrantes:
+                    self._db.execute(
+                        "DELETE FROM embeddings WHERE clave IN "
+                        "(SELECT clave FROM embeddings ORDER BY creado LIMIT ?)", (sobrantes,)
+                    )
+                self._db.commit()
+        except Exception as e:
+            logger.warning(f"Error podando la caché de embeddings en disco: {e}")
+            return
+
+        if expiradas or sobrantes:
+            logger.info(f"Caché de embeddings en disco: {expiradas} filas expiradas y {sobrantes} sobrantes borradas")
+            with self._lock:
+                self._stats["podados_disco"] += expiradas + sobrantes
+
+    def _store_memory(self, clave: str, vector: List[float], creado: float):
+        """Inserta en el LRU en memoria desalojando las entradas más antiguas"""
+        self._memory[clave] = (vector, creado)
+        self._memory.move_to_end(clave)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self._stats["desalojados"] += 1
+
+    def clear(self):
+        """Vacía ambos niveles de la caché"""
+        # Esperar a un volcado en curso para que no reescriba filas ya borradas
+        with self._flush_lock:
+            with self._lock:
+                self._memory.clear()
+                self._pending = []
+            if self._db is not None:
+                with self._db_lock:
+                    self._db.execute("DELETE FROM embeddings")
+                    self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Devuelve contadores de aciertos y tasa de acierto"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entradas_memoria"] = len(self._memory)
+            stats["pendientes_disco"] = len(self._pending)
+
+        hits = stats["hits_memoria"] + stats["hits_disco"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / total, 4) if total else 0.0
+        stats["persistente"] = self._db is not None
+        return stats
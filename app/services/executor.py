@@ -0,0 +1,30 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pool acotado para trabajo bloqueante (embeddings, ChromaDB) fuera del event loop
+blocking_executor = ThreadPoolExecutor(
+    max_workers=settings.blocking_workers,
+    thread_name_prefix="rag-blocking"
+)
+
+# Pool propio de los trabajos de ingesta: un documento largo no ocupa los hilos de las consultas
+ingestion_executor = ThreadPoolExecutor(
+    max_workers=settings.ingestion_workers,
+    thread_name_prefix="rag-ingesta"
+)
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Ejecuta una función bloqueante en el pool sin detener el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+
+async def run_ingestion(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Ejecuta un paso de un trabajo de ingesta en el pool de ingesta"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(ingestion_executor, functools.partial(func, *args, **kwargs))
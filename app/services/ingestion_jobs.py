@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+from app.config import settings
+from app.models import DocumentoBase, CategoriaPQRS
+from app.services.executor import run_blocking, run_ingestion
+from app.services.vector_store import vector_store
+from app.services.document_extraction import iter_text_segments
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre escrituras de progreso de un mismo trabajo
+PROGRESS_INTERVAL = 0.5
+
+COLUMNAS = (
+    "id", "estado", "etapa", "titulo", "categoria", "filename", "content_type", "extension",
+    "path", "size", "content_hash", "chunks_hechos", "chunks_por_segundo", "reanudado",
+    "creado", "iniciado", "actualizado", "terminado", "resultado", "error"
+)
+
+class IngestionJobStore:
+    """Tabla persistente de trabajos de ingesta en SQLite"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, estado TEXT NOT NULL, etapa TEXT NOT NULL, "
+            "titulo TEXT NOT NULL, categoria TEXT NOT NULL, filename TEXT, content_type TEXT, "
+            "extension TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, content_hash TEXT NOT NULL, "
+            "chunks_hechos INTEGER NOT NULL DEFAULT 0, chunks_por_segundo REAL NOT NULL DEFAULT 0, "
+            "reanudado INTEGER NOT NULL DEFAULT 0, "
+            "creado REAL NOT NULL, iniciado REAL, actualizado REAL, terminado REAL, "
+            "resultado TEXT, error TEXT)"
+        )
+        self._db.commit()
+
+    def insert(self, job: Dict[str, Any]):
+        columnas = [c for c in COLUMNAS if c in job]
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO jobs ({', '.join(columnas)}) VALUES ({', '.join('?' for _ in columnas)})",
+                [job[c] for c in columnas]
+            )
+            self._db.commit()
+
+    def update(self, job_id: str, **campos):
+        if "resultado" in campos and campos["resultado"] is not None:
+            campos["resultado"] = json.dumps(campos["resultado"], ensure_ascii=False)
+        campos["actualizado"] = time.time()
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {', '.join(f'{c} = ?' for c in campos)} WHERE id = ?",
+                [*campos.values(), job_id]
+            )
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(COLUMNAS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit: int = 50, estados: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        query = f"SELECT {', '.join(COLUMNAS)} FROM jobs"
+        params: List[Any] = []
+        if estados:
+            query += f" WHERE estado IN ({', '.join('?' for _ in estados)})"
+            params.extend(estados)
+        query += " ORDER BY creado DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row) -> Dict[str, Any]:
+        job = dict(zip(COLUMNAS, row))
+        if job["resultado"]:
+            job["resultado"] = json.loads(job["resultado"])
+        return job
+
+class IngestionJobQueue:
+    """Cola de trabajos de ingesta procesada por un pool acotado de workers asíncronos"""
+
+    def __init__(self, jobs_dir: str, workers: int = 2):
+        self.jobs_dir = jobs_dir
+        self.uploads_dir = os.path.join(jobs_dir, "uploads")
+        self.workers = workers
+        self._store: Optional[IngestionJobStore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def store(self) -> IngestionJobStore:
+        if self._store is None:
+            self._store = IngestionJobStore(os.path.join(self.jobs_dir, "jobs.sqlite3"))
+        return self._store
+
+    async def start(self):
+        """Arranca los workers y reencola los trabajos que quedaron pendientes en un reinicio"""
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self._queue = asyncio.Queue()
+
+        pendientes = await run_blocking(self.store.list, limit=-1, estados=["en_cola", "procesando"])
+        for job in sorted(pendientes, key=lambda j: j["creado"]):
+            if job["estado"] == "procesando":
+                # Quedó a medias: sus chunks pueden estar escritos solo en parte
+                await run_blocking(self.store.update, job["id"], estado="en_cola", etapa="en_cola", chunks_hechos=0, reanudado=1)
+            self._queue.put_nowait(job["id"])
+        if pendientes:
+            logger.info(f"Reanudando {len(pendientes)} trabajos de ingesta pendientes")
+
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Detiene los workers; los trabajos en curso se reanudan en el próximo arranque"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        path: str,
+        size: int,
+        content_hash: str,
+        titulo: str,
+        categoria: CategoriaPQRS,
+        filename: str,
+        content_type: Optional[str],
+        extension: str
+    ) -> Dict[str, Any]:
+        """Registra un trabajo para un archivo ya guardado en uploads_dir y lo encola"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "estado": "en_cola",
+            "etapa": "en_cola",
+            "titulo": titulo,
+            "categoria": categoria.value,
+            "filename": filename,
+            "content_type": content_type,
+            "extension": extension,
+            "path": path,
+            "size": size,
+            "content_hash": content_hash,
+            "creado": time.time()
+        }
+        # Las escrituras en SQLite hacen commit a disco: fuera del event loop
+        await run_blocking(self.store.insert, job)
+        self._queue.put_nowait(job["id"])
+        logger.info(f"Trabajo de ingesta {job['id']} en cola para '{titulo}'")
+        return await self.get(job["id"])
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve el estado público de un trabajo"""
+        job = await run_blocking(self.store.get, job_id)
+        return self._public(job) if job else None
+
+    async def list(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return [self._public(job) for job in await run_blocking(self.store.list, limit=limit)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "en_cola": self._queue.qsize() if self._queue else 0,
+            "workers": self.workers
+        }
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error inesperado en el trabajo de ingesta {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job_id: str):
+        job = await run_blocking(self.store.get, job_id)
+        if job is None or job["estado"] != "en_cola":
+            return
+
+        inicio = time.time()
+        await run_blocking(self.store.update, job_id, estado="procesando", etapa="extrayendo", iniciado=inicio)
+        documento = DocumentoBase(
+            titulo=job["titulo"],
+            contenido="",
+            categoria=CategoriaPQRS(job["categoria"]),
+            metadatos={
+                "filename": job["filename"],
+                "content_type": job["content_type"],
+                "size": job["size"]
+            }
+        )
+
+        try:
+            if job["reanudado"]:
+                await run_ingestion(vector_store.forget_document_state, job["titulo"])
+
+            resultado = await run_ingestion(
+                vector_store.add_document_stream,
+                documento,
+                iter_text_segments(job["path"], job["extension"]),
+                job["content_hash"],
+                progress=self._progress_callback(job_id, inicio)
+            )
+            resultado_doc = resultado["resultados"][0]
+
+            if resultado_doc["success"]:
+                await run_blocking(
+                    self.store.update,
+                    job_id,
+                    estado="completado",
+                    etapa="completado",
+                    chunks_hechos=resultado_doc["chunks"],
+                    chunks_por_segundo=resultado["rendimiento"]["chunks_por_segundo"],
+                    terminado=time.time(),
+                    resultado=resultado
+                )
+                logger.info(f"Trabajo de ingesta {job_id} completado: '{job['titulo']}' ({resultado_doc['chunks']} chunks)")
+            else:
+                await self._fail(job_id, resultado_doc.get("error", "Error añadiendo documento"), resultado)
+        except Exception as e:
+            await self._fail(job_id, str(e))
+
+        await run_ingestion(self._remove_upload, job["path"])
+
+    def _progress_callback(self, job_id: str, inicio: float):
+        """Crea el callback que la ingesta invoca (desde un hilo) al avanzar"""
+        ultimo = {"etapa": None, "momento": 0.0}
+
+        def progress(etapa: str, chunks: int):
+            ahora = time.time()
+            if etapa == ultimo["etapa"] and ahora - ultimo["momento"] < PROGRESS_INTERVAL:
+                return
+            ultimo.update(etapa=etapa, momento=ahora)
+            elapsed = ahora - inicio
+            try:
+                self.store.update(
+                    job_id,
+                    etapa=etapa,
+                    chunks_hechos=chunks,
+                    chunks_por_segundo=round(chunks / elapsed, 2) if elapsed > 0 else 0.0
+                )
+            except Exception as e:
+                logger.warning(f"No se pudo registrar el progreso del trabajo {job_id}: {e}")
+
+        return progress
+
+    async def _fail(self, job_id: str, error: str, resultado: Optional[Dict[str, Any]] = None):
+        logger.error(f"Trabajo de ingesta {job_id} fallido: {error}")
+        await run_blocking(self.store.update, job_id, estado="fallido", etapa="fallido", terminado=time.time(), error=error, resultado=resultado)
+
+    @staticmethod
+    def _remove_upload(path: str):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar el archivo del trabajo {path}: {e}")
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Formatea un trabajo para la API"""
+        def fecha(ts):
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+        return {
+            "job_id": job["id"],
+            "titulo": job["titulo"],
+            "filename": job["filename"],
+            "categoria": job["categoria"],
+            "estado": job["estado"],
+            "etapa": job["etapa"],
+            "chunks_hechos": job["chunks_hechos"],
+            "chunks_por_segundo": job["chunks_por_segundo"],
+            "size": job["size"],
+            "reanudado": bool(job["reanudado"]),
+            "creado": fecha(job["creado"]),
+            "iniciado": fecha(job["iniciado"]),
+            "terminado": fecha(job["terminado"]),
+            "resultado": job["resultado"],
+            "error": job["error"]
+        }
+
+# Instancia global de la cola de ingesta
+ingestion_jobs = IngestionJobQueue(
+    jobs_dir=settings.ingestion_jobs_dir,
+    workers=settings.ingestion_workers
+)
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+from app.models import CategoriaPQRS
+
+logger = logging.getLogger(__name__)
+
+# Bytes por componente de los embeddings (float32 en ChromaDB/HNSW)
+BYTES_POR_DIMENSION = 4
+
+# Aproximación de bytes de texto por token
+BYTES_POR_TOKEN = 4
+
+class KnowledgeBaseStats:
+    """Estadísticas de la base de conocimiento mantenidas de forma incremental en cada escritura"""
+
+    def __init__(self, path: Optional[str] = None, save_interval: float = 30.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._ultimo_guardado = 0.0
+        # Revisión de la colección que reflejan las estadísticas persistidas
+        self._revision_guardada: Optional[int] = None
+        self._reset()
+
+    def _reset(self):
+        # Por chunk: [titulo, categoria, bytes], para poder descontarlo al reemplazarlo o borrarlo
+        self._chunks: Dict[str, List[Any]] = {}
+        # Por documento: chunks y bytes totales, y chunks por categoría
+        self._documentos: Dict[str, Dict[str, Any]] = {}
+        self._por_categoria: Dict[str, Dict[str, int]] = {}
+        self._bytes_total = 0
+        self._dimension = 0
+        self._ultima_ingesta: Optional[str] = None
+
+    def _categoria(self, categoria: str) -> Dict[str, int]:
+        entrada = self._por_categoria.get(categoria)
+        if entrada is None:
+            entrada = self._por_categoria[categoria] = {"chunks": 0, "documentos": 0, "bytes": 0}
+        return entrada
+
+    def _sumar(self, titulo: str, categoria: str, n_bytes: int, signo: int):
+        """Suma (signo=1) o descuenta (signo=-1) un chunk de los agregados"""
+        documento = self._documentos.get(titulo)
+        if documento is None:
+            documento = self._documentos[titulo] = {"chunks": 0, "bytes": 0, "categorias": {}}
+        por_categoria = self._categoria(categoria)
+
+        antes = documento["categorias"].get(categoria, 0)
+        despues = antes + signo
+        if despues:
+            documento["categorias"][categoria] = despues
+        else:
+            documento["categorias"].pop(categoria, None)
+        # El documento cuenta en la categoría mientras tenga al menos un chunk en ella
+        if antes == 0 and despues > 0:
+            por_categoria["documentos"] += 1
+        elif antes > 0 and despues == 0:
+            por_categoria["documentos"] -= 1
+
+        documento["chunks"] += signo
+        documento["bytes"] += signo * n_bytes
+        por_categoria["chunks"] += signo
+        por_categoria["bytes"] += signo * n_bytes
+        self._bytes_total += signo * n_bytes
+        if documento["chunks"] <= 0:
+            del self._documentos[titulo]
+
+    def add(self, ids: List[str], textos: List[str], metadatas: List[Dict[str, Any]], dimension: int = 0, ingesta: bool = True):
+        """Registra chunks nuevos o reemplazados"""
+        with self._lock:
+            for chunk_id, texto, metadata in zip(ids, textos, metadatas):
+                previo = self._chunks.pop(chunk_id, None)
+                if previo is not None:
+                    self._sumar(previo[0], previo[1], previo[2], -1)
+                titulo = metadata.get("titulo", "")
+                categoria = metadata.get("categoria", CategoriaPQRS.OTROS.value)
+                n_bytes = len(texto.encode("utf-8"))
+                self._chunks[chunk_id] = [titulo, categoria, n_bytes]
+                self._sumar(titulo, categoria, n_bytes, 1)
+            if dimension:
+                self._dimension = dimension
+            if ingesta and ids:
+                self._ultima_ingesta = datetime.now().isoformat()
+            self._dirty = True
+
+    def set_categories(self, ids: List[str], categorias: List[str]):
+        """Mueve chunks de categoría (cambios solo de metadatos)"""
+        with self._lock:
+            for chunk_id, categoria in zip(ids, categorias):
+                previo = self._chunks.get(chunk_id)
+                if previo is None or previo[1] == categoria:
+                    continue
+                self._sumar(previo[0], previo[1], previo[2], -1)
+                previo[1] = categoria
+                self._sumar(previo[0], categoria, previo[2], 1)
+            self._dirty = True
+
+    def remove(self, ids: List[str]):
+        """Descuenta chunks eliminados"""
+        with self._lock:
+            for chunk_id in ids:
+                previo = self._chunks.pop(chunk_id, None)
+                if previo is not None:
+                    self._sumar(previo[0], previo[1], previo[2], -1)
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._dirty = True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._chunks)
+
+    def maybe_save(self, revision: int):
+        """Persiste si hay cambios y pasó el intervalo desde el último guardado"""
+        pendiente = self._dirty or revision != self._revision_guardada
+        if pendiente and time.monotonic() - self._ultimo_guardado >= self.save_interval:
+            self.save(revision)
+
+    def save(self, revision: int):
+        """Persiste los chunks registrados y la revisión de la colección que reflejan; los agregados se recalculan al cargar"""
+        if not self.path or (not self._dirty and revision == self._revision_guardada):
+            return
+        with self._lock:
+            datos = {
+                "revision": revision,
+                "dimension": self._dimension,
+                "ultima_ingesta": self._ultima_ingesta,
+                "chunks": self._chunks
+            }
+            contenido = json.dumps(datos, ensure_ascii=False, separators=(",", ":"))
+            self._dirty = False
+            self._ultimo_guardado = time.monotonic()
+            self._revision_guardada = revision
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(contenido)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self._dirty = True
+            self._revision_guardada = None
+            logger.warning(f"No se pudieron guardar las estadísticas de la base de conocimiento: {e}")
+
+    def load(self, total_chunks: int, revision: int) -> bool:
+        """Carga las estadísticas persistidas si corresponden a la revisión y al número de chunks de la colección"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+            if datos.get("revision") != revision or len(datos["chunks"]) != total_chunks:
+                logger.info("Estadísticas persistidas desactualizadas; se reconstruirán")
+                return False
+            with self._lock:
+                self._reset()
+                for chunk_id, (titulo, categoria, n_bytes) in datos["chunks"].items():
+                    self._chunks[chunk_id] = [titulo, categoria, n_bytes]
+                    self._sumar(titulo, categoria, n_bytes, 1)
+                self._dimension = datos.get("dimension", 0)
+                self._ultima_ingesta = datos.get("ultima_ingesta")
+                self._dirty = False
+                self._ultimo_guardado = time.monotonic()
+                self._revision_guardada = revision
+            return True
+        except Exception as e:
+            logger.warning(f"No se pudieron cargar las estadísticas de la base de conocimiento: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Resumen en tiempo constante (proporcional al número de categorías)"""
+        with self._lock:
+            total_chunks = len(self._chunks)
+            por_categoria = {
+                categoria.value: dict(self._por_categoria.get(categoria.value, {"chunks": 0, "documentos": 0, "bytes": 0}))
+                for categoria in CategoriaPQRS
+            }
+            return {
+                "chunks": total_chunks,
+                "documentos": len(self._documentos),
+                "bytes_texto": self._bytes_total,
+                "tokens_estimados": self._bytes_total // BYTES_POR_TOKEN,
+                "dimension_embeddings": self._dimension,
+                "memoria_embeddings_bytes": total_chunks * self._dimension * BYTES_POR_DIMENSION,
+                "por_categoria": por_categoria,
+                "ultima_ingesta": self._ultima_ingesta
+            }
+
+    def get_documents(self) -> List[Dict[str, Any]]:
+        """Chunks y bytes por documento, del más grande al más pequeño"""
+        with self._lock:
+            documentos = [
+                {
+                    "titulo": titulo,
+                    "categoria": max(datos["categorias"], key=datos["categorias"].get),
+                    "chunks": datos["chunks"],
+                    "bytes": datos["bytes"]
+                }
+                for titulo, datos in self._documentos.items()
+            ]
+        return sorted(documentos, key=lambda d: d["bytes"], reverse=True)
@@ -0,0 +1,249 @@
+import os
+import re
+import math
+import time
+import heapq
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun bajo bien cada casi como con contra cual
+cuales cuando de del desde donde dos el ella ellas ello ellos en entre era eran es esa esas ese eso esos esta
+estaba estan estar estas este esto estos fue fueron ha han hasta hay la las le les lo los mas me mi mis mucho
+muy nada ni no nos nuestra nuestro o otra otras otro otros para pero poco por porque que quien se sea segun ser
+si sin sobre solo son su sus tal tambien tan tanto te tiene tienen todo todos tu tus un una uno unos usted ustedes
+y ya yo
+""".split())
+
+# Sufijos que se recortan, del más largo al más corto
+SUFIJOS = (
+    "amientos", "imientos", "amiento", "imiento", "aciones", "uciones", "idades",
+    "mente", "acion", "ucion", "ancia", "encia", "ables", "ibles", "istas", "idad",
+    "ando", "iendo", "ados", "idos", "adas", "idas", "able", "ible", "ista", "osos", "osas",
+    "ado", "ido", "ada", "ida", "oso", "osa", "ion", "es", "os", "as", "s", "o", "a", "e"
+)
+
+def fold(texto: str) -> str:
+    """Pasa a minúsculas y quita tildes (la ñ se conserva como n)"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def stem(token: str) -> str:
+    """Stemmer ligero para español: recorta un sufijo conservando al menos 3 caracteres"""
+    if len(token) <= 3 or any(c.isdigit() for c in token):
+        return token
+    for sufijo in SUFIJOS:
+        if token.endswith(sufijo) and len(token) - len(sufijo) >= 3:
+            return token[:-len(sufijo)]
+    return token
+
+def tokenize(texto: str) -> List[str]:
+    """Tokeniza y normaliza un texto; números, direcciones y teléfonos se conservan tal cual"""
+    return [stem(t) for t in TOKEN_PATTERN.findall(fold(texto)) if t not in STOPWORDS]
+
+class LexicalIndex:
+    """Índice invertido BM25 en memoria sobre los chunks de la colección"""
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75, save_interval: float = 30.0):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.save_interval = save_interval
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._ultimo_guardado = 0.0
+        # Revisión de la colección que refleja la copia persistida
+        self._revision_guardada: Optional[int] = None
+        self._reset()
+
+    def _reset(self):
+        self._ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._libres: List[int] = []
+        self._terminos: List[Optional[Dict[str, int]]] = []
+        self._longitudes: List[int] = []
+        self._categorias: List[Optional[str]] = []
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._longitud_total = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._slots)
+
+    def add(self, ids: List[str], textos: List[str], categorias: List[str]):
+        """Añade o reemplaza chunks en el índice"""
+        with self._lock:
+            for chunk_id, texto, categoria in zip(ids, textos, categorias):
+                self._add_terms(chunk_id, Counter(tokenize(texto)), categoria)
+            self._dirty = True
+
+    def _add_terms(self, chunk_id: str, terminos: Dict[str, int], categoria: Optional[str]):
+        if chunk_id in self._slots:
+            self._remove_one(chunk_id)
+
+        slot = self._libres.pop() if self._libres else len(self._ids)
+        if slot == len(self._ids):
+            self._ids.append(None)
+            self._terminos.append(None)
+            self._longitudes.append(0)
+            self._categorias.append(None)
+
+        longitud = sum(terminos.values())
+        self._ids[slot] = chunk_id
+        self._terminos[slot] = dict(terminos)
+        self._longitudes[slot] = longitud
+        self._categorias[slot] = categoria
+        self._slots[chunk_id] = slot
+        self._longitud_total += longitud
+        for termino, tf in terminos.items():
+            self._postings.setdefault(termino, {})[slot] = tf
+
+    def remove(self, ids: Iterable[str]):
+        """Quita chunks del índice"""
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self._slots:
+                    self._remove_one(chunk_id)
+            self._dirty = True
+
+    def _remove_one(self, chunk_id: str):
+        slot = self._slots.pop(chunk_id)
+        for termino in self._terminos[slot]:
+            posting = self._postings[termino]
+            del posting[slot]
+            if not posting:
+                del self._postings[termino]
+        self._longitud_total -= self._longitudes[slot]
+        self._ids[slot] = None
+        self._terminos[slot] = None
+        self._longitudes[slot] = 0
+        self._categorias[slot] = None
+        self._libres.append(slot)
+
+    def set_categories(self, ids: List[str], categorias: List[str]):
+        """Actualiza la categoría de chunks ya indexados (cambios solo de metadatos)"""
+        with self._lock:
+            for chunk_id, categoria in zip(ids, categorias):
+                slot = self._slots.get(chunk_id)
+                if slot is not None:
+                    self._categorias[slot] = categoria
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._dirty = True
+
+    def search(self, query: str, n_results: int = 5, categoria: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Devuelve los (id, puntaje BM25) mejor puntuados para la consulta"""
+        terminos = set(tokenize(query))
+        with self._lock:
+            total_docs = len(self._slots)
+            if not terminos or total_docs == 0:
+                return []
+
+            longitud_media = self._longitud_total / total_docs
+            k1, b = self.k1, self.b
+            puntajes: Dict[int, float] = {}
+
+            for termino in terminos:
+                posting = self._postings.get(termino)
+                if not posting:
+                    continue
+                idf = math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for slot, tf in posting.items():
+                    if categoria is not None and self._categorias[slot] != categoria:
+                        continue
+                    norma = k1 * (1 - b + b * self._longitudes[slot] / longitud_media)
+                    puntajes[slot] = puntajes.get(slot, 0.0) + idf * tf * (k1 + 1) / (tf + norma)
+
+            mejores = heapq.nlargest(n_results, puntajes.items(), key=lambda item: item[1])
+            return [(self._ids[slot], puntaje) for slot, puntaje in mejores]
+
+    def maybe_save(self, revision: int):
+        """Persiste si hay cambios y pasó el intervalo desde el último guardado"""
+        pendiente = self._dirty or revision != self._revision_guardada
+        if pendiente and time.monotonic() - self._ultimo_guardado >= self.save_interval:
+            self.save(revision)
+
+    def save(self, revision: int):
+        """Persiste el índice como vocabulario y arreglos de (término, frecuencia) por chunk
+
+        `revision` es la revisión de la colección que el índice refleja; load() solo acepta la copia
+        si coincide con la revisión actual, así un cambio de texto sin cambio de conteo no pasa inadvertido.
+        """
+        if not self.path or (not self._dirty and revision == self._revision_guardada):
+            return
+        with self._lock:
+            ids = list(self._slots)
+            vocabulario = {termino: i for i, termino in enumerate(self._postings)}
+            offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+            term_ids, tfs = [], []
+            for i, chunk_id in enumerate(ids):
+                terminos = self._terminos[self._slots[chunk_id]]
+                term_ids.extend(vocabulario[t] for t in terminos)
+                tfs.extend(terminos.values())
+                offsets[i + 1] = len(term_ids)
+            categorias = [self._categorias[self._slots[chunk_id]] or "" for chunk_id in ids]
+            self._dirty = False
+            self._ultimo_guardado = time.monotonic()
+            self._revision_guardada = revision
+
+        try:
+            tmp_path = f"{self.path}.tmp.npz"
+            np.savez_compressed(
+                tmp_path,
+                ids=np.asarray(ids, dtype=str),
+                categorias=np.asarray(categorias, dtype=str),
+                vocabulario=np.asarray(list(vocabulario), dtype=str),
+                offsets=offsets,
+                term_ids=np.asarray(term_ids, dtype=np.int32),
+                tfs=np.asarray(tfs, dtype=np.int32),
+                revision=np.int64(revision)
+            )
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self._dirty = True
+            self._revision_guardada = None
+            logger.warning(f"No se pudo guardar el índice léxico: {e}")
+
+    def load(self, total_chunks: int, revision: int) -> bool:
+        """Carga el índice persistido si corresponde a la revisión y al número de chunks de la colección"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            data = np.load(self.path)
+            ids = data["ids"].tolist()
+            guardada = int(data["revision"]) if "revision" in data.files else None
+            if guardada != revision or len(ids) != total_chunks:
+                logger.info("Índice léxico persistido desactualizado; se reconstruirá")
+                return False
+
+            vocabulario = data["vocabulario"].tolist()
+            offsets, term_ids, tfs = data["offsets"], data["term_ids"].tolist(), data["tfs"].tolist()
+            categorias = data["categorias"].tolist()
+            with self._lock:
+                self._reset()
+                for i, chunk_id in enumerate(ids):
+                    inicio, fin = offsets[i], offsets[i + 1]
+                    terminos = {vocabulario[t]: tf for t, tf in zip(term_ids[inicio:fin], tfs[inicio:fin])}
+                    self._add_terms(chunk_id, terminos, categorias[i] or None)
+                self._dirty = False
+                self._ultimo_guardado = time.monotonic()
+                self._revision_guardada = revision
+            return True
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el índice léxico: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"chunks": len(self._slots), "terminos": len(self._postings)}
@@ -0,0 +1,364 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, AsyncIterator, Callable, Awaitable
+import httpx
+import openai
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.deadline import remaining, has_time
+
+logger = logging.getLogger(__name__)
+
+# Errores transitorios del proveedor que vale la pena reintentar
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    asyncio.TimeoutError
+)
+
+# Muestras de latencia por operación para estimar el percentil de hedging
+LATENCY_WINDOW = 200
+
+llm_calls_total = metrics.counter("llm_calls_total", "Llamadas al LLM según su resultado", ("operacion", "resultado"))
+llm_retries_total = metrics.counter("llm_retries_total", "Reintentos de llamadas al LLM según el motivo", ("operacion", "motivo"))
+llm_hedges_total = metrics.counter("llm_hedges_total", "Solicitudes duplicadas (hedging) lanzadas y ganadas", ("operacion", "resultado"))
+llm_breaker_rejections_total = metrics.counter("llm_breaker_rejections_total", "Llamadas rechazadas con el circuito abierto", ("operacion",))
+llm_breaker_transitions_total = metrics.counter("llm_breaker_transitions_total", "Cambios de estado del circuito", ("estado",))
+
+class LLMUnavailableError(Exception):
+    """El proveedor está degradado: circuito abierto o reintentos agotados"""
+
+class CircuitBreaker:
+    """Circuito cerrado / abierto / semiabierto según los fallos consecutivos"""
+
+    CERRADO = "cerrado"
+    ABIERTO = "abierto"
+    SEMIABIERTO = "semiabierto"
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._estado = self.CERRADO
+        self._fallos = 0
+        self._abierto_desde = 0.0
+        self._sonda_en_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            return self._estado
+
+    def allow(self) -> bool:
+        """Indica si se puede llamar al proveedor; con el circuito semiabierto deja pasar una sola sonda"""
+        with self._lock:
+            if self._estado == self.ABIERTO:
+                if time.monotonic() - self._abierto_desde < self.cooldown:
+                    return False
+                self._transition(self.SEMIABIERTO)
+            if self._estado == self.SEMIABIERTO:
+                if self._sonda_en_curso:
+                    return False
+                self._sonda_en_curso = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._fallos = 0
+            self._sonda_en_curso = False
+            if self._estado != self.CERRADO:
+                self._transition(self.CERRADO)
+
+    def release(self):
+        """Libera la sonda sin contar éxito ni fallo (la llamada no llegó a evaluar al proveedor)"""
+        with self._lock:
+            self._sonda_en_curso = False
+
+    def record_failure(self):
+        with self._lock:
+            self._fallos += 1
+            self._sonda_en_curso = False
+            if self._estado == self.SEMIABIERTO or self._fallos >= self.failure_threshold:
+                self._abierto_desde = time.monotonic()
+                if self._estado != self.ABIERTO:
+                    self._transition(self.ABIERTO)
+
+    def _transition(self, estado: str):
+        logger.warning(f"Circuito del LLM: {self._estado} -> {estado} ({self._fallos} fallos consecutivos)")
+        self._estado = estado
+        llm_breaker_transitions_total.inc(estado=estado)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "estado": self._estado,
+                "fallos_consecutivos": self._fallos,
+                "umbral_fallos": self.failure_threshold,
+                "enfriamiento_s": self.cooldown
+            }
+
+class ResilientLLMClient:
+    """Capa sobre chat.completions con pool de conexiones, timeouts, reintentos, hedging y circuito"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._client = None
+        self.breaker = CircuitBreaker(settings.llm_breaker_failures, settings.llm_breaker_cooldown)
+        self._latencias: Dict[str, deque] = {}
+        self._operaciones: set = set()
+        self._lock = threading.Lock()
+        metrics.gauge(
+            "llm_breaker_open", "1 si el circuito del LLM está abierto (rechaza llamadas), 0 si no",
+            funcion=lambda: 1.0 if self.breaker.estado == CircuitBreaker.ABIERTO else 0.0
+        )
+
+    @property
+    def client(self):
+        # El cliente HTTP se crea en el primer uso, no al importar el módulo
+        if self._client is None:
+            self._client = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url or None,
+                # Los reintentos los maneja esta capa, con jitter y contando contra el circuito
+                max_retries=0,
+                timeout=httpx.Timeout(settings.llm_timeout, connect=settings.llm_connect_timeout),
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.llm_max_connections,
+                        max_keepalive_connections=settings.llm_max_keepalive,
+                        keepalive_expiry=settings.llm_keepalive_expiry
+                    ),
+                    timeout=httpx.Timeout(settings.llm_timeout, connect=settings.llm_connect_timeout)
+                )
+            )
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    async def aclose(self):
+        """Cierra las conexiones del pool al apagar la aplicación"""
+        if self._client is not None and hasattr(self._client, "close"):
+            await self._client.close()
+        self._client = None
+
+    async def complete(
+        self,
+        operacion: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        timeout: Optional[float] = None,
+        hedge: bool = False
+    ) -> str:
+        """Devuelve el texto de una completion; LLMUnavailableError si el proveedor está degradado"""
+        async def llamada() -> str:
+            response = await self._within_deadline(
+                self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                ),
+                timeout
+            )
+            return response.choices[0].message.content.strip()
+
+        if hedge and settings.llm_hedge_enabled:
+            return await self._with_retries(operacion, lambda: self._hedged(operacion, llamada))
+        return await self._with_retries(operacion, llamada)
+
+    async def stream(
+        self,
+        operacion: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Emite los tokens de una completion; los reintentos solo aplican antes del primer token"""
+        async def abrir():
+            stream = await self._within_deadline(
+                self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True
+                ),
+                timeout
+            )
+            iterador = stream.__aiter__()
+            try:
+                primero = await self._within_deadline(iterador.__anext__(), timeout)
+            except StopAsyncIteration:
+                primero = None
+            return primero, iterador
+
+        primero, iterador = await self._with_retries(operacion, abrir)
+        if primero is None:
+            return
+        if primero.choices and primero.choices[0].delta.content:
+            yield primero.choices[0].delta.content
+        async for chunk in iterador:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def _within_deadline(self, awaitable: Awaitable[Any], timeout: Optional[float]) -> Any:
+        """Espera la llamada con el menor entre su timeout y el plazo restante de la solicitud"""
+        timeout = timeout or settings.llm_timeout
+        restante = remaining()
+        limitado = restante is not None and restante - settings.deadline_safety_seconds < timeout
+        if limitado:
+            timeout = restante - settings.deadline_safety_seconds
+            if timeout <= 0:
+                if asyncio.iscoroutine(awaitable):
+                    awaitable.close()
+                raise LLMUnavailableError("Plazo de la solicitud agotado")
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            if limitado:
+                # El corte lo impuso el plazo de la solicitud, no una falla del proveedor
+                raise LLMUnavailableError(f"Plazo de la solicitud agotado esperando al LLM ({timeout:.1f}s)")
+            raise
+
+    async def _with_retries(self, operacion: str, llamada: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecuta la llamada con reintentos con jitter en errores transitorios, respetando el circuito"""
+        self._operaciones.add(operacion)
+        if not self.breaker.allow():
+            llm_breaker_rejections_total.inc(operacion=operacion)
+            llm_calls_total.inc(operacion=operacion, resultado="rechazada")
+            raise LLMUnavailableError("Circuito del LLM abierto")
+
+        # La sonda del circuito semiabierto se libera siempre que la llamada no termine con un veredicto
+        # (éxito o fallo del proveedor), incluida la cancelación por desconexión, hedging o lotes
+        resuelto = False
+        try:
+            for intento in range(settings.llm_max_retries + 1):
+                inicio = time.perf_counter()
+                try:
+                    resultado = await llamada()
+                except LLMUnavailableError:
+                    llm_calls_total.inc(operacion=operacion, resultado="sin_plazo")
+                    raise
+                except RETRYABLE_ERRORS as e:
+                    motivo = self._retry_reason(e)
+                    espera = self._backoff(intento, e)
+                    if intento >= settings.llm_max_retries or not has_time(espera + settings.deadline_safety_seconds):
+                        self.breaker.record_failure()
+                        resuelto = True
+                        llm_calls_total.inc(operacion=operacion, resultado="fallida")
+                        logger.error(f"LLM no disponible para {operacion} tras {intento + 1} intentos: {motivo}")
+                        raise LLMUnavailableError(f"Reintentos agotados ({motivo})") from e
+
+                    llm_retries_total.inc(operacion=operacion, motivo=motivo)
+                    logger.warning(f"Reintentando {operacion} en {espera:.2f}s (intento {intento + 1}, {motivo})")
+                    await asyncio.sleep(espera)
+                    continue
+                except Exception:
+                    # Errores del cliente (4xx, respuesta inválida): no indican degradación, pero tampoco
+                    # que el proveedor responda bien, así que no cierran el circuito
+                    llm_calls_total.inc(operacion=operacion, resultado="error")
+                    raise
+
+                self.breaker.record_success()
+                resuelto = True
+                self._record_latency(operacion, time.perf_counter() - inicio)
+                llm_calls_total.inc(operacion=operacion, resultado="ok")
+                return resultado
+        except BaseException:
+            if not resuelto:
+                self.breaker.release()
+            raise
+
+    async def _hedged(self, operacion: str, llamada: Callable[[], Awaitable[str]]) -> str:
+        """Lanza un duplicado si la primera llamada supera el percentil de latencia y toma la primera respuesta"""
+        retraso = self.hedge_delay(operacion)
+        primera = asyncio.create_task(llamada())
+        if retraso is None:
+            return await primera
+
+        tareas = {primera}
+        try:
+            hechas, _ = await asyncio.wait(tareas, timeout=retraso)
+            if not hechas:
+                llm_hedges_total.inc(operacion=operacion, resultado="lanzada")
+                tareas.add(asyncio.create_task(llamada()))
+
+            error = None
+            while tareas:
+                hechas, tareas = await asyncio.wait(tareas, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in hechas:
+                    if tarea.exception() is None:
+                        if tarea is not primera:
+                            llm_hedges_total.inc(operacion=operacion, resultado="ganada")
+                        return tarea.result()
+                    error = tarea.exception()
+            raise error
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+
+    def hedge_delay(self, operacion: str) -> Optional[float]:
+        """Percentil configurado de las latencias recientes; None mientras no haya muestras suficientes"""
+        with self._lock:
+            muestras = sorted(self._latencias.get(operacion, ()))
+        if len(muestras) < settings.llm_hedge_min_samples:
+            return None
+        indice = min(len(muestras) - 1, int(len(muestras) * settings.llm_hedge_percentile / 100))
+        return max(settings.llm_hedge_min_delay, muestras[indice])
+
+    def _record_latency(self, operacion: str, segundos: float):
+        with self._lock:
+            self._latencias.setdefault(operacion, deque(maxlen=LATENCY_WINDOW)).append(segundos)
+
+    @staticmethod
+    def _retry_reason(error: Exception) -> str:
+        if isinstance(error, openai.RateLimitError):
+            return "429"
+        if isinstance(error, openai.APIStatusError):
+            return str(error.status_code)
+        if isinstance(error, (openai.APITimeoutError, asyncio.TimeoutError)):
+            return "timeout"
+        return "conexion"
+
+    @staticmethod
+    def _backoff(intento: int, error: Exception) -> float:
+        """Backoff exponencial con jitter completo; respeta Retry-After si el proveedor lo envía"""
+        tope = min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * (2 ** intento))
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after", ""))
+                return min(settings.llm_retry_max_delay, retry_after)
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, tope)
+
+    def get_stats(self) -> Dict[str, Any]:
+        operaciones = {}
+        for operacion in sorted(self._operaciones):
+            retraso = self.hedge_delay(operacion)
+            operaciones[operacion] = {
+                "ok": llm_calls_total.value(operacion=operacion, resultado="ok"),
+                "errores": llm_calls_total.value(operacion=operacion, resultado="error"),
+                "fallidas": llm_calls_total.value(operacion=operacion, resultado="fallida"),
+                "rechazadas": llm_calls_total.value(operacion=operacion, resultado="rechazada"),
+                "reintentos": llm_retries_total.total(operacion=operacion),
+                "hedges_lanzados": llm_hedges_total.value(operacion=operacion, resultado="lanzada"),
+                "hedges_ganados": llm_hedges_total.value(operacion=operacion, resultado="ganada"),
+                "retraso_hedge_s": round(retraso, 3) if retraso is not None else None
+            }
+        return {
+            "circuito": self.breaker.get_stats(),
+            "hedging": settings.llm_hedge_enabled,
+            "operaciones": operaciones
+        }
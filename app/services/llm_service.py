@@ -1,20 +1,72 @@
+import asyncio
 import logging
 import time
-from typing import List, Dict, Any, Optional
-import openai
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Callable
 from app.config import settings
-from app.models import PQRSRequest, PQRSResponse, CategoriaPQRS
+from app.models import PQRSRequest, PQRSResponse, PQRSBatchItem, CategoriaPQRS
 from app.services.vector_store import vector_store
+from app.services.executor import run_blocking
+from app.services.response_cache import SemanticResponseCache, despersonalizar, personalizar
+from app.services.context_packer import ContextPacker
+from app.services.lexical_index import fold
+from app.services.metrics import stage, rag_requests_total
+from app.services.llm_client import ResilientLLMClient, LLMUnavailableError
+from app.services.deadline import deadline_scope, item_scope, current_deadline, remaining, has_time, degrade
 
 logger = logging.getLogger(__name__)
 
+CHAT_FALLBACK = "Lo siento, no puedo procesar tu consulta en este momento. Por favor contacta directamente a la Secretaría de Infraestructura."
+CHAT_SIN_TIEMPO = "No alcancé a preparar una respuesta en el tiempo disponible. Por favor intenta de nuevo en unos momentos."
+
 class LLMService:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.openai_api_key)
         self.model = "gpt-3.5-turbo"
+        self.llm = ResilientLLMClient(self.model)
+        self.response_cache = SemanticResponseCache(
+            threshold=settings.response_cache_threshold,
+            max_size=settings.response_cache_size,
+            ttl=settings.response_cache_ttl
+        )
+        self.context_packer = ContextPacker(self.model)
         
-    def classify_pqrs(self, titulo: str, descripcion: str) -> CategoriaPQRS:
+    @property
+    def client(self):
+        return self.llm.client
+    
+    @client.setter
+    def client(self, value):
+        self.llm.client = value
+    
+    async def classify_pqrs(self, titulo: str, descripcion: str) -> CategoriaPQRS:
         """Clasifica automáticamente una PQRS según su contenido"""
+        # Sin tiempo para una llamada extra al LLM, se acepta la mejor estimación local
+        sin_tiempo = not has_time(settings.deadline_classify_min_seconds)
+        
+        # Intentar primero con el clasificador local de centroides
+        if settings.local_classifier_enabled:
+            try:
+                embedding = await vector_store.encode_query_async(f"{titulo} {descripcion}")
+                categoria, margen = vector_store.classify_embeddings([embedding])[0]
+                if categoria is not None and margen >= settings.local_classifier_min_margin:
+                    logger.info(f"PQRS clasificada localmente como {categoria.value} (margen {margen:.3f})")
+                    return categoria
+                if categoria is not None and sin_tiempo:
+                    logger.info(f"Plazo corto: se acepta la clasificación local {categoria.value} (margen {margen:.3f})")
+                    degrade("clasificacion_local")
+                    return categoria
+                logger.info(f"Margen de clasificación local insuficiente ({margen:.3f}); usando el LLM")
+            except Exception as e:
+                logger.warning(f"Error en clasificación local: {e}")
+        
+        if sin_tiempo:
+            logger.info("Plazo corto y sin clasificación local: se omite la clasificación con el LLM")
+            degrade("clasificacion_omitida")
+            return CategoriaPQRS.OTROS
+        
+        return await self._classify_with_llm(titulo, descripcion)
+    
+    async def _classify_with_llm(self, titulo: str, descripcion: str) -> CategoriaPQRS:
+        """Clasifica una PQRS con una llamada al LLM"""
         try:
             prompt = f"""
             Analiza el siguiente título y descripción de una PQRS relacionada con infraestructura urbana de Medellín:
@@ -35,14 +87,7 @@ class LLMService:
             Responde únicamente con el nombre de la categoría (sin comillas):
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=50,
-                temperature=0.1
-            )
-            
-            categoria_text = response.choices[0].message.content.strip().lower()
+            categoria_text = (await self.llm.complete("clasificacion", prompt, max_tokens=50, temperature=0.1)).lower()
             
             # Mapear respuesta a enum
             categoria_map = {
@@ -62,65 +107,488 @@ class LLMService:
             logger.error(f"Error clasificando PQRS: {e}")
             return CategoriaPQRS.OTROS
     
-    def generate_pqrs_response(self, pqrs: PQRSRequest) -> PQRSResponse:
-        """Genera una respuesta completa para una PQRS usando RAG"""
+    async def generate_pqrs_response(self, pqrs: PQRSRequest) -> PQRSResponse:
+        """Genera una respuesta completa para una PQRS usando RAG, dentro del plazo de la solicitud si lo hay"""
+        if current_deadline() is None:
+            # Sin plazo activo (scripts, pruebas): solo se registran las degradaciones
+            with deadline_scope(None):
+                return await self._generate_pqrs_response(pqrs)
+        return await self._generate_pqrs_response(pqrs)
+    
+    async def _generate_pqrs_response(self, pqrs: PQRSRequest) -> PQRSResponse:
         start_time = time.time()
         
         try:
-            # 1. Clasificar automáticamente si no se proporcionó categoría
-            categoria_detectada = pqrs.categoria or self.classify_pqrs(pqrs.titulo, pqrs.descripcion)
-            
-            # 2. Buscar documentos relevantes
             query = f"{pqrs.titulo} {pqrs.descripcion}"
-            documentos_relevantes = vector_store.search_similar(
-                query=query,
-                n_results=5,
-                categoria=categoria_detectada
-            )
             
-            # 3. Preparar contexto
-            contexto_docs = "\n\n".join([
-                f"Documento: {doc['metadata']['titulo']}\nContenido: {doc['documento']}"
-                for doc in documentos_relevantes
-            ])
+            # 0. Reutilizar una respuesta cacheada para una PQRS semánticamente equivalente
+            query_embedding, cache_key, cached = await self._lookup_cached_pqrs(pqrs, query, start_time)
+            if cached:
+                rag_requests_total.inc(pipeline="pqrs", resultado="cache")
+                return cached
             
-            # 4. Generar respuesta usando LLM
-            respuesta = self._generate_response_with_context(pqrs, contexto_docs, categoria_detectada)
+            # 1-2. Clasificar y buscar documentos relevantes
+            categoria_detectada, documentos_relevantes = await self._retrieve_for_pqrs(pqrs, query)
             
-            # 5. Generar recomendaciones
-            recomendaciones = self._generate_recommendations(pqrs, categoria_detectada)
+            # 3. Preparar el prompt con el contexto dentro del presupuesto de tokens
+            with stage("pqrs", "prompt"):
+                prompt, documentos_relevantes = self._pack_pqrs_prompt(pqrs, documentos_relevantes, categoria_detectada)
             
-            # 6. Calcular tiempo de respuesta
-            tiempo_respuesta = time.time() - start_time
+            # 4. Generar respuesta usando LLM (plantilla si el proveedor está degradado o no queda tiempo)
+            plantilla = False
+            with stage("pqrs", "generacion"):
+                max_tokens = self._generation_max_tokens(800)
+                try:
+                    if max_tokens is None:
+                        raise LLMUnavailableError(f"Tiempo insuficiente para generar ({remaining():.1f}s restantes)")
+                    respuesta = await self._generate_response_with_context(prompt, max_tokens)
+                except LLMUnavailableError as e:
+                    logger.warning(f"LLM no disponible, respondiendo con plantilla: {e}")
+                    respuesta = self._templated_pqrs_answer(pqrs, categoria_detectada, documentos_relevantes)
+                    plantilla = True
+                    degrade("respuesta_plantilla")
             
-            # 7. Calcular confianza basada en similitud de documentos
-            confianza = self._calculate_confidence(documentos_relevantes)
-            
-            return PQRSResponse(
-                pqrs_id=f"PQRS_{int(time.time())}",
-                respuesta=respuesta,
-                documentos_referencia=[doc['metadata']['titulo'] for doc in documentos_relevantes],
-                confianza=confianza,
-                categoria_detectada=categoria_detectada,
-                tiempo_respuesta=tiempo_respuesta,
-                recomendaciones=recomendaciones
-            )
+            # 5-7. Recomendaciones, confianza y tiempo de respuesta (la plantilla no se cachea)
+            with stage("pqrs", "recomendaciones"):
+                response = self._finalize_pqrs_response(
+                    pqrs, respuesta, categoria_detectada, documentos_relevantes,
+                    None if plantilla else query_embedding, cache_key, start_time
+                )
+            rag_requests_total.inc(pipeline="pqrs", resultado="plantilla" if plantilla else "ok")
+            return response
             
         except Exception as e:
             logger.error(f"Error generando respuesta PQRS: {e}")
-            # Respuesta de fallback
-            return PQRSResponse(
-                pqrs_id=f"PQRS_ERROR_{int(time.time())}",
-                respuesta="Lo sentimos, hubo un error procesando su solicitud. Por favor contacte directamente a la Secretaría de Infraestructura.",
-                documentos_referencia=[],
-                confianza=0.0,
-                categoria_detectada=CategoriaPQRS.OTROS,
-                tiempo_respuesta=time.time() - start_time,
-                recomendaciones=["Contactar directamente a la Secretaría de Infraestructura"]
+            rag_requests_total.inc(pipeline="pqrs", resultado="error")
+            return self._fallback_pqrs_response(start_time)
+    
+    async def stream_pqrs_response(self, pqrs: PQRSRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Genera la respuesta de una PQRS como eventos: metadatos, tokens y respuesta final"""
+        if current_deadline() is None:
+            # Sin plazo activo (scripts, pruebas): solo se registran las degradaciones
+            with deadline_scope(None):
+                async for evento in self._stream_pqrs_response(pqrs):
+                    yield evento
+            return
+        async for evento in self._stream_pqrs_response(pqrs):
+            yield evento
+    
+    async def _stream_pqrs_response(self, pqrs: PQRSRequest) -> AsyncIterator[Dict[str, Any]]:
+        start_time = time.time()
+        
+        try:
+            query = f"{pqrs.titulo} {pqrs.descripcion}"
+            
+            query_embedding, cache_key, cached = await self._lookup_cached_pqrs(pqrs, query, start_time)
+            if cached:
+                rag_requests_total.inc(pipeline="pqrs", resultado="cache")
+                yield {"event": "metadata", "data": {
+                    "categoria_detectada": cached.categoria_detectada.value,
+                    "documentos_referencia": cached.documentos_referencia,
+                    "confianza": cached.confianza
+                }}
+                yield {"event": "token", "data": {"texto": cached.respuesta}}
+                yield {"event": "final", "data": cached.dict()}
+                return
+            
+            categoria_detectada, documentos_relevantes = await self._retrieve_for_pqrs(pqrs, query)
+            with stage("pqrs", "prompt"):
+                prompt, documentos_relevantes = self._pack_pqrs_prompt(pqrs, documentos_relevantes, categoria_detectada)
+            
+            # Enviar primero los metadatos de la recuperación
+            yield {"event": "metadata", "data": {
+                "categoria_detectada": categoria_detectada.value,
+                "documentos_referencia": [doc['metadata']['titulo'] for doc in documentos_relevantes],
+                "confianza": self._calculate_confidence(documentos_relevantes)
+            }}
+            
+            # Mismo presupuesto y plantilla que la respuesta no streaming
+            partes = []
+            plantilla = False
+            with stage("pqrs", "generacion"):
+                max_tokens = self._generation_max_tokens(800)
+                try:
+                    if max_tokens is None:
+                        raise LLMUnavailableError(f"Tiempo insuficiente para generar ({remaining():.1f}s restantes)")
+                    async for token in self._stream_completion(prompt, max_tokens=max_tokens, temperature=0.7):
+                        partes.append(token)
+                        yield {"event": "token", "data": {"texto": token}}
+                except LLMUnavailableError as e:
+                    # Solo se lanza antes del primer token, así que no hay texto parcial enviado
+                    logger.warning(f"LLM no disponible, respondiendo con plantilla: {e}")
+                    partes = [self._templated_pqrs_answer(pqrs, categoria_detectada, documentos_relevantes)]
+                    plantilla = True
+                    degrade("respuesta_plantilla")
+                    yield {"event": "token", "data": {"texto": partes[0]}}
+            
+            with stage("pqrs", "recomendaciones"):
+                response = self._finalize_pqrs_response(
+                    pqrs, "".join(partes).strip(), categoria_detectada, documentos_relevantes,
+                    None if plantilla else query_embedding, cache_key, start_time
+                )
+            rag_requests_total.inc(pipeline="pqrs", resultado="plantilla" if plantilla else "ok")
+            yield {"event": "final", "data": response.dict()}
+            
+        except Exception as e:
+            logger.error(f"Error generando respuesta PQRS en streaming: {e}")
+            rag_requests_total.inc(pipeline="pqrs", resultado="error")
+            yield {"event": "error", "data": self._fallback_pqrs_response(start_time).dict()}
+    
+    async def _lookup_cached_pqrs(self, pqrs: PQRSRequest, query: str, start_time: float) -> Tuple[Optional[List[float]], Optional[tuple], Optional[PQRSResponse]]:
+        """Busca en la caché semántica una respuesta reutilizable para la PQRS"""
+        if not settings.response_cache_enabled:
+            return None, None, None
+        
+        with stage("pqrs", "embedding"):
+            query_embedding = await vector_store.encode_query_async(query)
+        cache_key, cached = self._cached_pqrs_response(pqrs, query_embedding, start_time)
+        return query_embedding, cache_key, cached
+    
+    def _cached_pqrs_response(self, pqrs: PQRSRequest, query_embedding: List[float], start_time: float) -> Tuple[tuple, Optional[PQRSResponse]]:
+        """Consulta la caché semántica con un embedding ya calculado"""
+        # La ubicación entra en el prompt: solo se reutilizan respuestas para la misma ubicación
+        ubicacion = " ".join(fold(pqrs.ubicacion or "").split()) or None
+        cache_key = ("pqrs", pqrs.categoria.value if pqrs.categoria else None, pqrs.tipo.value, ubicacion)
+        cached = self.response_cache.lookup(query_embedding, cache_key, vector_store.version)
+        if not cached:
+            return cache_key, None
+        
+        valor = cached["valor"]
+        logger.info(f"Respuesta PQRS servida desde caché (similitud {cached['similitud']:.3f})")
+        return cache_key, PQRSResponse(
+            pqrs_id=f"PQRS_{int(time.time())}",
+            respuesta=personalizar(valor["respuesta"], pqrs.ciudadano_nombre),
+            documentos_referencia=valor["documentos_referencia"],
+            confianza=valor["confianza"],
+            categoria_detectada=valor["categoria_detectada"],
+            tiempo_respuesta=time.time() - start_time,
+            recomendaciones=valor["recomendaciones"]
+        )
+    
+    async def generate_pqrs_batch(self, solicitudes: List[PQRSRequest]) -> AsyncIterator[PQRSBatchItem]:
+        """Procesa un lote de PQRS y emite cada resultado, con su índice, a medida que termina"""
+        start_time = time.time()
+        queries = [f"{pqrs.titulo} {pqrs.descripcion}" for pqrs in solicitudes]
+        
+        try:
+            # 1. Embeddings de todas las consultas en una sola pasada del modelo
+            with stage("lote", "embedding"):
+                embeddings = await run_blocking(vector_store.encode_queries, queries)
+        except Exception as e:
+            logger.error(f"Error generando embeddings del lote de {len(solicitudes)} PQRS: {e}")
+            for i in range(len(solicitudes)):
+                yield PQRSBatchItem(indice=i, success=False, error="Error generando embeddings del lote")
+            return
+        
+        # 2. Servir desde la caché las PQRS equivalentes a otras ya respondidas
+        pendientes, cache_keys = [], {}
+        for i, (pqrs, embedding) in enumerate(zip(solicitudes, embeddings)):
+            if settings.response_cache_enabled:
+                cache_keys[i], cached = self._cached_pqrs_response(pqrs, embedding, start_time)
+                if cached:
+                    rag_requests_total.inc(pipeline="lote", resultado="cache")
+                    yield PQRSBatchItem(indice=i, success=True, respuesta=cached)
+                    continue
+            pendientes.append(i)
+        
+        if not pendientes:
+            return
+        
+        semaforo = asyncio.Semaphore(settings.batch_generation_concurrency)
+        
+        # 3-4. Clasificar sobre los embeddings ya calculados y recuperar con una consulta por categoría
+        with stage("lote", "clasificacion"):
+            categorias = await self._classify_batch(
+                [solicitudes[i] for i in pendientes], [embeddings[i] for i in pendientes], semaforo
+            )
+        n_results, hibrido = 5, None
+        if not has_time(settings.deadline_retrieval_min_seconds):
+            n_results, hibrido = settings.deadline_reduced_results, False
+            degrade("recuperacion_reducida")
+        with stage("lote", "busqueda"):
+            documentos = await run_blocking(
+                vector_store.search_similar_batch,
+                [queries[i] for i in pendientes],
+                [embeddings[i] for i in pendientes],
+                n_results,
+                categorias,
+                hibrido
+            )
+        t_preparacion = time.time() - start_time
+        
+        # 5. Generar las respuestas con concurrencia acotada; cada PQRS ajusta su presupuesto al tiempo
+        # que quede cuando le toca el turno y registra sus propias degradaciones
+        async def generar(j: int, i: int) -> PQRSBatchItem:
+            pqrs = solicitudes[i]
+            try:
+                with item_scope():
+                    async with semaforo:
+                        with stage("lote", "prompt"):
+                            prompt, documentos_usados = self._pack_pqrs_prompt(pqrs, documentos[j], categorias[j])
+                        plantilla = False
+                        with stage("lote", "generacion"):
+                            max_tokens = self._generation_max_tokens(800)
+                            try:
+                                if max_tokens is None:
+                                    raise LLMUnavailableError(f"Tiempo insuficiente para generar ({remaining():.1f}s restantes)")
+                                respuesta = await self._generate_response_with_context(prompt, max_tokens)
+                            except LLMUnavailableError:
+                                respuesta = self._templated_pqrs_answer(pqrs, categorias[j], documentos_usados)
+                                plantilla = True
+                                degrade("respuesta_plantilla")
+                    with stage("lote", "recomendaciones"):
+                        response = self._finalize_pqrs_response(
+                            pqrs, respuesta, categorias[j], documentos_usados,
+                            embeddings[i] if i in cache_keys and not plantilla else None, cache_keys.get(i), start_time
+                        )
+                rag_requests_total.inc(pipeline="lote", resultado="plantilla" if plantilla else "ok")
+                return PQRSBatchItem(indice=i, success=True, respuesta=response)
+            except Exception as e:
+                rag_requests_total.inc(pipeline="lote", resultado="error")
+                logger.error(f"Error generando respuesta para la PQRS {i} del lote: {e}")
+                return PQRSBatchItem(indice=i, success=False, error="Error generando respuesta")
+        
+        tareas = [asyncio.create_task(generar(j, i)) for j, i in enumerate(pendientes)]
+        try:
+            for tarea in asyncio.as_completed(tareas):
+                yield await tarea
+        finally:
+            # Si el cliente se desconecta a mitad del streaming, no seguir generando
+            for tarea in tareas:
+                tarea.cancel()
+        
+        logger.info(
+            f"Lote de {len(solicitudes)} PQRS procesado en {time.time() - start_time:.2f}s "
+            f"({len(solicitudes) - len(pendientes)} desde caché, preparación {t_preparacion:.2f}s)"
+        )
+    
+    async def classify_pqrs_batch(self, solicitudes: List[PQRSRequest]) -> List[CategoriaPQRS]:
+        """Clasifica un lote de PQRS con un solo encode; respeta la categoría si ya viene informada"""
+        embeddings = await run_blocking(
+            vector_store.encode_queries, [f"{pqrs.titulo} {pqrs.descripcion}" for pqrs in solicitudes]
+        )
+        semaforo = asyncio.Semaphore(settings.batch_generation_concurrency)
+        return await self._classify_batch(solicitudes, embeddings, semaforo)
+    
+    async def _classify_batch(
+        self,
+        solicitudes: List[PQRSRequest],
+        embeddings: List[List[float]],
+        semaforo: asyncio.Semaphore
+    ) -> List[CategoriaPQRS]:
+        """Clasifica un lote: centroides locales sobre los embeddings y LLM solo para los casos dudosos"""
+        categorias = [pqrs.categoria for pqrs in solicitudes]
+        sin_categoria = [i for i, categoria in enumerate(categorias) if categoria is None]
+        dudosas = sin_categoria
+        # Sin tiempo para llamadas extra al LLM, se acepta la mejor estimación local, como en classify_pqrs
+        sin_tiempo = not has_time(settings.deadline_classify_min_seconds)
+        
+        if sin_categoria and settings.local_classifier_enabled:
+            try:
+                locales = await run_blocking(vector_store.classify_embeddings, [embeddings[i] for i in sin_categoria])
+                dudosas = []
+                for i, (categoria, margen) in zip(sin_categoria, locales):
+                    if categoria is not None and margen >= settings.local_classifier_min_margin:
+                        categorias[i] = categoria
+                    elif categoria is not None and sin_tiempo:
+                        categorias[i] = categoria
+                        degrade("clasificacion_local")
+                    else:
+                        dudosas.append(i)
+            except Exception as e:
+                logger.warning(f"Error en clasificación local del lote: {e}")
+                dudosas = sin_categoria
+        
+        if dudosas and sin_tiempo:
+            logger.info(f"Plazo corto: se omite la clasificación con el LLM de {len(dudosas)} PQRS del lote")
+            for i in dudosas:
+                categorias[i] = CategoriaPQRS.OTROS
+            degrade("clasificacion_omitida")
+            dudosas = []
+        
+        async def clasificar_con_llm(i: int):
+            async with semaforo:
+                categorias[i] = await self._classify_with_llm(solicitudes[i].titulo, solicitudes[i].descripcion)
+        
+        await asyncio.gather(*(clasificar_con_llm(i) for i in dudosas))
+        if sin_categoria:
+            logger.info(
+                f"Lote: {len(sin_categoria) - len(dudosas)} PQRS clasificadas localmente, "
+                f"{len(dudosas)} con el LLM"
             )
+        return categorias
     
-    def _generate_response_with_context(self, pqrs: PQRSRequest, contexto: str, categoria: CategoriaPQRS) -> str:
-        """Genera respuesta usando el contexto de documentos relevantes"""
+    async def _retrieve_for_pqrs(self, pqrs: PQRSRequest, query: str, n_results: int = 5) -> Tuple[CategoriaPQRS, List[Dict[str, Any]]]:
+        """Clasifica la PQRS (si hace falta) y recupera los documentos relevantes"""
+        hibrido = None
+        if not has_time(settings.deadline_retrieval_min_seconds):
+            # Poco tiempo: menos documentos, sin fusión léxica ni segunda búsqueda filtrada
+            n_results = min(n_results, settings.deadline_reduced_results)
+            hibrido = False
+            degrade("recuperacion_reducida")
+        
+        if pqrs.categoria is None and settings.speculative_retrieval:
+            return await self._speculative_retrieve(pqrs, query, n_results, hibrido)
+        
+        # Clasificar automáticamente si no se proporcionó categoría
+        inicio = time.perf_counter()
+        with stage("pqrs", "clasificacion"):
+            categoria_detectada = pqrs.categoria or await self.classify_pqrs(pqrs.titulo, pqrs.descripcion)
+        t_clasificacion = time.perf_counter() - inicio
+        
+        # Buscar documentos relevantes
+        with stage("pqrs", "busqueda"):
+            documentos_relevantes = await vector_store.search_similar_async(
+                query=query,
+                n_results=n_results,
+                categoria=categoria_detectada,
+                hibrido=hibrido
+            )
+        t_recuperacion = time.perf_counter() - inicio - t_clasificacion
+        
+        logger.info(
+            f"Recuperación serial: clasificación {t_clasificacion * 1000:.0f}ms, "
+            f"búsqueda {t_recuperacion * 1000:.0f}ms"
+        )
+        return categoria_detectada, documentos_relevantes
+    
+    async def _speculative_retrieve(
+        self, pqrs: PQRSRequest, query: str, n_results: int, hibrido: Optional[bool] = None
+    ) -> Tuple[CategoriaPQRS, List[Dict[str, Any]]]:
+        """Clasifica y busca en paralelo, filtrando después los resultados por la categoría detectada"""
+        inicio = time.perf_counter()
+        tiempos = {}
+        
+        async def timed(etapa: str, awaitable):
+            t0 = time.perf_counter()
+            with stage("pqrs", etapa):
+                resultado = await awaitable
+            tiempos[etapa] = time.perf_counter() - t0
+            return resultado
+        
+        # Búsqueda sin filtro y sobre-muestreada mientras se clasifica
+        n_especulativo = n_results * settings.speculative_overfetch
+        categoria_detectada, candidatos = await asyncio.gather(
+            timed("clasificacion", self.classify_pqrs(pqrs.titulo, pqrs.descripcion)),
+            timed("busqueda", vector_store.search_similar_async(query=query, n_results=n_especulativo, hibrido=hibrido))
+        )
+        
+        documentos_relevantes = [
+            doc for doc in candidatos
+            if doc["metadata"].get("categoria") == categoria_detectada.value
+        ][:n_results]
+        
+        # Si el sobre-muestreo se llenó sin suficientes documentos de la categoría,
+        # puede haber más fuera de él: repetir la búsqueda con el filtro
+        if len(documentos_relevantes) < n_results and len(candidatos) >= n_especulativo:
+            if has_time(settings.deadline_retrieval_min_seconds):
+                documentos_relevantes = await timed("busqueda_filtrada", vector_store.search_similar_async(
+                    query=query,
+                    n_results=n_results,
+                    categoria=categoria_detectada,
+                    hibrido=hibrido
+                ))
+            elif not documentos_relevantes:
+                # Sin tiempo para repetir la búsqueda: usar los candidatos sin filtrar por categoría
+                documentos_relevantes = candidatos[:n_results]
+                degrade("sin_filtro_categoria")
+        
+        total = time.perf_counter() - inicio
+        ahorro = sum(tiempos.values()) - total
+        logger.info(
+            f"Recuperación especulativa: clasificación {tiempos['clasificacion'] * 1000:.0f}ms, "
+            f"búsqueda {tiempos['busqueda'] * 1000:.0f}ms"
+            + (f", búsqueda filtrada {tiempos['busqueda_filtrada'] * 1000:.0f}ms" if "busqueda_filtrada" in tiempos else "")
+            + f", total {total * 1000:.0f}ms (ahorro {ahorro * 1000:.0f}ms)"
+        )
+        return categoria_detectada, documentos_relevantes
+    
+    def _finalize_pqrs_response(
+        self,
+        pqrs: PQRSRequest,
+        respuesta: str,
+        categoria_detectada: CategoriaPQRS,
+        documentos_relevantes: List[Dict[str, Any]],
+        query_embedding: Optional[List[float]],
+        cache_key: Optional[tuple],
+        start_time: float
+    ) -> PQRSResponse:
+        """Completa la respuesta con recomendaciones y confianza, y la guarda en caché"""
+        # Generar recomendaciones
+        recomendaciones = self._generate_recommendations(pqrs, categoria_detectada)
+        
+        # Calcular confianza basada en similitud de documentos
+        confianza = self._calculate_confidence(documentos_relevantes)
+        documentos_referencia = [doc['metadata']['titulo'] for doc in documentos_relevantes]
+        
+        if query_embedding is not None:
+            self.response_cache.store(query_embedding, cache_key, {
+                "respuesta": despersonalizar(respuesta, pqrs.ciudadano_nombre),
+                "documentos_referencia": documentos_referencia,
+                "confianza": confianza,
+                "categoria_detectada": categoria_detectada,
+                "recomendaciones": recomendaciones
+            }, vector_store.version)
+        
+        deadline = current_deadline()
+        return PQRSResponse(
+            pqrs_id=f"PQRS_{int(time.time())}",
+            respuesta=respuesta,
+            documentos_referencia=documentos_referencia,
+            confianza=confianza,
+            categoria_detectada=categoria_detectada,
+            tiempo_respuesta=time.time() - start_time,
+            recomendaciones=recomendaciones,
+            degradaciones=list(deadline.degradaciones) if deadline else []
+        )
+    
+    def _fallback_pqrs_response(self, start_time: float) -> PQRSResponse:
+        """Respuesta de fallback cuando el pipeline falla"""
+        return PQRSResponse(
+            pqrs_id=f"PQRS_ERROR_{int(time.time())}",
+            respuesta="Lo sentimos, hubo un error procesando su solicitud. Por favor contacte directamente a la Secretaría de Infraestructura.",
+            documentos_referencia=[],
+            confianza=0.0,
+            categoria_detectada=CategoriaPQRS.OTROS,
+            tiempo_respuesta=time.time() - start_time,
+            recomendaciones=["Contactar directamente a la Secretaría de Infraestructura"]
+        )
+    
+    def _pack_prompt(
+        self,
+        endpoint: str,
+        presupuesto: int,
+        build_prompt: Callable[[str], str],
+        documentos: List[Dict[str, Any]]
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """Construye un prompt cuyo contexto llena el presupuesto de tokens restante tras la plantilla"""
+        tokens_plantilla = self.context_packer.count(build_prompt(""))
+        contexto, usados, stats = self.context_packer.pack(documentos, max(0, presupuesto - tokens_plantilla))
+        
+        logger.info(
+            f"Prompt {endpoint}: {tokens_plantilla + stats['tokens_contexto']} tokens de {presupuesto} "
+            f"(plantilla {tokens_plantilla}, contexto {stats['tokens_contexto']}; "
+            f"{stats['documentos_incluidos']}/{stats['documentos_recuperados']} documentos"
+            + (", último recortado)" if stats["recortado"] else ")")
+        )
+        return build_prompt(contexto), usados
+    
+    def _pack_pqrs_prompt(self, pqrs: PQRSRequest, documentos: List[Dict[str, Any]], categoria: CategoriaPQRS) -> Tuple[str, List[Dict[str, Any]]]:
+        return self._pack_prompt(
+            "pqrs", settings.pqrs_prompt_max_tokens,
+            lambda contexto: self._build_pqrs_prompt(pqrs, contexto, categoria),
+            documentos
+        )
+    
+    def _pack_chat_prompt(self, mensaje: str, contexto: Optional[str], documentos: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        return self._pack_prompt(
+            "chat", settings.chat_prompt_max_tokens,
+            lambda contexto_docs: self._build_chat_prompt(mensaje, contexto, contexto_docs),
+            documentos
+        )
+    
+    def _build_pqrs_prompt(self, pqrs: PQRSRequest, contexto: str, categoria: CategoriaPQRS) -> str:
+        """Construye el prompt de respuesta a una PQRS"""
         tipo_str = {
             "peticion": "petición",
             "queja": "queja", 
@@ -128,7 +596,7 @@ class LLMService:
             "sugerencia": "sugerencia"
         }.get(pqrs.tipo.value, "solicitud")
         
-        prompt = f"""
+        return f"""
         Eres un asistente especializado de la Secretaría de Infraestructura de la Alcaldía de Medellín.
         Debes responder a una {tipo_str} de un ciudadano de manera profesional, empática y útil.
         
@@ -156,15 +624,70 @@ class LLMService:
         
         Respuesta:
         """
+    
+    async def _generate_response_with_context(self, prompt: str, max_tokens: int = 800) -> str:
+        """Genera respuesta a partir del prompt con el contexto de documentos relevantes"""
+        respuesta = await self.llm.complete("generacion", prompt, max_tokens=max_tokens, temperature=0.7, hedge=True)
+        if max_tokens < 800:
+            # Con max_tokens reducido la respuesta puede quedar cortada: cerrar en el último final de frase
+            respuesta = self.context_packer.truncate(respuesta, max_tokens)
+        return respuesta
+    
+    def _generation_max_tokens(self, max_tokens: int) -> Optional[int]:
+        """Ajusta max_tokens al tiempo restante; None si ni el mínimo útil alcanza a generarse"""
+        restante = remaining()
+        if restante is None:
+            return max_tokens
         
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=800,
-            temperature=0.7
-        )
+        disponible = restante - settings.deadline_safety_seconds - settings.llm_first_token_seconds
+        alcanzables = int(disponible * settings.llm_tokens_per_second)
+        if alcanzables >= max_tokens:
+            return max_tokens
+        if alcanzables < settings.deadline_min_generation_tokens:
+            return None
         
-        return response.choices[0].message.content.strip()
+        logger.info(f"Plazo corto ({restante:.1f}s): max_tokens reducido de {max_tokens} a {alcanzables}")
+        degrade("max_tokens_reducido")
+        return alcanzables
+    
+    async def _stream_completion(self, prompt: str, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        """Emite los tokens de una completion a medida que llegan, cortando el flujo si se agota el plazo"""
+        tokens = self.llm.stream("generacion_stream", prompt, max_tokens=max_tokens, temperature=temperature)
+        try:
+            while True:
+                # El cliente solo limita la espera del primer token; los siguientes se acotan aquí
+                restante = remaining()
+                try:
+                    if restante is None:
+                        token = await tokens.__anext__()
+                    else:
+                        espera = restante - settings.deadline_safety_seconds
+                        if espera <= 0:
+                            raise asyncio.TimeoutError()
+                        token = await asyncio.wait_for(tokens.__anext__(), espera)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    logger.warning("Plazo de la solicitud agotado: se corta la respuesta en streaming")
+                    degrade("respuesta_truncada")
+                    return
+                yield token
+        finally:
+            await tokens.aclose()
+    
+    def _templated_pqrs_answer(self, pqrs: PQRSRequest, categoria: CategoriaPQRS, documentos: List[Dict[str, Any]]) -> str:
+        """Respuesta de plantilla cuando el LLM no está disponible: confirma la recepción y orienta al ciudadano"""
+        referencias = ", ".join(dict.fromkeys(doc['metadata']['titulo'] for doc in documentos))
+        texto = (
+            f"Estimado(a) {pqrs.ciudadano_nombre or 'ciudadano(a)'}, la Secretaría de Infraestructura de Medellín "
+            f"ha recibido su {pqrs.tipo.value} \"{pqrs.titulo}\", registrada en la categoría "
+            f"{categoria.value.replace('_', ' ')}. Agradecemos su participación ciudadana. "
+            "En este momento no es posible generar una respuesta detallada; su solicitud quedó registrada "
+            "y será revisada por el equipo técnico, que le informará los pasos a seguir."
+        )
+        if referencias:
+            texto += f" Puede consultar la información relacionada en: {referencias}."
+        return texto + " Para seguimiento, conserve el número de radicación y comuníquese con la línea de atención ciudadana."
     
     def _generate_recommendations(self, pqrs: PQRSRequest, categoria: CategoriaPQRS) -> List[str]:
         """Genera recomendaciones específicas según la categoría"""
@@ -206,18 +729,114 @@ class LLMService:
         
         return round(confianza, 2)
     
-    def chat_response(self, mensaje: str, contexto: Optional[str] = None) -> str:
+    async def chat_response(self, mensaje: str, contexto: Optional[str] = None) -> str:
         """Genera respuesta para chat general sobre infraestructura"""
         try:
+            query_embedding, cache_key, cached = await self._lookup_cached_chat(mensaje, contexto)
+            if cached is not None:
+                rag_requests_total.inc(pipeline="chat", resultado="cache")
+                return cached
+            
             # Buscar documentos relevantes
-            documentos_relevantes = vector_store.search_similar(mensaje, n_results=3)
+            with stage("chat", "busqueda"):
+                documentos_relevantes = await self._search_chat(mensaje)
+            with stage("chat", "prompt"):
+                prompt, _ = self._pack_chat_prompt(mensaje, contexto, documentos_relevantes)
             
-            contexto_docs = "\n\n".join([
-                f"Documento: {doc['metadata']['titulo']}\nContenido: {doc['documento']}"
-                for doc in documentos_relevantes
-            ])
+            with stage("chat", "generacion"):
+                max_tokens = self._generation_max_tokens(400)
+                if max_tokens is None:
+                    logger.info(f"Plazo corto ({remaining():.1f}s): se omite la generación del chat")
+                    degrade("respuesta_omitida")
+                    rag_requests_total.inc(pipeline="chat", resultado="plantilla")
+                    return CHAT_SIN_TIEMPO
+                respuesta = await self.llm.complete("chat", prompt, max_tokens=max_tokens, temperature=0.7)
+                if max_tokens < 400:
+                    respuesta = self.context_packer.truncate(respuesta, max_tokens)
             
-            prompt = f"""
+            if query_embedding is not None:
+                self.response_cache.store(query_embedding, cache_key, {"respuesta": respuesta}, vector_store.version)
+            
+            rag_requests_total.inc(pipeline="chat", resultado="ok")
+            return respuesta
+            
+        except Exception as e:
+            logger.error(f"Error en chat response: {e}")
+            rag_requests_total.inc(pipeline="chat", resultado="error")
+            return CHAT_FALLBACK
+    
+    async def stream_chat_response(self, mensaje: str, contexto: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Genera la respuesta de chat como eventos: metadatos, tokens y respuesta final"""
+        try:
+            query_embedding, cache_key, cached = await self._lookup_cached_chat(mensaje, contexto)
+            if cached is not None:
+                rag_requests_total.inc(pipeline="chat", resultado="cache")
+                yield {"event": "metadata", "data": {"documentos_referencia": []}}
+                yield {"event": "token", "data": {"texto": cached}}
+                yield {"event": "final", "data": {"respuesta": cached}}
+                return
+            
+            with stage("chat", "busqueda"):
+                documentos_relevantes = await self._search_chat(mensaje)
+            with stage("chat", "prompt"):
+                prompt, documentos_relevantes = self._pack_chat_prompt(mensaje, contexto, documentos_relevantes)
+            yield {"event": "metadata", "data": {
+                "documentos_referencia": [doc['metadata']['titulo'] for doc in documentos_relevantes]
+            }}
+            
+            partes = []
+            with stage("chat", "generacion"):
+                max_tokens = self._generation_max_tokens(400)
+                if max_tokens is None:
+                    logger.info(f"Plazo corto ({remaining():.1f}s): se omite la generación del chat")
+                    degrade("respuesta_omitida")
+                    rag_requests_total.inc(pipeline="chat", resultado="plantilla")
+                    yield {"event": "token", "data": {"texto": CHAT_SIN_TIEMPO}}
+                    yield {"event": "final", "data": {"respuesta": CHAT_SIN_TIEMPO}}
+                    return
+                async for token in self._stream_completion(prompt, max_tokens=max_tokens, temperature=0.7):
+                    partes.append(token)
+                    yield {"event": "token", "data": {"texto": token}}
+            
+            respuesta = "".join(partes).strip()
+            if query_embedding is not None:
+                self.response_cache.store(query_embedding, cache_key, {"respuesta": respuesta}, vector_store.version)
+            
+            rag_requests_total.inc(pipeline="chat", resultado="ok")
+            yield {"event": "final", "data": {"respuesta": respuesta}}
+            
+        except Exception as e:
+            logger.error(f"Error en chat response en streaming: {e}")
+            rag_requests_total.inc(pipeline="chat", resultado="error")
+            yield {"event": "error", "data": {"respuesta": CHAT_FALLBACK}}
+    
+    async def _search_chat(self, mensaje: str) -> List[Dict[str, Any]]:
+        """Documentos de contexto del chat; con poco tiempo, menos documentos y sin fusión léxica"""
+        if not has_time(settings.deadline_retrieval_min_seconds):
+            degrade("recuperacion_reducida")
+            return await vector_store.search_similar_async(
+                mensaje, n_results=min(3, settings.deadline_reduced_results), hibrido=False
+            )
+        return await vector_store.search_similar_async(mensaje, n_results=3)
+    
+    async def _lookup_cached_chat(self, mensaje: str, contexto: Optional[str]) -> Tuple[Optional[List[float]], Optional[tuple], Optional[str]]:
+        """Busca en la caché semántica una respuesta de chat reutilizable"""
+        if not settings.response_cache_enabled:
+            return None, None, None
+        
+        cache_key = ("chat", contexto)
+        with stage("chat", "embedding"):
+            query_embedding = await vector_store.encode_query_async(mensaje)
+        cached = self.response_cache.lookup(query_embedding, cache_key, vector_store.version)
+        if not cached:
+            return query_embedding, cache_key, None
+        
+        logger.info(f"Respuesta de chat servida desde caché (similitud {cached['similitud']:.3f})")
+        return query_embedding, cache_key, cached["valor"]["respuesta"]
+    
+    def _build_chat_prompt(self, mensaje: str, contexto: Optional[str], contexto_docs: str) -> str:
+        """Construye el prompt del chat general"""
+        return f"""
             Eres un asistente de la Secretaría de Infraestructura de Medellín.
             Responde de manera útil y profesional a la pregunta del ciudadano.
             
@@ -231,19 +850,6 @@ class LLMService:
             Proporciona una respuesta útil, concisa y basada en la información disponible.
             Si no tienes información suficiente, recomienda contactar directamente a la Secretaría.
             """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=400,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content.strip()
-            
-        except Exception as e:
-            logger.error(f"Error en chat response: {e}")
-            return "Lo siento, no puedo procesar tu consulta en este momento. Por favor contacta directamente a la Secretaría de Infraestructura."
 
 # Instancia global del servicio
 llm_service = LLMService()
\ No newline at end of file
@@ -0,0 +1,235 @@
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Buckets en segundos: desde operaciones en memoria hasta generaciones largas del LLM
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Desglose por etapas de la petición en curso (None si nadie lo está recolectando)
+_etapas_actuales: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("etapas", default=None)
+
+def _format_labels(nombres: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    partes = [f'{n}="{_escape(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+def _escape(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class _Metric:
+    tipo = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.tipo}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Contador monotónico con etiquetas"""
+    tipo = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._valores[key] = self._valores.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._valores.get(self._key(labels), 0.0)
+
+    def total(self, **labels) -> float:
+        """Suma de las series que coinciden con las etiquetas dadas (las omitidas se agregan)"""
+        indices = [(self.labelnames.index(n), str(v)) for n, v in labels.items()]
+        with self._lock:
+            return sum(v for k, v in self._valores.items() if all(k[i] == valor for i, valor in indices))
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            valores = list(self._valores.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in valores]
+
+class Gauge(_Metric):
+    """Valor instantáneo; puede fijarse o calcularse al exportar con una función"""
+    tipo = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), funcion: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labelnames)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._funcion = funcion
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._valores[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._valores[key] = self._valores.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        if self._funcion is not None:
+            try:
+                return [f"{self.name} {_format_value(float(self._funcion()))}"]
+            except Exception as e:
+                logger.warning(f"No se pudo calcular la métrica {self.name}: {e}")
+                return []
+        with self._lock:
+            valores = list(self._valores.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in valores]
+
+class Histogram(_Metric):
+    """Histograma acumulativo con buckets fijos"""
+    tipo = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por serie: [conteos por bucket (no acumulados; el último es +Inf), suma, total]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        indice = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._series.get(key)
+            if serie is None:
+                serie = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += value
+            serie[2] += 1
+
+    def summary(self, **labels) -> Dict[str, float]:
+        with self._lock:
+            serie = self._series.get(self._key(labels))
+            if serie is None:
+                return {"total": 0, "suma": 0.0}
+            return {"total": serie[2], "suma": serie[1]}
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        lineas = []
+        for key, conteos, suma, total in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += conteo
+                le = f'le="{_format_value(limite)}"'
+                lineas.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {acumulado}")
+            etiquetas = _format_labels(self.labelnames, key)
+            lineas.append(f"{self.name}_sum{etiquetas} {_format_value(suma)}")
+            lineas.append(f"{self.name}_count{etiquetas} {total}")
+        return lineas
+
+class MetricsRegistry:
+    """Registro mínimo de métricas exportables en formato de texto de Prometheus"""
+
+    def __init__(self, prefix: str = "pqrs_"):
+        self.prefix = prefix
+        self._metricas: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metrica: _Metric) -> _Metric:
+        with self._lock:
+            existente = self._metricas.get(metrica.name)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.name] = metrica
+            return metrica
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self.prefix + name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = (), funcion: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(self.prefix + name, help, labelnames, funcion))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self.prefix + name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        return "\n".join(linea for metrica in metricas for linea in metrica.render()) + "\n"
+
+metrics = MetricsRegistry()
+
+# Pipeline RAG
+rag_stage_seconds = metrics.histogram(
+    "rag_stage_seconds", "Duración de cada etapa del pipeline RAG", ("pipeline", "etapa")
+)
+rag_requests_total = metrics.counter(
+    "rag_requests_total", "Solicitudes atendidas por el pipeline RAG según su resultado", ("pipeline", "resultado")
+)
+
+# Ingesta
+ingestion_stage_seconds = metrics.histogram(
+    "ingestion_stage_seconds", "Duración de cada etapa de la ingesta de documentos", ("etapa",)
+)
+ingestion_chunks_total = metrics.counter(
+    "ingestion_chunks_total", "Chunks procesados por la ingesta según la operación", ("operacion",)
+)
+
+# HTTP
+http_request_seconds = metrics.histogram(
+    "http_request_seconds", "Duración de las peticiones HTTP por ruta", ("metodo", "ruta", "estado")
+)
+
+@contextmanager
+def stage(pipeline: str, etapa: str) -> Iterator[None]:
+    """Mide una etapa del pipeline RAG y la suma al desglose de la petición en curso"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        rag_stage_seconds.observe(duracion, pipeline=pipeline, etapa=etapa)
+        etapas = _etapas_actuales.get()
+        if etapas is not None:
+            etapas[etapa] = etapas.get(etapa, 0.0) + duracion
+
+@contextmanager
+def ingestion_stage(etapa: str) -> Iterator[None]:
+    """Mide una etapa de la ingesta"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        ingestion_stage_seconds.observe(time.perf_counter() - inicio, etapa=etapa)
+
+@contextmanager
+def collect_stages() -> Iterator[Dict[str, float]]:
+    """Recolecta en un diccionario (segundos por etapa) las etapas medidas dentro del bloque"""
+    etapas: Dict[str, float] = {}
+    token = _etapas_actuales.set(etapas)
+    try:
+        yield etapas
+    finally:
+        _etapas_actuales.reset(token)
@@ -0,0 +1,492 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+from app.models import CategoriaPQRS
+from app.services.vector_index import VectorIndex, split_where, matches_where
+
+logger = logging.getLogger(__name__)
+
+CATEGORIAS = [c.value for c in CategoriaPQRS]
+CODIGOS = {categoria: i for i, categoria in enumerate(CATEGORIAS)}
+
+# Filas iniciales del archivo de vectores; luego la capacidad se duplica
+CAPACIDAD_INICIAL = 1024
+
+# Filas por bloque al puntuar: acota la memoria temporal al convertir float16 a float32
+BLOQUE_FILAS = 16384
+
+# Si el filtro deja menos de esta fracción de filas, se copian solo esas en vez de recorrer todas
+FRACCION_SUBCONJUNTO = 0.25
+
+# Máximo de parámetros por sentencia SQLite
+LOTE_SQL = 900
+
+class NumpyIndex(VectorIndex):
+    """Búsqueda exacta sobre una matriz de embeddings en un archivo mapeado en memoria
+
+    Los vectores se agregan al final del archivo, que crece duplicando su capacidad. Reemplazar o
+    borrar un chunk solo marca su fila como eliminada (tombstone), y la compactación reescribe las
+    filas vivas cuando las eliminadas superan compact_ratio. Cada categoría tiene una máscara de
+    filas para filtrar sin tocar los metadatos. Textos y metadatos viven en SQLite y solo se leen
+    para los resultados. Varios procesos pueden compartir el archivo a través de la caché de
+    páginas, pero las escrituras deben venir de uno solo.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32", compact_ratio: float = 0.3):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._lectores = threading.local()
+        os.makedirs(path, exist_ok=True)
+        self._db_path = os.path.join(path, "chunks.sqlite3")
+        self._db = sqlite3.connect(self._db_path, check_same_thread=False)
+        # WAL para que las lecturas de resultados no esperen a las escrituras de la ingesta
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, fila INTEGER NOT NULL, titulo TEXT, categoria TEXT, "
+            "documento TEXT, metadata TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_titulo ON chunks (titulo)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+        self._db.commit()
+        self._load()
+
+    # Estado y persistencia
+
+    def _reset_state(self):
+        self._dim = 0
+        self._generacion = 0
+        self._filas = 0
+        self._eliminadas = 0
+        self._vectores: Optional[np.memmap] = None
+        self._normas = np.zeros(0, dtype=np.float32)
+        self._vivos = np.zeros(0, dtype=bool)
+        self._mascaras = np.zeros((len(CATEGORIAS), 0), dtype=bool)
+        # Fila -> ID (None si la fila está eliminada) e ID -> fila
+        self._ids: List[Optional[str]] = []
+        self._fila_de: Dict[str, int] = {}
+
+    def _vectors_path(self, generacion: int) -> str:
+        return os.path.join(self.path, f"vectores.{generacion}.bin")
+
+    def _meta(self) -> Dict[str, str]:
+        return dict(self._db.execute("SELECT clave, valor FROM meta").fetchall())
+
+    def _set_meta(self, **valores):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)",
+            [(clave, str(valor)) for clave, valor in valores.items()]
+        )
+
+    def _open_vectors(self, generacion: int, capacidad: int, dtype: np.dtype, crear: bool = False) -> np.memmap:
+        ruta = self._vectors_path(generacion)
+        tamano = capacidad * self._dim * dtype.itemsize
+        if crear or not os.path.exists(ruta) or os.path.getsize(ruta) < tamano:
+            with open(ruta, "ab") as f:
+                f.truncate(tamano)
+        return np.memmap(ruta, dtype=dtype, mode="r+", shape=(capacidad, self._dim))
+
+    def _load(self):
+        """Carga el índice persistido: la fuente de verdad es SQLite y las filas del archivo que referencia"""
+        with self._lock:
+            self._reset_state()
+            meta = self._meta()
+            self._dim = int(meta.get("dimension", 0))
+            if self._dim:
+                self._generacion = int(meta.get("generacion", 0))
+                self._filas = int(meta.get("filas", 0))
+                dtype = np.dtype(meta.get("dtype", self.dtype.name))
+                ruta = self._vectors_path(self._generacion)
+                capacidad = max(self._filas, os.path.getsize(ruta) // (self._dim * dtype.itemsize) if os.path.exists(ruta) else 0)
+                self._vectores = self._open_vectors(self._generacion, capacidad, dtype)
+                self._grow_arrays(capacidad)
+
+                self._ids = [None] * self._filas
+                for chunk_id, fila, categoria in self._db.execute("SELECT id, fila, categoria FROM chunks"):
+                    self._mark_alive(chunk_id, fila, categoria)
+                self._eliminadas = self._filas - len(self._fila_de)
+                for inicio in range(0, self._filas, BLOQUE_FILAS):
+                    fin = min(inicio + BLOQUE_FILAS, self._filas)
+                    bloque = np.asarray(self._vectores[inicio:fin], dtype=np.float32)
+                    self._normas[inicio:fin] = np.einsum("ij,ij->i", bloque, bloque)
+
+                if dtype != self.dtype:
+                    logger.info(f"Convirtiendo el índice NumPy de {dtype.name} a {self.dtype.name}")
+                    self.compact()
+
+            # Archivos de generaciones anteriores que una compactación interrumpida pudo dejar
+            actual = os.path.basename(self._vectors_path(self._generacion))
+            for nombre in os.listdir(self.path):
+                if nombre.startswith("vectores.") and nombre != actual:
+                    os.remove(os.path.join(self.path, nombre))
+            logger.info(
+                f"Índice NumPy cargado: {len(self._fila_de)} chunks, {self._eliminadas} filas eliminadas, "
+                f"dimensión {self._dim}, {self.dtype.name}"
+            )
+
+    def _grow_arrays(self, capacidad: int):
+        """Amplía los arreglos por fila; se crean arreglos nuevos para no alterar los que usa una consulta en curso"""
+        actual = len(self._vivos)
+        if capacidad <= actual:
+            return
+        normas = np.zeros(capacidad, dtype=np.float32)
+        normas[:actual] = self._normas
+        vivos = np.zeros(capacidad, dtype=bool)
+        vivos[:actual] = self._vivos
+        mascaras = np.zeros((len(CATEGORIAS), capacidad), dtype=bool)
+        mascaras[:, :actual] = self._mascaras
+        self._normas, self._vivos, self._mascaras = normas, vivos, mascaras
+
+    def _ensure_capacity(self, filas: int):
+        capacidad = len(self._vivos)
+        if filas <= capacidad and self._vectores is not None:
+            return
+        nueva = max(CAPACIDAD_INICIAL, capacidad)
+        while nueva < filas:
+            nueva *= 2
+        if self._vectores is not None:
+            self._vectores.flush()
+        self._vectores = self._open_vectors(self._generacion, nueva, self.dtype)
+        self._grow_arrays(nueva)
+
+    def _mark_alive(self, chunk_id: str, fila: int, categoria: Optional[str]):
+        self._ids[fila] = chunk_id
+        self._fila_de[chunk_id] = fila
+        self._vivos[fila] = True
+        self._mascaras[:, fila] = False
+        self._mascaras[CODIGOS.get(categoria, CODIGOS[CategoriaPQRS.OTROS.value]), fila] = True
+
+    def _tombstone(self, fila: int):
+        chunk_id = self._ids[fila]
+        if chunk_id is not None and self._fila_de.get(chunk_id) == fila:
+            del self._fila_de[chunk_id]
+        self._ids[fila] = None
+        self._vivos[fila] = False
+        self._mascaras[:, fila] = False
+        self._eliminadas += 1
+
+    def _maybe_compact(self):
+        if self._filas >= CAPACIDAD_INICIAL and self._eliminadas > self.compact_ratio * self._filas:
+            self.compact()
+
+    def compact(self):
+        """Reescribe las filas vivas en un archivo nuevo y libera las eliminadas
+
+        El archivo nuevo (siguiente generación) se escribe completo antes de que SQLite lo adopte en
+        una sola transacción, así que una interrupción deja siempre una generación consistente.
+        """
+        with self._lock:
+            if self._vectores is None:
+                return
+            total = len(self._fila_de)
+            vivas = np.flatnonzero(self._vivos[:self._filas])
+            capacidad = CAPACIDAD_INICIAL
+            while capacidad < len(vivas):
+                capacidad *= 2
+            generacion = self._generacion + 1
+            nuevos = self._open_vectors(generacion, capacidad, self.dtype, crear=True)
+            for desde in range(0, len(vivas), BLOQUE_FILAS):
+                filas = vivas[desde:desde + BLOQUE_FILAS]
+                nuevos[desde:desde + len(filas)] = self._vectores[filas]
+            nuevos.flush()
+
+            ids = [self._ids[fila] for fila in vivas]
+            try:
+                self._db.executemany("UPDATE chunks SET fila = ? WHERE id = ?", [(i, chunk_id) for i, chunk_id in enumerate(ids)])
+                self._set_meta(generacion=generacion, filas=len(vivas), dtype=self.dtype.name)
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                os.remove(self._vectors_path(generacion))
+                raise
+
+            anterior = self._vectors_path(self._generacion)
+            normas = np.zeros(capacidad, dtype=np.float32)
+            normas[:len(vivas)] = self._normas[vivas]
+            vivos = np.zeros(capacidad, dtype=bool)
+            vivos[:len(vivas)] = True
+            mascaras = np.zeros((len(CATEGORIAS), capacidad), dtype=bool)
+            mascaras[:, :len(vivas)] = self._mascaras[:, vivas]
+
+            # Las consultas en curso conservan sus referencias a los arreglos y al mapeo anterior
+            self._vectores, self._normas, self._vivos, self._mascaras = nuevos, normas, vivos, mascaras
+            self._ids = ids
+            self._fila_de = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            self._generacion, self._filas, self._eliminadas = generacion, len(vivas), 0
+            os.remove(anterior)
+            logger.info(f"Índice NumPy compactado: {total} chunks en {capacidad} filas de capacidad")
+
+    # API de VectorIndex
+
+    def count(self) -> int:
+        return len(self._fila_de)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        vectores = np.asarray(embeddings, dtype=np.float32)
+        if vectores.ndim != 2 or len(vectores) != len(ids):
+            raise ValueError("Se esperaba un embedding por ID")
+        metadatas = metadatas or [{} for _ in ids]
+        documents = documents or [None for _ in ids]
+
+        with self._lock:
+            if not self._dim:
+                self._dim = vectores.shape[1]
+                self._set_meta(dimension=self._dim, dtype=self.dtype.name, generacion=self._generacion)
+            elif vectores.shape[1] != self._dim:
+                raise ValueError(f"Dimensión {vectores.shape[1]} distinta de la del índice ({self._dim})")
+
+            inicio = self._filas
+            fin = inicio + len(ids)
+            self._ensure_capacity(fin)
+            self._vectores[inicio:fin] = vectores
+            self._vectores.flush()
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (id, fila, titulo, categoria, documento, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (chunk_id, inicio + i, metadata.get("titulo"), metadata.get("categoria"), documento,
+                     json.dumps(metadata, ensure_ascii=False))
+                    for i, (chunk_id, documento, metadata) in enumerate(zip(ids, documents, metadatas))
+                ]
+            )
+            self._set_meta(filas=fin)
+            self._db.commit()
+
+            # Solo tras confirmar en SQLite se publican las filas nuevas
+            guardados = np.asarray(self._vectores[inicio:fin], dtype=np.float32)
+            self._normas[inicio:fin] = np.einsum("ij,ij->i", guardados, guardados)
+            self._ids.extend([None] * len(ids))
+            for i, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+                # Reemplazar es agregar una fila nueva y marcar la anterior como eliminada
+                anterior = self._fila_de.get(chunk_id)
+                if anterior is not None:
+                    self._tombstone(anterior)
+                self._mark_alive(chunk_id, inicio + i, metadata.get("categoria"))
+            self._filas = fin
+            self._maybe_compact()
+
+    def update(self, ids, metadatas):
+        with self._lock:
+            existentes = [(chunk_id, metadata) for chunk_id, metadata in zip(ids, metadatas) if chunk_id in self._fila_de]
+            self._db.executemany(
+                "UPDATE chunks SET titulo = ?, categoria = ?, metadata = ? WHERE id = ?",
+                [
+                    (metadata.get("titulo"), metadata.get("categoria"), json.dumps(metadata, ensure_ascii=False), chunk_id)
+                    for chunk_id, metadata in existentes
+                ]
+            )
+            self._db.commit()
+            for chunk_id, metadata in existentes:
+                self._mark_alive(chunk_id, self._fila_de[chunk_id], metadata.get("categoria"))
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            if ids is None:
+                ids = [fila[0] for fila in self._select(where=where, contenido=False)]
+            ids = [chunk_id for chunk_id in ids if chunk_id in self._fila_de]
+            for desde in range(0, len(ids), LOTE_SQL):
+                lote = ids[desde:desde + LOTE_SQL]
+                self._db.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(lote))})", lote)
+            self._db.commit()
+            for chunk_id in ids:
+                self._tombstone(self._fila_de[chunk_id])
+            self._maybe_compact()
+
+    def drop(self):
+        with self._lock:
+            self._db.execute("DELETE FROM chunks")
+            self._db.execute("DELETE FROM meta")
+            self._db.commit()
+            self._vectores = None
+            for nombre in os.listdir(self.path):
+                if nombre.startswith("vectores."):
+                    os.remove(os.path.join(self.path, nombre))
+            self._reset_state()
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> Dict[str, Any]:
+        include = ["metadatas", "documents"] if include is None else include
+        resultado: Dict[str, Any] = {"ids": [], "embeddings": None, "documents": None, "metadatas": None}
+        contenido = "documents" in include or "metadatas" in include
+        if "embeddings" in include:
+            # Las escrituras y compactaciones confirman SQLite y el mapeo bajo el mismo bloqueo: leer ambos
+            # dentro de él garantiza que cada fila seleccionada tenga su vector en el arreglo vigente
+            with self._lock:
+                filas = self._select(ids=ids, where=where, limit=limit, offset=offset, contenido=contenido)
+                posiciones = [self._fila_de[f[0]] for f in filas]
+                resultado["embeddings"] = np.asarray(self._vectores[posiciones], dtype=np.float32).tolist() if posiciones else []
+        else:
+            filas = self._select(ids=ids, where=where, limit=limit, offset=offset, contenido=contenido)
+        resultado["ids"] = [f[0] for f in filas]
+        if "documents" in include:
+            resultado["documents"] = [f[2] for f in filas]
+        if "metadatas" in include:
+            resultado["metadatas"] = [json.loads(f[3]) for f in filas]
+        return resultado
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None) -> Dict[str, Any]:
+        include = ["metadatas", "documents", "distances"] if include is None else include
+        consultas = np.asarray(query_embeddings, dtype=np.float32)
+        resultado: Dict[str, Any] = {
+            "ids": [], "embeddings": [] if "embeddings" in include else None,
+            "documents": [] if "documents" in include else None,
+            "metadatas": [] if "metadatas" in include else None,
+            "distances": [] if "distances" in include else None
+        }
+
+        # Referencias locales: una escritura o compactación concurrente no altera esta consulta
+        with self._lock:
+            vectores, normas, n, ids = self._vectores, self._normas, self._filas, self._ids
+            candidatas = self._candidate_mask(where, n)
+
+        seleccion = np.flatnonzero(candidatas) if candidatas is not None else np.zeros(0, dtype=np.int64)
+        if vectores is None or len(seleccion) == 0 or n_results <= 0:
+            for clave in resultado:
+                if resultado[clave] is not None:
+                    resultado[clave] = [[] for _ in consultas]
+            return resultado
+
+        k = min(n_results, len(seleccion))
+        if len(seleccion) < FRACCION_SUBCONJUNTO * n:
+            # Pocas filas candidatas: copiar solo esas
+            distancias = normas[seleccion, None] - 2.0 * (np.asarray(vectores[seleccion], dtype=np.float32) @ consultas.T)
+            filas_base = seleccion
+        else:
+            distancias = np.empty((n, len(consultas)), dtype=np.float32)
+            for inicio in range(0, n, BLOQUE_FILAS):
+                fin = min(inicio + BLOQUE_FILAS, n)
+                bloque = np.asarray(vectores[inicio:fin], dtype=np.float32)
+                distancias[inicio:fin] = normas[inicio:fin, None] - 2.0 * (bloque @ consultas.T)
+            distancias[~candidatas] = np.inf
+            filas_base = None
+        distancias += np.einsum("ij,ij->i", consultas, consultas)[None, :]
+
+        por_consulta: List[List[Tuple[str, float, int]]] = []
+        for q in range(len(consultas)):
+            columna = distancias[:, q]
+            mejores = np.argpartition(columna, k - 1)[:k] if k < len(columna) else np.arange(len(columna))
+            mejores = mejores[np.argsort(columna[mejores])]
+            filas = filas_base[mejores] if filas_base is not None else mejores
+            por_consulta.append([
+                (ids[fila], max(0.0, float(columna[m])), fila)
+                for m, fila in zip(mejores, filas)
+                if np.isfinite(columna[m]) and ids[fila] is not None
+            ])
+
+        con_contenido = "documents" in include or "metadatas" in include
+        if con_contenido:
+            contenido = {f[0]: f for f in self._select(ids=list({c[0] for cs in por_consulta for c in cs}))}
+        for candidatos in por_consulta:
+            if con_contenido:
+                # Un chunk borrado entre la puntuación y la lectura de su texto se omite
+                candidatos = [c for c in candidatos if c[0] in contenido]
+            resultado["ids"].append([c[0] for c in candidatos])
+            if resultado["distances"] is not None:
+                resultado["distances"].append([c[1] for c in candidatos])
+            if resultado["documents"] is not None:
+                resultado["documents"].append([contenido[c[0]][2] for c in candidatos])
+            if resultado["metadatas"] is not None:
+                resultado["metadatas"].append([json.loads(contenido[c[0]][3]) for c in candidatos])
+            if resultado["embeddings"] is not None:
+                resultado["embeddings"].append([np.asarray(vectores[c[2]], dtype=np.float32).tolist() for c in candidatos])
+        return resultado
+
+    # Filtros
+
+    def _candidate_mask(self, where: Optional[Dict[str, Any]], n: int) -> Optional[np.ndarray]:
+        """Máscara de filas que cumplen el filtro: la categoría por máscara, el resto evaluando metadatos"""
+        categorias, restante = split_where(where, "categoria")
+        if categorias is None:
+            mascara = self._vivos[:n].copy()
+        else:
+            codigos = [CODIGOS[c] for c in categorias if c in CODIGOS]
+            if not codigos:
+                return None
+            mascara = np.any(self._mascaras[codigos, :n], axis=0)
+        if restante:
+            permitidas = np.zeros(n, dtype=bool)
+            for chunk_id, _ in self._select(where=restante, contenido=False):
+                fila = self._fila_de.get(chunk_id)
+                if fila is not None and fila < n:
+                    permitidas[fila] = True
+            mascara &= permitidas
+        return mascara
+
+    def _reader(self) -> sqlite3.Connection:
+        """Conexión de solo lectura por hilo (WAL permite leer mientras se escribe)"""
+        conexion = getattr(self._lectores, "conexion", None)
+        if conexion is None:
+            conexion = self._lectores.conexion = sqlite3.connect(self._db_path, check_same_thread=False)
+        return conexion
+
+    def _select(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+                limit: Optional[int] = None, offset: Optional[int] = None, contenido: bool = True) -> List[Tuple]:
+        """Filas (id, fila, documento, metadata JSON) de SQLite, o solo (id, fila) con contenido=False
+
+        El filtro se evalúa con la sintaxis de ChromaDB. Las igualdades sobre columnas indexadas van a
+        SQL; si queda filtro por evaluar o IDs en varios lotes, primero se eligen las filas leyendo solo
+        (id, fila, metadata) hasta completar offset + limit, y el documento se carga después solo para ellas.
+        """
+        condiciones, parametros = [], []
+        restante = where
+        for campo in ("titulo", "categoria"):
+            valores, resto = split_where(restante, campo)
+            if valores is not None:
+                condiciones.append(f"{campo} IN ({','.join('?' * len(valores))})")
+                parametros.extend(valores)
+                restante = resto
+
+        columnas = "id, fila, documento, metadata" if contenido else "id, fila"
+        paginado = limit is not None or bool(offset)
+        if restante is None and (ids is None or not paginado):
+            # Todo el filtro cabe en SQL: una sola pasada, con LIMIT si no hay lotes de IDs
+            filas = []
+            for sql, params in self._select_sql(columnas, condiciones, parametros, ids):
+                if paginado:
+                    sql += f" LIMIT {int(limit) if limit is not None else -1} OFFSET {int(offset or 0)}"
+                filas.extend(self._reader().execute(sql, params).fetchall())
+            return filas
+
+        columnas_filtro = "id, fila, metadata" if restante is not None else "id, fila"
+        saltar = offset or 0
+        elegidas: List[Tuple[str, int]] = []
+        for sql, params in self._select_sql(columnas_filtro, condiciones, parametros, ids):
+            for fila in self._reader().execute(sql, params):
+                if restante is not None and not matches_where(json.loads(fila[2]), restante):
+                    continue
+                if saltar:
+                    saltar -= 1
+                    continue
+                elegidas.append((fila[0], fila[1]))
+                if limit is not None and len(elegidas) >= limit:
+                    break
+            if limit is not None and len(elegidas) >= limit:
+                break
+
+        if not contenido:
+            return elegidas
+        datos = {}
+        for sql, params in self._select_sql("id, documento, metadata", [], [], [chunk_id for chunk_id, _ in elegidas]):
+            datos.update((f[0], f) for f in self._reader().execute(sql, params))
+        # Un chunk borrado entre ambas lecturas se omite
+        return [(chunk_id, fila, datos[chunk_id][1], datos[chunk_id][2]) for chunk_id, fila in elegidas if chunk_id in datos]
+
+    @staticmethod
+    def _select_sql(columnas: str, condiciones: List[str], parametros: List[Any], ids: Optional[List[str]]) -> Iterator[Tuple[str, List[Any]]]:
+        """Sentencias SELECT ordenadas por fila, una por lote de IDs (o una sola sin IDs)"""
+        lotes = [ids[i:i + LOTE_SQL] for i in range(0, len(ids), LOTE_SQL)] if ids is not None else [None]
+        for lote in lotes:
+            condiciones_lote, parametros_lote = list(condiciones), list(parametros)
+            if lote is not None:
+                condiciones_lote.append(f"id IN ({','.join('?' * len(lote))})")
+                parametros_lote.extend(lote)
+            sql = f"SELECT {columnas} FROM chunks"
+            if condiciones_lote:
+                sql += " WHERE " + " AND ".join(condiciones_lote)
+            yield sql + " ORDER BY fila", parametros_lote
@@ -0,0 +1,88 @@
+import os
+import json
+import logging
+from typing import List, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+CONFIG_FILE = "embedding_config.json"
+
+class OnnxEmbedder:
+    """Modelo de embeddings exportado a ONNX y cuantizado a int8, ejecutado con onnxruntime
+
+    Reproduce el pipeline de sentence-transformers (tokenización truncada a max_seq_length, mean
+    pooling con la máscara de atención y normalización L2) sin importar torch, y expone el mismo
+    encode(textos, batch_size) que SentenceTransformer. El directorio del modelo se genera con
+    scripts/export_onnx_embeddings.py.
+    """
+
+    def __init__(self, model_dir: str, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.max_seq_length = int(self.config.get("max_seq_length", 256))
+        self.normalize = bool(self.config.get("normalize", True))
+        self.dimension = int(self.config["dimension"])
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        # El relleno se hace por lote en encode(), hasta la longitud del texto más largo
+        self.tokenizer.no_padding()
+
+        opciones = ort.SessionOptions()
+        # 0 deja que onnxruntime use un hilo por núcleo físico
+        opciones.intra_op_num_threads = threads
+        opciones.inter_op_num_threads = 1
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, MODEL_FILE),
+            sess_options=opciones,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {entrada.name for entrada in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Genera los embeddings de uno o varios textos (mismo contrato que SentenceTransformer.encode)"""
+        unico = isinstance(sentences, str)
+        textos = [sentences] if unico else list(sentences)
+        salida = np.zeros((len(textos), self.dimension), dtype=np.float32)
+        if not textos:
+            return salida
+
+        codificados = self.tokenizer.encode_batch(textos)
+        # Ordenar por longitud reduce el relleno dentro de cada lote, como hace sentence-transformers
+        orden = np.argsort([-len(c.ids) for c in codificados], kind="stable")
+        for desde in range(0, len(textos), batch_size):
+            indices = orden[desde:desde + batch_size]
+            largo = max(len(codificados[i].ids) for i in indices)
+            input_ids = np.zeros((len(indices), largo), dtype=np.int64)
+            token_type_ids = np.zeros((len(indices), largo), dtype=np.int64)
+            attention_mask = np.zeros((len(indices), largo), dtype=np.int64)
+            for fila, i in enumerate(indices):
+                n = len(codificados[i].ids)
+                input_ids[fila, :n] = codificados[i].ids
+                token_type_ids[fila, :n] = codificados[i].type_ids
+                attention_mask[fila, :n] = 1
+
+            entradas = {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": token_type_ids
+            }
+            tokens = self.session.run(None, {k: v for k, v in entradas.items() if k in self._input_names})[0]
+
+            # Mean pooling: promedio de los vectores de los tokens reales, sin el relleno
+            mascara = attention_mask[:, :, None].astype(np.float32)
+            salida[indices] = (tokens * mascara).sum(axis=1) / np.clip(mascara.sum(axis=1), 1e-9, None)
+
+        if self.normalize:
+            salida /= np.clip(np.linalg.norm(salida, axis=1, keepdims=True), 1e-12, None)
+        return salida[0] if unico else salida
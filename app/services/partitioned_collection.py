@@ -0,0 +1,287 @@
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.models import CategoriaPQRS
+from app.services.vector_index import VectorIndex, split_where
+
+logger = logging.getLogger(__name__)
+
+CAMPO_PARTICION = "categoria"
+
+# ChromaDB guarda las últimas inserciones en un búfer que cada consulta recorre por fuerza bruta
+# en Python antes de pasarlas al HNSW; con una partición por categoría ese costo se paga en cada
+# una, así que se usa un búfer mucho menor que el predeterminado (100)
+HNSW_BATCH_SIZE = 8
+
+def partition_name(base_name: str, categoria: str) -> str:
+    """Nombre de la colección de ChromaDB que guarda una categoría"""
+    return f"{base_name}_{categoria}"
+
+class PartitionedCollection(VectorIndex):
+    """Una colección de ChromaDB por categoría detrás de la interfaz de Collection que usa el vector store
+
+    Las consultas filtradas por categoría van directo a su partición y se ejecutan sin filtro de
+    metadatos; las demás se reparten entre las particiones con datos y se fusiona el top-k por
+    distancia. Los chunks con una categoría desconocida se guardan en la partición "otros".
+    """
+
+    def __init__(self, client, base_name: str, metadata: Optional[Dict[str, Any]] = None):
+        self._client = client
+        self.name = base_name
+        self._metadata = {"hnsw:batch_size": HNSW_BATCH_SIZE, **(metadata or {})}
+        self._lock = threading.RLock()
+        self._particiones: Dict[str, Any] = {}
+        # Conteo por partición; None obliga a consultarlo tras una escritura
+        self._conteos: Dict[str, Optional[int]] = {}
+        # ID de chunk -> partición; se construye al primer acceso por IDs
+        self._ubicaciones: Optional[Dict[str, str]] = None
+        self._open()
+
+    def _open(self):
+        for categoria in CategoriaPQRS:
+            self._particiones[categoria.value] = self._client.get_or_create_collection(
+                name=partition_name(self.name, categoria.value),
+                metadata=self._metadata
+            )
+            self._conteos[categoria.value] = None
+
+    @staticmethod
+    def _partition_of(metadata: Dict[str, Any]) -> str:
+        categoria = metadata.get(CAMPO_PARTICION)
+        try:
+            return CategoriaPQRS(categoria).value
+        except ValueError:
+            return CategoriaPQRS.OTROS.value
+
+    def _count(self, categoria: str) -> int:
+        conteo = self._conteos[categoria]
+        if conteo is None:
+            conteo = self._conteos[categoria] = self._particiones[categoria].count()
+        return conteo
+
+    def partition_counts(self) -> Dict[str, int]:
+        return {categoria: self._count(categoria) for categoria in self._particiones}
+
+    def _locations(self) -> Dict[str, str]:
+        """Mapa de ID a partición, construido leyendo solo los IDs de cada partición"""
+        with self._lock:
+            if self._ubicaciones is None:
+                ubicaciones = {}
+                for categoria, particion in self._particiones.items():
+                    ids = particion.get(include=[])["ids"]
+                    ubicaciones.update(dict.fromkeys(ids, categoria))
+                    self._conteos[categoria] = len(ids)
+                self._ubicaciones = ubicaciones
+            return self._ubicaciones
+
+    def _route(self, where: Optional[Dict[str, Any]]) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+        """Particiones que pueden cumplir el filtro y el filtro restante sin la condición de categoría"""
+        categorias, restante = split_where(where, CAMPO_PARTICION)
+        if categorias is None:
+            return list(self._particiones), restante
+        return [c for c in categorias if c in self._particiones], restante
+
+    def count(self) -> int:
+        return sum(self._count(categoria) for categoria in self._particiones)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        include = ["metadatas", "documents"] if include is None else include
+        resultado = self._empty_get(include)
+
+        if ids is not None:
+            ubicaciones = self._locations()
+            por_particion: Dict[str, List[str]] = {}
+            for chunk_id in ids:
+                categoria = ubicaciones.get(chunk_id)
+                if categoria is not None:
+                    por_particion.setdefault(categoria, []).append(chunk_id)
+            for categoria, ids_particion in por_particion.items():
+                self._extend_get(resultado, self._particiones[categoria].get(ids=ids_particion, where=where, include=include), include)
+            return resultado
+
+        categorias, restante = self._route(where)
+        if limit is None and not offset:
+            for categoria in categorias:
+                if self._count(categoria):
+                    self._extend_get(resultado, self._particiones[categoria].get(where=restante, include=include), include)
+            return resultado
+
+        # Paginación global: las particiones se recorren siempre en el mismo orden
+        saltar = offset or 0
+        for categoria in categorias:
+            faltan = None if limit is None else limit - len(resultado["ids"])
+            if faltan is not None and faltan <= 0:
+                break
+            if restante is None:
+                total = self._count(categoria)
+                if saltar >= total:
+                    saltar -= total
+                    continue
+                pagina = self._particiones[categoria].get(limit=faltan, offset=saltar, include=include)
+                saltar = 0
+            else:
+                # Con filtro no se conoce el tamaño de antemano: se filtra y se recorta aquí
+                pagina = self._particiones[categoria].get(where=restante, include=include)
+                omitidos = min(saltar, len(pagina["ids"]))
+                saltar -= omitidos
+                fin = None if faltan is None else omitidos + faltan
+                pagina = {k: (v[omitidos:fin] if isinstance(v, list) else v) for k, v in pagina.items()}
+            self._extend_get(resultado, pagina, include)
+        return resultado
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        include = ["metadatas", "documents", "distances"] if include is None else include
+        categorias, restante = self._route(where)
+        categorias = [c for c in categorias if self._count(c) > 0]
+
+        # Las distancias hacen falta para fusionar aunque no se pidan
+        include_particion = list(include) if "distances" in include else list(include) + ["distances"]
+
+        def consultar(categoria: str) -> Dict[str, Any]:
+            return self._particiones[categoria].query(
+                query_embeddings=query_embeddings,
+                n_results=min(n_results, self._count(categoria)),
+                where=restante,
+                include=include_particion
+            )
+
+        # Consultar en paralelo no ayuda: el costo por partición es Python de ChromaDB que retiene el GIL
+        parciales = [consultar(categoria) for categoria in categorias]
+
+        claves = ["ids"] + [k for k in ("embeddings", "documents", "metadatas", "distances") if k in include]
+        resultado: Dict[str, Any] = {k: ([] if k in claves else None) for k in ("ids", "embeddings", "documents", "metadatas", "distances")}
+        for q in range(len(query_embeddings)):
+            candidatos = [
+                (parcial["distances"][q][i], p, i)
+                for p, parcial in enumerate(parciales)
+                for i in range(len(parcial["ids"][q]))
+            ]
+            candidatos.sort(key=lambda c: c[0])
+            mejores = candidatos[:n_results]
+            for clave in claves:
+                resultado[clave].append([parciales[p][clave][q][i] for _, p, i in mejores])
+        return resultado
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
+        with self._lock:
+            ubicaciones = self._locations()
+            grupos: Dict[str, List[int]] = {}
+            movidos: Dict[str, List[str]] = {}
+            for i, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+                categoria = self._partition_of(metadata)
+                grupos.setdefault(categoria, []).append(i)
+                anterior = ubicaciones.get(chunk_id)
+                if anterior is not None and anterior != categoria:
+                    movidos.setdefault(anterior, []).append(chunk_id)
+
+            # Un chunk que cambia de categoría no puede quedar también en su partición anterior
+            for categoria, ids_particion in movidos.items():
+                self._particiones[categoria].delete(ids=ids_particion)
+                self._conteos[categoria] = None
+            for categoria, indices in grupos.items():
+                self._particiones[categoria].upsert(
+                    ids=[ids[i] for i in indices],
+                    embeddings=[embeddings[i] for i in indices],
+                    documents=[documents[i] for i in indices] if documents is not None else None,
+                    metadatas=[metadatas[i] for i in indices]
+                )
+                self._conteos[categoria] = None
+                for i in indices:
+                    ubicaciones[ids[i]] = categoria
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Actualiza metadatos; si cambia la categoría, el chunk se mueve con su embedding a la nueva partición"""
+        with self._lock:
+            ubicaciones = self._locations()
+            en_sitio: Dict[str, Tuple[List[str], List[Dict[str, Any]]]] = {}
+            a_mover: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for chunk_id, metadata in zip(ids, metadatas):
+                anterior = ubicaciones.get(chunk_id)
+                if anterior is None:
+                    continue
+                nueva = self._partition_of(metadata)
+                if nueva == anterior:
+                    grupo = en_sitio.setdefault(anterior, ([], []))
+                    grupo[0].append(chunk_id)
+                    grupo[1].append(metadata)
+                else:
+                    a_mover.setdefault(anterior, {})[chunk_id] = metadata
+
+            for categoria, (ids_particion, metadatas_particion) in en_sitio.items():
+                self._particiones[categoria].update(ids=ids_particion, metadatas=metadatas_particion)
+
+            for anterior, nuevos_metadatos in a_mover.items():
+                origen = self._particiones[anterior].get(
+                    ids=list(nuevos_metadatos), include=["embeddings", "documents"]
+                )
+                self.upsert(
+                    ids=origen["ids"],
+                    embeddings=origen["embeddings"],
+                    documents=origen["documents"],
+                    metadatas=[nuevos_metadatos[chunk_id] for chunk_id in origen["ids"]]
+                )
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            ubicaciones = self._locations()
+            if ids is not None:
+                por_particion: Dict[str, List[str]] = {}
+                for chunk_id in ids:
+                    categoria = ubicaciones.get(chunk_id)
+                    if categoria is not None:
+                        por_particion.setdefault(categoria, []).append(chunk_id)
+            else:
+                # Se resuelven los IDs primero para mantener al día el mapa de ubicaciones
+                categorias, restante = self._route(where)
+                por_particion = {
+                    categoria: self._particiones[categoria].get(where=restante, include=[])["ids"]
+                    for categoria in categorias if self._count(categoria)
+                }
+
+            for categoria, ids_particion in por_particion.items():
+                if not ids_particion:
+                    continue
+                self._particiones[categoria].delete(ids=ids_particion)
+                self._conteos[categoria] = None
+                for chunk_id in ids_particion:
+                    ubicaciones.pop(chunk_id, None)
+
+    def drop(self):
+        """Elimina todas las particiones y las recrea vacías"""
+        with self._lock:
+            for categoria in list(self._particiones):
+                self._client.delete_collection(name=partition_name(self.name, categoria))
+            self._particiones.clear()
+            self._open()
+            self._ubicaciones = {}
+
+    @staticmethod
+    def _empty_get(include: List[str]) -> Dict[str, Any]:
+        return {k: ([] if k == "ids" or k in include else None) for k in ("ids", "embeddings", "documents", "metadatas")}
+
+    @staticmethod
+    def _extend_get(resultado: Dict[str, Any], parcial: Dict[str, Any], include: List[str]):
+        resultado["ids"].extend(parcial["ids"])
+        for clave in ("embeddings", "documents", "metadatas"):
+            if clave in include:
+                resultado[clave].extend(parcial[clave])
@@ -0,0 +1,167 @@
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple, Hashable
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_PLACEHOLDER = "{{ciudadano_nombre}}"
+PRIMER_NOMBRE_PLACEHOLDER = "{{ciudadano_primer_nombre}}"
+
+# Límites inferiores de los buckets de similitud registrados en los misses
+SIMILITUD_BUCKETS = [0.80, 0.85, 0.90, 0.95, 0.98]
+
+def despersonalizar(texto: str, nombre: str) -> str:
+    """Reemplaza el nombre del ciudadano por marcadores para poder reutilizar la respuesta"""
+    nombre = (nombre or "").strip()
+    if not nombre:
+        return texto
+
+    texto = re.sub(re.escape(nombre), NOMBRE_PLACEHOLDER, texto, flags=re.IGNORECASE)
+    primer_nombre = nombre.split()[0]
+    if len(primer_nombre) > 2 and primer_nombre.lower() != nombre.lower():
+        texto = re.sub(rf"\b{re.escape(primer_nombre)}\b", PRIMER_NOMBRE_PLACEHOLDER, texto, flags=re.IGNORECASE)
+    return texto
+
+def personalizar(texto: str, nombre: str) -> str:
+    """Inserta el nombre del ciudadano en una respuesta despersonalizada"""
+    nombre = (nombre or "").strip() or "ciudadano(a)"
+    return (
+        texto.replace(NOMBRE_PLACEHOLDER, nombre)
+        .replace(PRIMER_NOMBRE_PLACEHOLDER, nombre.split()[0])
+    )
+
+class SemanticResponseCache:
+    """Caché semántica de respuestas generadas, indexada por embedding de la consulta"""
+
+    def __init__(self, threshold: float = 0.95, max_size: int = 1000, ttl: float = 3600.0):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version: Optional[int] = None
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._por_clave: Dict[Hashable, List[int]] = {}
+        self._matrices: Dict[Hashable, Tuple[List[int], np.ndarray]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "almacenados": 0,
+            "desalojados": 0,
+            "invalidaciones": 0,
+            "similitud_hits_total": 0.0
+        }
+        self._misses_por_similitud = {bucket: 0 for bucket in SIMILITUD_BUCKETS}
+
+    def lookup(self, embedding: List[float], clave: Hashable, version: int) -> Optional[Dict[str, Any]]:
+        """Busca una respuesta cacheada suficientemente similar con la misma clave"""
+        query = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            self._check_version(version)
+
+            # Descartar primero las entradas vencidas de la clave, para que una vencida no oculte
+            # a otra vigente algo menos similar
+            for entry_id in [i for i in self._por_clave.get(clave, ()) if now - self._entries[i]["creado"] > self.ttl]:
+                self._remove(entry_id)
+
+            mejor_id, mejor_similitud = None, -1.0
+            if clave in self._por_clave:
+                ids, matrix = self._matrix_for(clave)
+                similitudes = matrix @ query
+                idx = int(np.argmax(similitudes))
+                mejor_id, mejor_similitud = ids[idx], float(similitudes[idx])
+
+            if mejor_id is not None and mejor_similitud >= self.threshold:
+                self._entries.move_to_end(mejor_id)
+                self._stats["hits"] += 1
+                self._stats["similitud_hits_total"] += mejor_similitud
+                return {"valor": self._entries[mejor_id]["valor"], "similitud": mejor_similitud}
+
+            self._stats["misses"] += 1
+            for bucket in reversed(SIMILITUD_BUCKETS):
+                if mejor_similitud >= bucket:
+                    self._misses_por_similitud[bucket] += 1
+                    break
+            return None
+
+    def store(self, embedding: List[float], clave: Hashable, valor: Dict[str, Any], version: int):
+        """Guarda una respuesta generada para reutilizarla en consultas similares"""
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            self._check_version(version)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {"vector": vector, "clave": clave, "valor": valor, "creado": time.time()}
+            self._por_clave.setdefault(clave, []).append(entry_id)
+            self._matrices.pop(clave, None)
+            self._stats["almacenados"] += 1
+
+            while len(self._entries) > self.max_size:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self._stats["desalojados"] += 1
+
+    def invalidate(self):
+        """Descarta todas las respuestas cacheadas"""
+        with self._lock:
+            self._clear()
+
+    def _check_version(self, version: int):
+        """Invalida la caché si la base de conocimiento cambió desde que se llenó"""
+        if self.version != version:
+            if self._entries:
+                self._clear()
+            self.version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._por_clave.clear()
+        self._matrices.clear()
+        self._stats["invalidaciones"] += 1
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        clave = entry["clave"]
+        ids = self._por_clave[clave]
+        ids.remove(entry_id)
+        if not ids:
+            del self._por_clave[clave]
+        self._matrices.pop(clave, None)
+
+    def _matrix_for(self, clave: Hashable) -> Tuple[List[int], np.ndarray]:
+        """Obtiene (o reconstruye) la matriz de embeddings de una clave"""
+        cached = self._matrices.get(clave)
+        if cached is None:
+            ids = list(self._por_clave[clave])
+            matrix = np.stack([self._entries[i]["vector"] for i in ids])
+            cached = (ids, matrix)
+            self._matrices[clave] = cached
+        return cached
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Devuelve métricas de acierto para ajustar el umbral de similitud"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entradas"] = len(self._entries)
+            misses_por_similitud = {f">={bucket:.2f}": count for bucket, count in self._misses_por_similitud.items()}
+
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+        stats["similitud_promedio_hits"] = round(stats.pop("similitud_hits_total") / stats["hits"], 4) if stats["hits"] else 0.0
+        stats["umbral"] = self.threshold
+        stats["misses_por_similitud"] = misses_por_similitud
+        return stats
@@ -0,0 +1,152 @@
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def split_where(where: Optional[Dict[str, Any]], campo: str) -> Tuple[Optional[List[str]], Optional[Dict[str, Any]]]:
+    """Separa de un filtro la igualdad (o $in) sobre `campo`: devuelve (valores o None, filtro restante)"""
+    if not where:
+        return None, None
+
+    condiciones = where["$and"] if "$and" in where else [where]
+    for i, condicion in enumerate(condiciones):
+        if campo not in condicion:
+            continue
+        valor = condicion[campo]
+        if isinstance(valor, str):
+            valores = [valor]
+        elif isinstance(valor, dict) and "$eq" in valor:
+            valores = [valor["$eq"]]
+        elif isinstance(valor, dict) and "$in" in valor:
+            valores = list(valor["$in"])
+        else:
+            # Otros operadores ($ne, $nin...) se dejan en el filtro restante
+            break
+
+        resto = condiciones[:i] + condiciones[i + 1:]
+        return valores, None if not resto else resto[0] if len(resto) == 1 else {"$and": resto}
+
+    return None, where
+
+def _compare(operador: str, actual: Any, esperado: Any) -> bool:
+    if operador == "$eq":
+        return actual == esperado
+    if operador == "$ne":
+        return actual != esperado
+    if operador == "$in":
+        return actual in esperado
+    if operador == "$nin":
+        return actual not in esperado
+    if actual is None:
+        return False
+    if operador == "$gt":
+        return actual > esperado
+    if operador == "$gte":
+        return actual >= esperado
+    if operador == "$lt":
+        return actual < esperado
+    if operador == "$lte":
+        return actual <= esperado
+    raise ValueError(f"Operador de filtro no soportado: {operador}")
+
+def matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Evalúa un filtro de metadatos con la sintaxis de ChromaDB sobre un diccionario"""
+    for clave, valor in where.items():
+        if clave == "$and":
+            if not all(matches_where(metadata, condicion) for condicion in valor):
+                return False
+        elif clave == "$or":
+            if not any(matches_where(metadata, condicion) for condicion in valor):
+                return False
+        elif isinstance(valor, dict):
+            if not all(_compare(operador, metadata.get(clave), esperado) for operador, esperado in valor.items()):
+                return False
+        elif metadata.get(clave) != valor:
+            return False
+    return True
+
+class VectorIndex:
+    """Interfaz de los backends del índice vectorial
+
+    Es el subconjunto de la API de Collection de ChromaDB que usa VectorStoreService, con la misma
+    forma de resultados (listas por consulta en query, listas planas en get) y la misma escala de
+    distancias (L2 al cuadrado), de modo que los backends son intercambiables.
+    """
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
+        raise NotImplementedError
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        raise NotImplementedError
+
+    def drop(self):
+        """Elimina todo el contenido del índice y lo deja vacío y utilizable"""
+        raise NotImplementedError
+
+class ChromaIndex(VectorIndex):
+    """Backend sobre una colección de ChromaDB (HNSW más SQLite)"""
+
+    def __init__(self, client, name: str, metadata: Optional[Dict[str, Any]] = None):
+        self._client = client
+        self.name = name
+        self._metadata = metadata
+        self._collection = client.get_or_create_collection(name=name, metadata=metadata)
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> Dict[str, Any]:
+        return self._collection.get(
+            ids=ids, where=where, limit=limit, offset=offset,
+            include=["metadatas", "documents"] if include is None else include
+        )
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None) -> Dict[str, Any]:
+        return self._collection.query(
+            query_embeddings=query_embeddings, n_results=n_results, where=where,
+            include=["metadatas", "documents", "distances"] if include is None else include
+        )
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update(self, ids, metadatas):
+        self._collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids=None, where=None):
+        self._collection.delete(ids=ids, where=where)
+
+    def drop(self):
+        self._client.delete_collection(name=self.name)
+        self._collection = self._client.get_or_create_collection(name=self.name, metadata=self._metadata)
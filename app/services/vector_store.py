@@ -1,148 +1,956 @@
 import os
+import json
+import time
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from sentence_transformers import SentenceTransformer
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from app.config import settings
 from app.models import DocumentoBase, CategoriaPQRS
+from app.services.embedding_cache import EmbeddingCache
+from app.services.category_classifier import CentroidClassifier
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.document_manifest import DocumentManifest
+from app.services.lexical_index import LexicalIndex
+from app.services.kb_stats import KnowledgeBaseStats
+from app.services.vector_index import VectorIndex, ChromaIndex
+from app.services.partitioned_collection import PartitionedCollection
+from app.services.numpy_index import NumpyIndex
+from app.services.executor import run_blocking
+from app.services.metrics import ingestion_stage, ingestion_chunks_total
 
 logger = logging.getLogger(__name__)
 
+COLLECTION_NAME = "pqrs_infraestructura"
+
 class VectorStoreService:
     def __init__(self):
-        self.client = None
-        self.collection = None
-        self.embeddings_model = None
+        # Los recursos pesados se crean en initialize(), no al importar el módulo
+        self._client = None
+        self._collection = None
+        self._embeddings_model = None
+        self._init_lock = threading.RLock()
+        # Serializa las escrituras (ingesta, borrado, limpieza): colección, manifiesto, centroides,
+        # índice léxico, estadísticas y versión se actualizan juntos
+        self._write_lock = threading.RLock()
+        # Una sola reconstrucción de centroides en segundo plano a la vez
+        self._centroid_rebuild_lock = threading.Lock()
+        self.initialized = False
+        self.ready = False
+        self.startup_timings: Dict[str, float] = {}
+        # Se incrementa cada vez que cambia la base de conocimiento. Se persiste como revisión de la
+        # colección: el índice léxico, las estadísticas y los centroides guardan la revisión que reflejan
+        self.version = 0
+        self._revision_path = os.path.join(settings.chroma_db_path, "revision.json")
+        self._revision_persistida: Optional[int] = None
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
             length_function=len,
             separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
         )
-        self._initialize()
+        self.embedding_cache = EmbeddingCache(
+            # Los vectores del modelo int8 difieren levemente: no comparten entradas con los de PyTorch
+            model_name=settings.embedding_model if settings.embedding_backend != "onnx" else f"{settings.embedding_model}:onnx-int8",
+            max_size=settings.embedding_cache_size,
+            ttl=settings.embedding_cache_ttl,
+            db_path=os.path.join(settings.chroma_db_path, "embedding_cache.sqlite3") if settings.embedding_cache_persist else None,
+            max_disk_rows=settings.embedding_cache_disk_max_rows
+        )
+        self.category_classifier = CentroidClassifier(
+            path=os.path.join(settings.chroma_db_path, "category_centroids.npz")
+        )
+        self.manifest = DocumentManifest(
+            path=os.path.join(settings.chroma_db_path, "document_manifest.json")
+        )
+        self.lexical_index = LexicalIndex(
+            path=os.path.join(settings.chroma_db_path, "lexical_index.npz"),
+            save_interval=settings.lexical_index_save_interval
+        )
+        self.kb_stats = KnowledgeBaseStats(
+            path=os.path.join(settings.chroma_db_path, "kb_stats.json"),
+            save_interval=settings.kb_stats_save_interval
+        )
+        self.embedding_batcher = EmbeddingBatcher(
+            encode_fn=lambda texts: self.embeddings_model.encode(texts, batch_size=len(texts)).tolist(),
+            max_batch_size=settings.embedding_microbatch_size,
+            max_wait_ms=settings.embedding_microbatch_wait_ms
+        )
     
-    def _initialize(self):
-        """Inicializa la base de datos vectorial y el modelo de embeddings"""
-        try:
-            # Crear directorio si no existe
-            os.makedirs(settings.chroma_db_path, exist_ok=True)
+    @property
+    def collection(self):
+        if self._collection is None:
+            self.initialize()
+        return self._collection
+    
+    @property
+    def embeddings_model(self):
+        if self._embeddings_model is None:
+            self._load_embeddings_model()
+        return self._embeddings_model
+    
+    def _load_embeddings_model(self):
+        """Carga el modelo de embeddings solo cuando hace falta codificar texto"""
+        with self._init_lock:
+            if self._embeddings_model is not None:
+                return
+            t0 = time.perf_counter()
+            if settings.embedding_backend == "onnx":
+                from app.services.onnx_embedder import OnnxEmbedder
+                self._embeddings_model = OnnxEmbedder(settings.embedding_onnx_path, threads=settings.embedding_onnx_threads)
+                modelo_exportado = self._embeddings_model.config.get("modelo")
+                if modelo_exportado and modelo_exportado != settings.embedding_model:
+                    logger.warning(
+                        f"El modelo ONNX en {settings.embedding_onnx_path} se exportó desde '{modelo_exportado}' "
+                        f"pero EMBEDDING_MODEL es '{settings.embedding_model}'; los vectores no serán comparables"
+                    )
+            elif settings.embedding_backend == "sentence_transformers":
+                from sentence_transformers import SentenceTransformer
+                self._embeddings_model = SentenceTransformer(settings.embedding_model)
+            else:
+                raise ValueError(f"Backend de embeddings desconocido: {settings.embedding_backend}")
+            self.startup_timings["modelo_embeddings"] = round(time.perf_counter() - t0, 3)
+            logger.info(f"Modelo de embeddings ({settings.embedding_backend}) cargado en {time.perf_counter() - t0:.2f}s")
+    
+    def initialize(self):
+        """Inicializa la base de datos vectorial, el manifiesto y los centroides (idempotente)"""
+        with self._init_lock:
+            if self.initialized:
+                return
             
-            # Inicializar ChromaDB
-            self.client = chromadb.PersistentClient(
-                path=settings.chroma_db_path,
-                settings=ChromaSettings(anonymized_telemetry=False)
+            try:
+                t0 = time.perf_counter()
+                
+                # Crear directorio si no existe
+                os.makedirs(settings.chroma_db_path, exist_ok=True)
+                
+                # Abrir el índice vectorial del backend configurado
+                self._collection = self._create_index()
+                t1 = time.perf_counter()
+                
+                # Cargar manifiesto de documentos y centroides de categorías
+                total_chunks = self._collection.count()
+                self.version = self._revision_persistida = self._load_revision()
+                self.manifest.load(collection_empty=total_chunks == 0)
+                if not self.category_classifier.load(total_chunks, self.version):
+                    self.rebuild_category_centroids()
+                t2 = time.perf_counter()
+                
+                # Cargar índice léxico
+                if not self.lexical_index.load(total_chunks, self.version):
+                    self.rebuild_lexical_index()
+                t3 = time.perf_counter()
+                
+                # Cargar estadísticas de la base de conocimiento
+                if not self.kb_stats.load(total_chunks, self.version):
+                    self.rebuild_kb_stats()
+                t4 = time.perf_counter()
+                
+                self.startup_timings.update({
+                    "indice_vectorial": round(t1 - t0, 3),
+                    "centroides": round(t2 - t1, 3),
+                    "indice_lexico": round(t3 - t2, 3),
+                    "estadisticas": round(t4 - t3, 3)
+                })
+                self.initialized = True
+                logger.info(
+                    f"Vector store inicializado correctamente: índice {settings.vector_backend} {t1 - t0:.2f}s, "
+                    f"centroides {t2 - t1:.2f}s, índice léxico {t3 - t2:.2f}s, estadísticas {t4 - t3:.2f}s"
+                )
+                
+            except Exception as e:
+                logger.error(f"Error inicializando vector store: {e}")
+                raise
+    
+    def _create_index(self) -> VectorIndex:
+        """Crea el backend del índice vectorial configurado (settings.vector_backend)"""
+        if settings.vector_backend == "numpy":
+            indice = NumpyIndex(
+                path=os.path.join(settings.chroma_db_path, "numpy_index"),
+                dtype=settings.numpy_index_dtype,
+                compact_ratio=settings.numpy_index_compact_ratio
             )
-            
-            # Crear o obtener colección
-            self.collection = self.client.get_or_create_collection(
-                name="pqrs_infraestructura",
-                metadata={"description": "Documentos de infraestructura para PQRS"}
+            if indice.count() == 0 and os.path.exists(os.path.join(settings.chroma_db_path, "chroma.sqlite3")):
+                logger.warning(
+                    f"El índice NumPy está vacío y existe una base de ChromaDB en {settings.chroma_db_path}; "
+                    f"si tiene datos, migrarlos con scripts/migrate_partitions.py --destino numpy"
+                )
+            return indice
+        if settings.vector_backend != "chroma":
+            raise ValueError(f"Backend de índice vectorial desconocido: {settings.vector_backend}")
+        
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+        self._client = chromadb.PersistentClient(
+            path=settings.chroma_db_path,
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+        metadata = {"description": "Documentos de infraestructura para PQRS"}
+        if not settings.vector_partitioned:
+            return ChromaIndex(self._client, COLLECTION_NAME, metadata=metadata)
+        
+        coleccion = PartitionedCollection(self._client, COLLECTION_NAME, metadata=metadata)
+        if coleccion.count() == 0 and self._legacy_collection_count() > 0:
+            logger.warning(
+                f"La colección única '{COLLECTION_NAME}' tiene datos pero las particiones por categoría están vacías; "
+                f"ejecute scripts/migrate_partitions.py para migrarlos"
             )
-            
-            # Inicializar modelo de embeddings
-            self.embeddings_model = SentenceTransformer('all-MiniLM-L6-v2')
-            
-            logger.info("Vector store inicializado correctamente")
-            
+        return coleccion
+    
+    def _legacy_collection_count(self) -> int:
+        """Chunks en la colección única, sin crearla si no existe"""
+        try:
+            return self._client.get_collection(name=COLLECTION_NAME).count()
+        except Exception:
+            return 0
+    
+    def _load_revision(self) -> int:
+        """Revisión persistida de la colección (0 si aún no se ha escrito)"""
+        try:
+            with open(self._revision_path, "r", encoding="utf-8") as f:
+                return int(json.load(f)["revision"])
+        except FileNotFoundError:
+            return 0
         except Exception as e:
-            logger.error(f"Error inicializando vector store: {e}")
-            raise
+            # Revisión desconocida: ninguna copia guardada coincidirá y todo se reconstruye
+            logger.warning(f"No se pudo leer la revisión de la colección: {e}")
+            return -1
+    
+    def _persist_revision(self, revision: int):
+        """Persiste la revisión antes de modificar la colección
+
+        Si el proceso se detiene a mitad de una escritura, las copias guardadas quedan con una revisión
+        anterior a la persistida y se reconstruyen al iniciar. Un fallo aquí aborta la escritura.
+        """
+        if revision == self._revision_persistida:
+            return
+        tmp_path = f"{self._revision_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"revision": revision}, f)
+        os.replace(tmp_path, self._revision_path)
+        self._revision_persistida = revision
+    
+    @contextmanager
+    def _writing(self):
+        """Toma el lock de escritura; inicializa antes para no esperar _init_lock con él tomado"""
+        self.initialize()
+        with self._write_lock:
+            yield
+    
+    def warm_up(self):
+        """Ejecuta un encode y una consulta de prueba para que la primera petición real no sea la lenta"""
+        self.initialize()
+        self._load_embeddings_model()
+        
+        t0 = time.perf_counter()
+        embedding = self.embeddings_model.encode(["calentamiento del modelo de embeddings"]).tolist()[0]
+        t1 = time.perf_counter()
+        
+        if self.collection.count() > 0:
+            self.collection.query(query_embeddings=[embedding], n_results=1)
+        t2 = time.perf_counter()
+        
+        self.startup_timings.update({
+            "warmup_encode": round(t1 - t0, 3),
+            "warmup_query": round(t2 - t1, 3)
+        })
+        self.ready = True
+        logger.info(f"Warm-up completado: encode {t1 - t0:.2f}s, consulta {t2 - t1:.2f}s")
     
     def add_document(self, documento: DocumentoBase) -> bool:
         """Añade un documento a la base de datos vectorial"""
-        try:
-            # Dividir documento en chunks
-            chunks = self.text_splitter.split_text(documento.contenido)
-            
-            # Generar embeddings para cada chunk
-            embeddings = self.embeddings_model.encode(chunks).tolist()
-            
-            # Preparar metadatos
-            for i, chunk in enumerate(chunks):
-                doc_id = f"{documento.titulo}_{i}"
-                metadata = {
-                    "titulo": documento.titulo,
-                    "categoria": documento.categoria.value,
-                    "chunk_index": i,
-                    "fecha_creacion": documento.fecha_creacion.isoformat(),
-                    **documento.metadatos
-                }
+        resultado = self.add_documents([documento])
+        return resultado["resultados"][0]["success"]
+    
+    def add_documents(self, documentos: Iterable[DocumentoBase]) -> Dict[str, Any]:
+        """Añade documentos en lote, re-embebiendo solo los chunks cuyo contenido cambió"""
+        return self._ingest((documento, None, None) for documento in documentos)
+    
+    def add_document_stream(
+        self,
+        documento: DocumentoBase,
+        segmentos: Iterable[str],
+        content_hash: str,
+        progress: Optional[Callable[[str, int], None]] = None
+    ) -> Dict[str, Any]:
+        """Añade un documento cuyo texto llega por segmentos (p. ej. páginas extraídas de un PDF)
+        
+        Cada segmento se divide y embebe a medida que llega, así que el texto completo nunca
+        está en memoria; documento.contenido se ignora y content_hash identifica el archivo.
+        progress(etapa, chunks) se invoca al avanzar la extracción y en cada escritura por lotes.
+        """
+        return self._ingest([(documento, segmentos, content_hash)], progress)
+    
+    def _ingest(
+        self,
+        entradas: Iterable[Tuple[DocumentoBase, Optional[Iterable[str]], Optional[str]]],
+        progress: Optional[Callable[[str, int], None]] = None
+    ) -> Dict[str, Any]:
+        """Núcleo de la ingesta: recibe (documento, segmentos, hash del archivo) y escribe por lotes"""
+        with self._writing():
+            return self._ingest_locked(entradas, progress)
+    
+    def _ingest_locked(
+        self,
+        entradas: Iterable[Tuple[DocumentoBase, Optional[Iterable[str]], Optional[str]]],
+        progress: Optional[Callable[[str, int], None]] = None
+    ) -> Dict[str, Any]:
+        start_time = time.time()
+        version_inicial = self.version
+        resultados = []
+        entradas_manifiesto = {}
+        pendientes = self._new_batch()
+        
+        for documento, segmentos, content_hash in entradas:
+            resultado = {"titulo": documento.titulo, "chunks": 0, "success": True, "estado": "nuevo"}
+            resultados.append(resultado)
+            owner = len(resultados) - 1
+            
+            try:
+                meta_hash = self._metadata_hash(documento)
+                doc_hash = self._stream_hash(meta_hash, content_hash) if content_hash else self._document_hash(documento)
+                previo = self._previous_entry(documento.titulo)
                 
-                # Añadir a la colección
-                self.collection.add(
-                    embeddings=[embeddings[i]],
-                    documents=[chunk],
-                    metadatas=[metadata],
-                    ids=[doc_id]
+                # Documento idéntico al ya ingestado: no hay nada que hacer
+                if previo and previo.get("doc_hash") == doc_hash:
+                    resultado.update(chunks=len(previo["chunk_hashes"]), estado="sin_cambios")
+                    continue
+            except Exception as e:
+                logger.error(f"Error preparando documento '{documento.titulo}': {e}")
+                resultado.update(success=False, error=str(e))
+                continue
+            
+            hashes_previos = previo["chunk_hashes"] if previo else []
+            metadatos_cambiaron = previo is None or previo.get("meta_hash") != meta_hash
+            chunk_hashes = []
+            reembebidos = 0
+            
+            # Acumular chunks de varios documentos (o segmentos) en el mismo lote
+            try:
+                for i, chunk in enumerate(self._split_segments(segmentos if segmentos is not None else [documento.contenido])):
+                    chunk_hash = self._chunk_hash(chunk)
+                    chunk_hashes.append(chunk_hash)
+                    if progress:
+                        progress("extrayendo", len(chunk_hashes))
+                    chunk_id = f"{documento.titulo}_{i}"
+                    metadata = self._chunk_metadata(documento, i, chunk_hash)
+                    
+                    if i < len(hashes_previos) and hashes_previos[i] == chunk_hash:
+                        # Texto sin cambios: conservar el embedding y actualizar solo metadatos si hace falta
+                        if metadatos_cambiaron:
+                            pendientes["update_ids"].append(chunk_id)
+                            pendientes["update_metadatas"].append(metadata)
+                            pendientes["owners"].add(owner)
+                        continue
+                    
+                    pendientes["ids"].append(chunk_id)
+                    pendientes["documents"].append(chunk)
+                    pendientes["metadatas"].append(metadata)
+                    pendientes["owners"].add(owner)
+                    reembebidos += 1
+                    
+                    if len(pendientes["ids"]) >= settings.ingest_batch_size:
+                        if progress:
+                            progress("embebiendo", len(chunk_hashes))
+                        self._flush_batch(pendientes, resultados)
+                        pendientes = self._new_batch()
+            except Exception as e:
+                # Falló la extracción a mitad del documento: parte de sus chunks ya puede estar escrita,
+                # así que la próxima ingesta debe verificarlo contra la colección
+                logger.error(f"Error extrayendo documento '{documento.titulo}' tras {len(chunk_hashes)} chunks: {e}")
+                resultado.update(success=False, chunks=len(chunk_hashes), error=str(e))
+                self.forget_document_state(documento.titulo)
+                if previo:
+                    pendientes["reemplazos"] = True
+                continue
+            
+            n_chunks = len(chunk_hashes)
+            
+            # Chunks sobrantes de una versión anterior más larga
+            huerfanos = [f"{documento.titulo}_{i}" for i in range(n_chunks, len(hashes_previos))]
+            if huerfanos:
+                pendientes["delete_ids"].extend(huerfanos)
+                pendientes["owners"].add(owner)
+            if previo:
+                pendientes["reemplazos"] = True
+            
+            resultado.update(
+                chunks=n_chunks,
+                estado="actualizado" if previo else "nuevo",
+                reembebidos=reembebidos,
+                reutilizados=n_chunks - reembebidos,
+                eliminados=len(huerfanos)
+            )
+            entradas_manifiesto[owner] = {
+                "doc_hash": doc_hash,
+                "meta_hash": meta_hash,
+                "categoria": documento.categoria.value,
+                "metadatos": documento.metadatos,
+                "chunk_hashes": chunk_hashes
+            }
+        
+        if any(pendientes[k] for k in ("ids", "update_ids", "delete_ids")):
+            if progress:
+                progress("embebiendo", sum(r["chunks"] for r in resultados))
+            self._flush_batch(pendientes, resultados)
+        
+        # Registrar en el manifiesto solo los documentos escritos correctamente
+        for owner, entrada in entradas_manifiesto.items():
+            if resultados[owner]["success"]:
+                self.manifest.set(resultados[owner]["titulo"], entrada)
+        if entradas_manifiesto:
+            self.manifest.save()
+            self.category_classifier.save(self.collection.count(), self.version)
+        if self.version != version_inicial:
+            self.lexical_index.maybe_save(self.version)
+            self.kb_stats.maybe_save(self.version)
+        
+        for resultado in resultados:
+            if resultado["success"] and resultado["estado"] != "sin_cambios":
+                logger.info(
+                    f"Documento '{resultado['titulo']}' {resultado['estado']} con {resultado['chunks']} chunks "
+                    f"({resultado['reembebidos']} re-embebidos, {resultado['eliminados']} eliminados)"
                 )
+        
+        elapsed = time.time() - start_time
+        total_chunks = sum(r.get("reembebidos", 0) for r in resultados if r["success"])
+        rendimiento = {
+            "documentos": len(resultados),
+            "exitosos": sum(1 for r in resultados if r["success"]),
+            "fallidos": sum(1 for r in resultados if not r["success"]),
+            "sin_cambios": sum(1 for r in resultados if r["estado"] == "sin_cambios"),
+            "chunks": total_chunks,
+            "chunks_reutilizados": sum(r.get("reutilizados", 0) for r in resultados if r["success"]),
+            "chunks_eliminados": sum(r.get("eliminados", 0) for r in resultados if r["success"]),
+            "tiempo": round(elapsed, 3),
+            "chunks_por_segundo": round(total_chunks / elapsed, 2) if elapsed > 0 else 0.0
+        }
+        logger.info(
+            f"Ingesta en lote: {rendimiento['exitosos']}/{rendimiento['documentos']} documentos "
+            f"({rendimiento['sin_cambios']} sin cambios), {total_chunks} chunks embebidos en "
+            f"{rendimiento['tiempo']}s ({rendimiento['chunks_por_segundo']} chunks/s)"
+        )
+        
+        return {"resultados": resultados, "rendimiento": rendimiento}
+    
+    def forget_document_state(self, titulo: str):
+        """Olvida un documento en el manifiesto para que la próxima ingesta lo verifique contra la colección"""
+        with self._writing():
+            self.manifest.remove(titulo)
+            self.manifest.complete = False
+            self.manifest.save()
+    
+    def _split_segments(self, segmentos: Iterable[str]) -> Iterable[str]:
+        """Divide en chunks cada segmento a medida que llega"""
+        for segmento in segmentos:
+            if segmento and segmento.strip():
+                with ingestion_stage("division"):
+                    chunks = self.text_splitter.split_text(segmento)
+                yield from chunks
+    
+    def _new_batch(self) -> Dict[str, Any]:
+        """Crea un lote vacío de escrituras pendientes"""
+        return {
+            "ids": [], "documents": [], "metadatas": [], "owners": set(),
+            "update_ids": [], "update_metadatas": [],
+            "delete_ids": [],
+            "reemplazos": False
+        }
+    
+    def _chunk_metadata(self, documento: DocumentoBase, chunk_index: int, chunk_hash: str) -> Dict[str, Any]:
+        """Construye los metadatos de un chunk"""
+        return {
+            "titulo": documento.titulo,
+            "categoria": documento.categoria.value,
+            "chunk_index": chunk_index,
+            "chunk_hash": chunk_hash,
+            "fecha_creacion": documento.fecha_creacion.isoformat(),
+            **documento.metadatos
+        }
+    
+    @staticmethod
+    def _chunk_hash(chunk: str) -> str:
+        return hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:32]
+    
+    @staticmethod
+    def _metadata_hash(documento: DocumentoBase) -> str:
+        payload = json.dumps(
+            {"categoria": documento.categoria.value, "metadatos": documento.metadatos},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+    
+    def _document_hash(self, documento: DocumentoBase) -> str:
+        """Hash del contenido y metadatos del documento (la fecha de creación no cuenta)"""
+        payload = f"{self._metadata_hash(documento)}\x00{documento.contenido}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+    
+    @staticmethod
+    def _stream_hash(meta_hash: str, content_hash: str) -> str:
+        """Hash de un documento ingestado desde archivo: metadatos más hash de los bytes del archivo"""
+        payload = f"{meta_hash}\x00archivo:{content_hash}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+    
+    def _previous_entry(self, titulo: str) -> Optional[Dict[str, Any]]:
+        """Obtiene el estado previo de un documento desde el manifiesto o, si está incompleto, desde la colección"""
+        entrada = self.manifest.get(titulo)
+        if entrada is not None or self.manifest.complete:
+            return entrada
+        
+        existentes = self.collection.get(where={"titulo": titulo}, include=["metadatas"])
+        if not existentes["ids"]:
+            return None
+        
+        por_indice = {m.get("chunk_index", 0): m.get("chunk_hash") for m in existentes["metadatas"]}
+        return {
+            "doc_hash": None,
+            "meta_hash": None,
+            "chunk_hashes": [por_indice.get(i) for i in range(max(por_indice) + 1)]
+        }
+    
+    def _flush_batch(self, lote: Dict[str, Any], resultados: List[Dict[str, Any]]):
+        """Genera los embeddings de un lote y aplica sus escrituras con pocas llamadas a la colección"""
+        try:
+            if lote["ids"]:
+                with ingestion_stage("embedding"):
+                    embeddings = self.embeddings_model.encode(
+                        lote["documents"],
+                        batch_size=settings.embedding_batch_size
+                    ).tolist()
+            
+            self._persist_revision(self.version + 1)
+            if lote["ids"]:
+                with ingestion_stage("escritura"):
+                    self.collection.upsert(
+                        embeddings=embeddings,
+                        documents=lote["documents"],
+                        metadatas=lote["metadatas"],
+                        ids=lote["ids"]
+                    )
+                ingestion_chunks_total.inc(len(lote["ids"]), operacion="embebido")
+                
+                if lote["reemplazos"]:
+                    # Se sobrescribieron chunks existentes: las sumas incrementales ya no valen
+                    self.category_classifier.invalidate()
+                else:
+                    self.category_classifier.update(embeddings, [m["categoria"] for m in lote["metadatas"]])
+                self.lexical_index.add(lote["ids"], lote["documents"], [m["categoria"] for m in lote["metadatas"]])
+                self.kb_stats.add(lote["ids"], lote["documents"], lote["metadatas"], dimension=len(embeddings[0]))
+            
+            if lote["update_ids"]:
+                with ingestion_stage("escritura"):
+                    self.collection.update(ids=lote["update_ids"], metadatas=lote["update_metadatas"])
+                ingestion_chunks_total.inc(len(lote["update_ids"]), operacion="metadatos")
+                self.lexical_index.set_categories(lote["update_ids"], [m["categoria"] for m in lote["update_metadatas"]])
+                self.kb_stats.set_categories(lote["update_ids"], [m["categoria"] for m in lote["update_metadatas"]])
             
-            logger.info(f"Documento '{documento.titulo}' añadido con {len(chunks)} chunks")
-            return True
+            if lote["delete_ids"]:
+                with ingestion_stage("escritura"):
+                    self.collection.delete(ids=lote["delete_ids"])
+                ingestion_chunks_total.inc(len(lote["delete_ids"]), operacion="eliminado")
+                self.category_classifier.invalidate()
+                self.lexical_index.remove(lote["delete_ids"])
+                self.kb_stats.remove(lote["delete_ids"])
             
+            self.version += 1
         except Exception as e:
-            logger.error(f"Error añadiendo documento: {e}")
-            return False
+            logger.error(f"Error escribiendo lote de {len(lote['ids'])} chunks: {e}")
+            # Marcar como fallidos todos los documentos con escrituras en el lote
+            for owner in lote["owners"]:
+                resultados[owner].update(success=False, error=str(e))
     
-    def search_similar(self, query: str, n_results: int = 5, categoria: Optional[CategoriaPQRS] = None) -> List[Dict[str, Any]]:
-        """Busca documentos similares a la consulta"""
-        try:
-            # Generar embedding de la consulta
-            query_embedding = self.embeddings_model.encode([query]).tolist()[0]
-            
-            # Preparar filtros
-            where_filter = {}
-            if categoria:
-                where_filter["categoria"] = categoria.value
-            
-            # Realizar búsqueda
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where_filter if where_filter else None,
-                include=["documents", "metadatas", "distances"]
+    def encode_query(self, query: str) -> List[float]:
+        """Genera el embedding de una consulta reutilizando la caché cuando es posible"""
+        query_embedding = self.embedding_cache.get(query)
+        if query_embedding is None:
+            if settings.embedding_microbatch_enabled:
+                # Agrupar con las consultas concurrentes de otros hilos
+                query_embedding = self.embedding_batcher.encode(query)
+            else:
+                query_embedding = self.embeddings_model.encode([query]).tolist()[0]
+            self.embedding_cache.set(query, query_embedding)
+        return query_embedding
+    
+    async def encode_query_async(self, query: str) -> List[float]:
+        """Como encode_query, pero desde el event loop: con microbatching espera el lote sin bloquear un hilo"""
+        query_embedding = self.embedding_cache.get(query)
+        if query_embedding is None:
+            if settings.embedding_microbatch_enabled:
+                query_embedding = await self.embedding_batcher.encode_async(query)
+            else:
+                query_embedding = await run_blocking(lambda: self.embeddings_model.encode([query]).tolist()[0])
+            self.embedding_cache.set(query, query_embedding)
+        return query_embedding
+    
+    def encode_queries(self, queries: List[str]) -> List[List[float]]:
+        """Genera los embeddings de varias consultas con una sola pasada del modelo para las no cacheadas"""
+        embeddings = [self.embedding_cache.get(query) for query in queries]
+        faltantes = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if faltantes:
+            nuevos = self.embeddings_model.encode(
+                [queries[i] for i in faltantes],
+                batch_size=settings.embedding_batch_size
+            ).tolist()
+            for i, embedding in zip(faltantes, nuevos):
+                embeddings[i] = embedding
+                self.embedding_cache.set(queries[i], embedding)
+        return embeddings
+    
+    def classify_local(self, text: str) -> Tuple[Optional[CategoriaPQRS], float]:
+        """Clasifica un texto por el centroide de categoría más cercano; devuelve (categoría, margen)"""
+        return self.classify_embeddings([self.encode_query(text)])[0]
+    
+    def classify_embeddings(self, embeddings: List[List[float]]) -> List[Tuple[Optional[CategoriaPQRS], float]]:
+        """Clasifica embeddings ya calculados por centroide; devuelve (categoría, margen) por cada uno"""
+        if self.category_classifier.stale:
+            # Mientras tanto se clasifica con los centroides anteriores
+            self.schedule_centroid_rebuild()
+        
+        clasificaciones = []
+        for embedding in embeddings:
+            categoria, margen, _ = self.category_classifier.classify(embedding)
+            clasificaciones.append((CategoriaPQRS(categoria), margen) if categoria is not None else (None, 0.0))
+        return clasificaciones
+    
+    def schedule_centroid_rebuild(self):
+        """Reconstruye los centroides en un hilo de fondo; si ya hay una reconstrucción en curso no lanza otra"""
+        if not self._centroid_rebuild_lock.acquire(blocking=False):
+            return
+        
+        def reconstruir():
+            try:
+                self.rebuild_category_centroids()
+            except Exception as e:
+                logger.error(f"Error reconstruyendo centroides de categorías: {e}")
+            finally:
+                self._centroid_rebuild_lock.release()
+        
+        threading.Thread(target=reconstruir, name="centroides", daemon=True).start()
+    
+    def rebuild_category_centroids(self, page_size: int = 1000):
+        """Recalcula los centroides de categorías recorriendo la colección por páginas"""
+        def lotes():
+            offset = 0
+            while True:
+                page = self.collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                yield page["embeddings"], [m.get("categoria", CategoriaPQRS.OTROS.value) for m in page["metadatas"]]
+                offset += len(page["ids"])
+        
+        self.category_classifier.rebuild(lotes())
+        self.category_classifier.save(self.collection.count(), self.version)
+    
+    def rebuild_lexical_index(self, page_size: int = 1000):
+        """Reconstruye el índice léxico recorriendo la colección por páginas"""
+        inicio = time.perf_counter()
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.lexical_index.add(
+                page["ids"],
+                page["documents"],
+                [m.get("categoria", CategoriaPQRS.OTROS.value) for m in page["metadatas"]]
             )
+            offset += len(page["ids"])
+        self.lexical_index.save(self.version)
+        logger.info(f"Índice léxico reconstruido: {self.lexical_index.get_stats()} en {time.perf_counter() - inicio:.2f}s")
+    
+    def rebuild_kb_stats(self, page_size: int = 1000):
+        """Reconstruye las estadísticas de la base de conocimiento recorriendo la colección por páginas"""
+        inicio = time.perf_counter()
+        self.kb_stats.clear()
+        dimension = 0
+        muestra = self.collection.get(include=["embeddings"], limit=1)
+        if muestra["ids"]:
+            dimension = len(muestra["embeddings"][0])
+        
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.kb_stats.add(page["ids"], page["documents"], page["metadatas"], dimension=dimension, ingesta=False)
+            offset += len(page["ids"])
+        self.kb_stats.save(self.version)
+        logger.info(f"Estadísticas de la base reconstruidas: {len(self.kb_stats)} chunks en {time.perf_counter() - inicio:.2f}s")
+    
+    def search_similar(
+        self,
+        query: str,
+        n_results: int = 5,
+        categoria: Optional[CategoriaPQRS] = None,
+        hibrido: Optional[bool] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """Busca documentos similares a la consulta; en modo híbrido fusiona BM25 y vectores con RRF"""
+        try:
+            # Generar embedding de la consulta si no viene ya calculado
+            if query_embedding is None:
+                query_embedding = self.encode_query(query)
+            return self._search_by_embeddings([query], [query_embedding], n_results, categoria, hibrido)[0]
             
-            # Formatear resultados
+        except Exception as e:
+            logger.error(f"Error en búsqueda vectorial: {e}")
+            return []
+    
+    async def search_similar_async(
+        self,
+        query: str,
+        n_results: int = 5,
+        categoria: Optional[CategoriaPQRS] = None,
+        hibrido: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """search_similar desde el event loop: el embedding se espera sin hilo y solo la consulta al índice usa el executor"""
+        try:
+            query_embedding = await self.encode_query_async(query)
+        except Exception as e:
+            logger.error(f"Error en búsqueda vectorial: {e}")
+            return []
+        return await run_blocking(self.search_similar, query, n_results, categoria, hibrido, query_embedding)
+    
+    def search_similar_batch(
+        self,
+        queries: List[str],
+        query_embeddings: List[List[float]],
+        n_results: int = 5,
+        categorias: Optional[List[Optional[CategoriaPQRS]]] = None,
+        hibrido: Optional[bool] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Busca varias consultas con embeddings ya calculados: una consulta multi-vector por categoría"""
+        categorias = categorias or [None] * len(queries)
+        resultados: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        
+        grupos: Dict[Optional[CategoriaPQRS], List[int]] = {}
+        for i, categoria in enumerate(categorias):
+            grupos.setdefault(categoria, []).append(i)
+        
+        for categoria, indices in grupos.items():
+            try:
+                parciales = self._search_by_embeddings(
+                    [queries[i] for i in indices],
+                    [query_embeddings[i] for i in indices],
+                    n_results, categoria, hibrido
+                )
+                for i, documentos in zip(indices, parciales):
+                    resultados[i] = documentos
+            except Exception as e:
+                logger.error(f"Error en búsqueda vectorial por lotes ({len(indices)} consultas): {e}")
+        return resultados
+    
+    def _search_by_embeddings(
+        self,
+        queries: List[str],
+        query_embeddings: List[List[float]],
+        n_results: int,
+        categoria: Optional[CategoriaPQRS],
+        hibrido: Optional[bool]
+    ) -> List[List[Dict[str, Any]]]:
+        """Ejecuta una consulta a la colección con uno o varios embeddings y formatea cada resultado"""
+        if hibrido is None:
+            hibrido = settings.hybrid_search
+        
+        # Preparar filtros
+        where_filter = {}
+        if categoria:
+            where_filter["categoria"] = categoria.value
+        
+        # En modo híbrido se piden más candidatos para que la fusión tenga de dónde elegir
+        n_candidatos = n_results * settings.hybrid_candidates if hibrido else n_results
+        
+        # Realizar búsqueda
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_candidatos,
+            where=where_filter if where_filter else None,
+            include=["documents", "metadatas", "distances"]
+        )
+        
+        # Formatear resultados
+        salida = []
+        for q, (query, query_embedding) in enumerate(zip(queries, query_embeddings)):
             formatted_results = []
-            for i in range(len(results["documents"][0])):
+            for i in range(len(results["documents"][q])):
                 formatted_results.append({
-                    "documento": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "similitud": 1 - results["distances"][0][i],  # Convertir distancia a similitud
+                    "documento": results["documents"][q][i],
+                    "metadata": results["metadatas"][q][i],
+                    "similitud": 1 - results["distances"][q][i],  # Convertir distancia a similitud
                 })
             
-            return formatted_results
-            
-        except Exception as e:
-            logger.error(f"Error en búsqueda vectorial: {e}")
-            return []
+            if hibrido:
+                formatted_results = self._fuse_lexical(
+                    query, query_embedding, results["ids"][q], formatted_results,
+                    n_candidatos, n_results, categoria
+                )
+            salida.append(formatted_results)
+        
+        return salida
+    
+    def _fuse_lexical(
+        self,
+        query: str,
+        query_embedding: List[float],
+        ids_vectoriales: List[str],
+        vectoriales: List[Dict[str, Any]],
+        n_candidatos: int,
+        n_results: int,
+        categoria: Optional[CategoriaPQRS]
+    ) -> List[Dict[str, Any]]:
+        """Fusiona los resultados vectoriales con los del índice BM25 por reciprocal rank fusion"""
+        t0 = time.perf_counter()
+        lexicos = self.lexical_index.search(query, n_candidatos, categoria.value if categoria else None)
+        t_lexico = time.perf_counter() - t0
+        
+        k = settings.hybrid_rrf_k
+        puntajes: Dict[str, float] = {}
+        for rank, chunk_id in enumerate(ids_vectoriales):
+            puntajes[chunk_id] = puntajes.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+        for rank, (chunk_id, _) in enumerate(lexicos):
+            puntajes[chunk_id] = puntajes.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+        
+        mejores = sorted(puntajes, key=puntajes.get, reverse=True)[:n_results]
+        por_id = dict(zip(ids_vectoriales, vectoriales))
+        
+        # Traer de la colección los chunks que solo encontró el índice léxico
+        faltantes = [chunk_id for chunk_id in mejores if chunk_id not in por_id]
+        if faltantes:
+            extra = self.collection.get(ids=faltantes, include=["documents", "metadatas", "embeddings"])
+            query_vector = np.asarray(query_embedding, dtype=np.float64)
+            for chunk_id, documento, metadata, embedding in zip(extra["ids"], extra["documents"], extra["metadatas"], extra["embeddings"]):
+                # Misma escala que la distancia L2 al cuadrado que devuelve la consulta vectorial, acotada
+                # a cero: un chunk que solo encontró BM25 puede estar lejos en el espacio de embeddings
+                distancia = float(np.sum((np.asarray(embedding, dtype=np.float64) - query_vector) ** 2))
+                por_id[chunk_id] = {"documento": documento, "metadata": metadata, "similitud": max(0.0, 1 - distancia)}
+        
+        logger.debug(
+            f"Búsqueda híbrida: {len(lexicos)} candidatos léxicos en {t_lexico * 1000:.2f}ms, "
+            f"{len(faltantes)} solo léxicos"
+        )
+        return [por_id[chunk_id] for chunk_id in mejores if chunk_id in por_id]
     
     def get_collection_stats(self) -> Dict[str, Any]:
-        """Obtiene estadísticas de la colección"""
+        """Obtiene estadísticas de la colección desde los contadores incrementales, sin consultar ChromaDB"""
         try:
-            count = self.collection.count()
+            estadisticas = self.kb_stats.get_stats()
+            count = estadisticas["chunks"]
             return {
                 "total_documentos": count,
-                "status": "activo" if count > 0 else "vacío"
+                "status": "activo" if count > 0 else "vacío",
+                "backend": settings.vector_backend,
+                "particionado": settings.vector_partitioned and settings.vector_backend == "chroma",
+                "indice_lexico": self.lexical_index.get_stats(),
+                "estadisticas": estadisticas
             }
         except Exception as e:
             logger.error(f"Error obteniendo estadísticas: {e}")
             return {"total_documentos": 0, "status": "error"}
     
-    def clear_collection(self) -> bool:
-        """Limpia toda la colección"""
+    def clear_collection(self) -> Dict[str, Any]:
+        """Limpia toda la colección eliminándola y recreándola, sin materializar sus IDs"""
+        inicio = time.perf_counter()
         try:
-            # Obtener todos los IDs
-            all_results = self.collection.get()
-            if all_results["ids"]:
-                self.collection.delete(ids=all_results["ids"])
-            logger.info("Colección limpiada correctamente")
-            return True
+            with self._writing():
+                total = self.collection.count()
+                self._persist_revision(self.version + 1)
+                self.collection.drop()
+            
+                self.version += 1
+                self.category_classifier.reset()
+                self.category_classifier.save(0, self.version)
+                self.lexical_index.clear()
+                self.lexical_index.save(self.version)
+                self.kb_stats.clear()
+                self.kb_stats.save(self.version)
+                self.manifest.clear()
+                self.manifest.save()
+            
+                elapsed = time.perf_counter() - inicio
+                logger.info(f"Colección limpiada correctamente: {total} chunks en {elapsed:.2f}s")
+                return {"success": True, "eliminados": total, "tiempo": round(elapsed, 3)}
         except Exception as e:
             logger.error(f"Error limpiando colección: {e}")
-            return False
+            return {"success": False, "eliminados": 0, "tiempo": round(time.perf_counter() - inicio, 3), "error": str(e)}
+    
+    def delete_documents(
+        self,
+        titulo: Optional[str] = None,
+        categoria: Optional[CategoriaPQRS] = None,
+        where: Optional[Dict[str, Any]] = None,
+        page_size: int = 1000
+    ) -> Dict[str, Any]:
+        """Elimina los chunks que cumplen un filtro por título, categoría o metadatos"""
+        inicio = time.perf_counter()
+        condiciones = []
+        if titulo:
+            condiciones.append({"titulo": titulo})
+        if categoria:
+            condiciones.append({"categoria": categoria.value})
+        if where:
+            condiciones.extend({k: v} for k, v in where.items())
+        
+        if not condiciones:
+            return {"success": False, "eliminados": 0, "tiempo": 0.0, "error": "Se requiere al menos un filtro"}
+        
+        filtro = condiciones[0] if len(condiciones) == 1 else {"$and": condiciones}
+        
+        try:
+            with self._writing():
+                # Por páginas de IDs: la memoria no depende de cuántos chunks cumplan el filtro, y el índice
+                # léxico y las estadísticas se actualizan con cada página ya eliminada de la colección
+                eliminados = 0
+                while True:
+                    ids = self.collection.get(where=filtro, include=[], limit=page_size)["ids"]
+                    if not ids:
+                        break
+                    self._persist_revision(self.version + 1)
+                    self.collection.delete(ids=ids)
+                    self.lexical_index.remove(ids)
+                    self.kb_stats.remove(ids)
+                    eliminados += len(ids)
+            
+                if eliminados:
+                    self.version += 1
+                    self.category_classifier.invalidate()
+                    self.lexical_index.maybe_save(self.version)
+                    self.kb_stats.maybe_save(self.version)
+                    self._forget_in_manifest(condiciones)
+            
+                elapsed = time.perf_counter() - inicio
+                logger.info(f"Eliminados {eliminados} chunks con filtro {filtro} en {elapsed:.2f}s")
+                return {"success": True, "eliminados": eliminados, "tiempo": round(elapsed, 3), "filtro": filtro}
+        except Exception as e:
+            logger.error(f"Error eliminando documentos: {e}")
+            return {"success": False, "eliminados": 0, "tiempo": round(time.perf_counter() - inicio, 3), "error": str(e)}
+    
+    def _forget_in_manifest(self, condiciones: List[Dict[str, Any]]):
+        """Quita del manifiesto los documentos afectados por un borrado filtrado"""
+        # Solo las igualdades simples sobre campos del documento (título, categoría, metadatos) pueden
+        # evaluarse sobre el manifiesto. Con operadores o con campos por chunk (chunk_index, chunk_hash,
+        # fecha_creacion...) se descarta y la próxima ingesta verifica contra la colección
+        campos_documento = {"titulo", "categoria"}
+        for titulo_doc in self.manifest.titles():
+            campos_documento.update(self.manifest.get(titulo_doc).get("metadatos") or {})
+        simples = all(
+            not k.startswith("$") and not isinstance(v, dict) and k in campos_documento
+            for condicion in condiciones for k, v in condicion.items()
+        )
+        if not simples:
+            self.manifest.clear(complete=False)
+            self.manifest.save()
+            return
+        
+        for titulo_doc in self.manifest.titles():
+            entrada = self.manifest.get(titulo_doc)
+            campos = {**entrada.get("metadatos", {}), "titulo": titulo_doc, "categoria": entrada.get("categoria")}
+            if all(campos.get(k) == v for condicion in condiciones for k, v in condicion.items()):
+                self.manifest.remove(titulo_doc)
+        self.manifest.save()
 
 # Instancia global del servicio
 vector_store = VectorStoreService()
\ No newline at end of file
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga de extremo a extremo para la API.
+Lanza /pqrs/submit, /chat y /documents/search con concurrencia configurable y reporta
+latencias p50/p95/p99 y peticiones por segundo por endpoint. Por defecto ejecuta la
+aplicación en proceso contra el LLM simulado de scripts/fake_llm_server.py, de modo que
+los resultados son reproducibles y no consumen cuota de OpenAI.
+
+Uso:
+    python scripts/benchmark_api.py --concurrencia 16 --peticiones 200 --salida bench.json
+    python scripts/benchmark_api.py --comparar bench_base.json --salida bench.json
+    python scripts/benchmark_api.py --url http://localhost:8000   # servidor ya levantado
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# Añadir el directorio raíz al path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR))
+sys.path.append(str(ROOT_DIR / "scripts"))
+
+import httpx
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ("pqrs", "chat", "search")
+
+PROBLEMAS = [
+    ("vias_pavimentos", "Hueco en la vía", "Hay un hueco profundo en la calzada que daña los vehículos"),
+    ("alumbrado_publico", "Luminaria apagada", "La luminaria del poste lleva varias noches sin encender"),
+    ("espacios_publicos", "Parque deteriorado", "Las bancas y juegos infantiles del parque están rotos"),
+    ("drenajes_alcantarillado", "Sumidero tapado", "El sumidero de la esquina se tapa y la calle se inunda cuando llueve"),
+    ("senalizacion", "Señal de pare caída", "La señal de pare del cruce fue derribada y hay riesgo de accidentes"),
+    ("puentes_obras_arte", "Grietas en puente peatonal", "El puente peatonal tiene grietas visibles en la baranda"),
+]
+
+PREGUNTAS = [
+    "¿Cuánto tiempo tarda la reparación de un hueco?",
+    "¿Cómo reporto una luminaria dañada?",
+    "¿Qué hago si un sumidero está tapado?",
+    "¿Quién se encarga del mantenimiento de los parques?",
+    "¿Cómo hago seguimiento a mi radicado?",
+    "¿Qué documentos necesito para solicitar una intervención en mi barrio?",
+]
+
+BUSQUEDAS = [
+    "reparación de huecos", "alumbrado público", "sumideros inundaciones", "señalización vial",
+    "mantenimiento de parques", "puente peatonal", "tiempos de respuesta", "línea de atención"
+]
+
+def build_request(endpoint: str, rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    """Arma (ruta, kwargs de httpx) variando el contenido para no medir solo la caché"""
+    barrio = rng.choice(["Laureles", "Belén", "Robledo", "Manrique", "El Poblado", "Castilla", "Aranjuez"])
+    numero = rng.randint(1, 120)
+    if endpoint == "pqrs":
+        categoria, titulo, descripcion = rng.choice(PROBLEMAS)
+        return "/api/v1/pqrs/submit", {"json": {
+            "tipo": rng.choice(["peticion", "queja", "reclamo"]),
+            "categoria": categoria,
+            "titulo": f"{titulo} en {barrio}",
+            "descripcion": f"{descripcion}. Ubicación: calle {numero} del barrio {barrio}.",
+            "ciudadano_nombre": "Ciudadano de Prueba",
+            "ciudadano_email": "prueba@medellin.gov.co"
+        }}
+    if endpoint == "chat":
+        return "/api/v1/chat", {"json": {"mensaje": f"{rng.choice(PREGUNTAS)} Vivo en {barrio}."}}
+    return "/api/v1/documents/search", {"params": {"query": f"{rng.choice(BUSQUEDAS)} {barrio}", "limit": 5}}
+
+def percentile(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))
+    return valores[indice]
+
+def summarize(latencias: List[float], errores: int, duracion: float) -> Dict[str, Any]:
+    ordenadas = sorted(latencias)
+    total = len(latencias) + errores
+    return {
+        "peticiones": total,
+        "errores": errores,
+        "duracion_s": round(duracion, 3),
+        "rps": round(len(latencias) / duracion, 2) if duracion > 0 else 0.0,
+        "p50_ms": round(percentile(ordenadas, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordenadas, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordenadas, 99) * 1000, 2),
+        "media_ms": round(sum(ordenadas) / len(ordenadas) * 1000, 2) if ordenadas else 0.0,
+        "max_ms": round(ordenadas[-1] * 1000, 2) if ordenadas else 0.0
+    }
+
+async def run_endpoint(client: httpx.AsyncClient, endpoint: str, peticiones: int, concurrencia: int,
+                       calentamiento: int, seed: int) -> Dict[str, Any]:
+    """Ejecuta la carga de un endpoint con un número fijo de workers concurrentes"""
+    rng = random.Random(f"{seed}-{endpoint}")
+    solicitudes = [build_request(endpoint, rng) for _ in range(calentamiento + peticiones)]
+
+    for ruta, kwargs in solicitudes[:calentamiento]:
+        await client.post(ruta, **kwargs)
+
+    pendientes = iter(solicitudes[calentamiento:])
+    latencias: List[float] = []
+    errores: List[str] = []
+
+    async def worker():
+        for ruta, kwargs in pendientes:
+            t0 = time.perf_counter()
+            try:
+                response = await client.post(ruta, **kwargs)
+                if response.status_code == 200:
+                    latencias.append(time.perf_counter() - t0)
+                else:
+                    errores.append(f"HTTP {response.status_code}")
+            except Exception as e:
+                errores.append(type(e).__name__)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrencia)))
+    resultado = summarize(latencias, len(errores), time.perf_counter() - inicio)
+    if errores:
+        resultado["ejemplos_error"] = sorted(set(errores))[:5]
+    return resultado
+
+def start_fake_llm(latencia_ms: float, tokens_por_segundo: float, port: int, tasa_error: float = 0.0):
+    """Levanta el LLM simulado en un hilo y devuelve (servidor, base_url)"""
+    import uvicorn
+    from fake_llm_server import create_app
+
+    config = uvicorn.Config(create_app(latencia_ms, tokens_por_segundo, tasa_error), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}/v1"
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return None
+
+def print_report(resultados: Dict[str, Dict[str, Any]], base: Optional[Dict[str, Any]] = None):
+    """Imprime la tabla de resultados y, si hay una ejecución base, la variación"""
+    print(f"\n{'endpoint':<10}{'pet.':>7}{'err.':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, r in resultados.items():
+        print(f"{endpoint:<10}{r['peticiones']:>7}{r['errores']:>6}{r['rps']:>9.2f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+        anterior = (base or {}).get("endpoints", {}).get(endpoint)
+        if anterior:
+            variaciones = []
+            for clave in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+                if anterior.get(clave):
+                    variaciones.append(f"{clave} {(r[clave] - anterior[clave]) / anterior[clave] * 100:+.1f}%")
+            print(f"{'':<10}vs base ({base.get('commit') or 'sin commit'}): {', '.join(variaciones)}")
+    print()
+
+async def run(args) -> bool:
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    fake_server = None
+    en_proceso = not args.url
+
+    if en_proceso:
+        os.chdir(ROOT_DIR)
+        from app.config import settings
+        from app.main import app
+        from app.services.llm_service import llm_service
+
+        if not args.openai_real:
+            fake_server, base_url = start_fake_llm(args.latencia_ms, args.tokens_por_segundo, args.puerto_llm, args.tasa_error)
+            settings.openai_base_url = base_url
+            settings.openai_api_key = settings.openai_api_key or "sk-benchmark"
+            llm_service.client = None
+            logger.info(f"LLM simulado en {base_url} ({args.latencia_ms:.0f}ms + {args.tokens_por_segundo:.0f} tokens/s)")
+        settings.response_cache_enabled = args.con_cache
+
+        # Mismo arranque que uvicorn: eventos de startup y calentamiento completo antes de medir
+        await app.router.startup()
+        await app.state.warmup_task
+        client = httpx.AsyncClient(app=app, base_url="http://benchmark", timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrencia))
+
+    resultados: Dict[str, Dict[str, Any]] = {}
+    try:
+        for endpoint in endpoints:
+            logger.info(f"Midiendo {endpoint}: {args.peticiones} peticiones, concurrencia {args.concurrencia}")
+            resultados[endpoint] = await run_endpoint(
+                client, endpoint, args.peticiones, args.concurrencia, args.calentamiento, args.seed
+            )
+    finally:
+        await client.aclose()
+        if en_proceso:
+            await app.router.shutdown()
+        if fake_server is not None:
+            fake_server.should_exit = True
+
+    base = None
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+    print_report(resultados, base)
+
+    salida = {
+        "fecha": datetime.now().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "configuracion": {
+            "modo": "en_proceso" if en_proceso else args.url,
+            "concurrencia": args.concurrencia,
+            "peticiones": args.peticiones,
+            "calentamiento": args.calentamiento,
+            "seed": args.seed,
+            "cache_respuestas": args.con_cache if en_proceso else None,
+            "llm": "openai" if args.openai_real or not en_proceso else {
+                "latencia_ms": args.latencia_ms,
+                "tokens_por_segundo": args.tokens_por_segundo,
+                "tasa_error": args.tasa_error
+            }
+        },
+        "endpoints": resultados
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(salida, f, ensure_ascii=False, indent=2)
+        logger.info(f"Resultados guardados en {args.salida}")
+
+    return all(r["errores"] == 0 for r in resultados.values())
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Endpoints a medir (pqrs,chat,search)")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Peticiones simultáneas por endpoint")
+    parser.add_argument("--peticiones", type=int, default=100, help="Peticiones medidas por endpoint")
+    parser.add_argument("--calentamiento", type=int, default=5, help="Peticiones previas no medidas")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla para generar las solicitudes")
+    parser.add_argument("--url", default=None, help="Medir un servidor ya levantado en vez de la app en proceso")
+    parser.add_argument("--latencia-ms", type=float, default=300.0, help="Tiempo hasta el primer token del LLM simulado")
+    parser.add_argument("--tokens-por-segundo", type=float, default=50.0, help="Velocidad del LLM simulado")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de respuestas 503 del LLM simulado")
+    parser.add_argument("--puerto-llm", type=int, default=8100, help="Puerto del LLM simulado")
+    parser.add_argument("--openai-real", action="store_true", help="Usar la API configurada en vez del LLM simulado")
+    parser.add_argument("--con-cache", action="store_true", help="Mantener activa la caché semántica de respuestas")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout por petición en segundos")
+    parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados")
+    parser.add_argument("--comparar", default=None, help="Resultados JSON de una ejecución base para comparar")
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
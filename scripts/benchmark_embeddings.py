@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los backends de embeddings: sentence-transformers (PyTorch) frente al modelo ONNX
+int8 de scripts/export_onnx_embeddings.py. Cada backend se mide en un proceso aparte para que la
+memoria no se mezcle: tiempo de carga (importaciones incluidas), RSS, throughput de encode por
+lotes y latencia de encode de una consulta. Con ambos backends compara además los vectores
+(coseno por texto) y el recall@k de recuperación contra PyTorch, tanto con todo re-embebido en
+ONNX como con consultas ONNX sobre un índice construido con PyTorch (sin re-embeber la base).
+
+Uso:
+    python scripts/benchmark_embeddings.py --textos 1000 --salida embeddings.json
+    python scripts/benchmark_embeddings.py --backends onnx --hilos 2
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+# Añadir el directorio raíz al path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR))
+sys.path.append(str(ROOT_DIR / "scripts"))
+
+import numpy as np
+import logging
+
+from app.config import settings
+from export_onnx_embeddings import sample_texts
+from benchmark_api import percentile, git_commit
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("sentence_transformers", "onnx")
+
+def current_rss_mb() -> float:
+    """RSS actual del proceso (Linux); si no está disponible, el pico"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def peak_rss_mb() -> float:
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return pico / 1024 / 1024 if sys.platform == "darwin" else pico / 1024
+
+def build_corpus(textos: int, consultas: int, seed: int):
+    """Chunks sintéticos combinando frases de los documentos de ejemplo, y consultas tomadas de sus preguntas"""
+    rng = random.Random(seed)
+    frases = sample_texts()
+    corpus = [" ".join(rng.sample(frases, rng.randint(1, 6))) for _ in range(textos)]
+    preguntas = [f for f in frases if f.endswith("?")]
+    return corpus, [rng.choice(preguntas) for _ in range(consultas)]
+
+def load_backend(backend: str, hilos: int, modelo_onnx: str):
+    if backend == "onnx":
+        from app.services.onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(modelo_onnx, threads=hilos)
+    if backend == "sentence_transformers":
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if hilos > 0:
+            torch.set_num_threads(hilos)
+        return SentenceTransformer(settings.embedding_model, device="cpu")
+    raise ValueError(f"Backend desconocido: {backend}")
+
+def run_worker(backend: str, datos: str, lote: int, hilos: int, modelo_onnx: str) -> Dict[str, Any]:
+    """Mide un backend dentro del proceso actual y guarda sus vectores junto a los datos"""
+    with open(datos, "r", encoding="utf-8") as f:
+        entrada = json.load(f)
+    corpus, consultas = entrada["corpus"], entrada["consultas"]
+
+    rss_inicial = current_rss_mb()
+    t0 = time.perf_counter()
+    modelo = load_backend(backend, hilos, modelo_onnx)
+    carga = time.perf_counter() - t0
+    rss_cargado = current_rss_mb()
+
+    # Calentamiento: la primera inferencia reserva memoria y prepara kernels
+    modelo.encode(corpus[:lote], batch_size=lote)
+
+    t0 = time.perf_counter()
+    vectores_corpus = np.asarray(modelo.encode(corpus, batch_size=lote), dtype=np.float32)
+    throughput = len(corpus) / (time.perf_counter() - t0)
+
+    latencias, vectores_consultas = [], []
+    for consulta in consultas:
+        t0 = time.perf_counter()
+        vectores_consultas.append(modelo.encode([consulta])[0])
+        latencias.append(time.perf_counter() - t0)
+    ordenadas = sorted(latencias)
+
+    np.savez(f"{datos}.{backend}.npz", corpus=vectores_corpus, consultas=np.asarray(vectores_consultas, dtype=np.float32))
+    return {
+        "carga_s": round(carga, 3),
+        "rss_inicial_mb": round(rss_inicial, 1),
+        "rss_cargado_mb": round(rss_cargado, 1),
+        "rss_final_mb": round(current_rss_mb(), 1),
+        "rss_pico_mb": round(peak_rss_mb(), 1),
+        "throughput_textos_s": round(throughput, 1),
+        "latencia_p50_ms": round(percentile(ordenadas, 50) * 1000, 3),
+        "latencia_p95_ms": round(percentile(ordenadas, 95) * 1000, 3),
+        "latencia_p99_ms": round(percentile(ordenadas, 99) * 1000, 3)
+    }
+
+def top_k(consultas: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    similitudes = consultas @ corpus.T
+    return np.argsort(-similitudes, axis=1)[:, :k]
+
+def recall(esperados: np.ndarray, obtenidos: np.ndarray) -> float:
+    aciertos = sum(len(set(e) & set(o)) for e, o in zip(esperados.tolist(), obtenidos.tolist()))
+    return round(aciertos / esperados.size, 4)
+
+def compare(datos: str, k: int) -> Dict[str, Any]:
+    """Concordancia de los vectores ONNX con los de PyTorch y recall@k de recuperación"""
+    referencia = np.load(f"{datos}.sentence_transformers.npz")
+    cuantizados = np.load(f"{datos}.onnx.npz")
+    vectores_ref = np.concatenate([referencia["corpus"], referencia["consultas"]])
+    vectores_onnx = np.concatenate([cuantizados["corpus"], cuantizados["consultas"]])
+    cosenos = np.sum(vectores_ref * vectores_onnx, axis=1) / (
+        np.linalg.norm(vectores_ref, axis=1) * np.linalg.norm(vectores_onnx, axis=1)
+    )
+
+    esperados = top_k(referencia["consultas"], referencia["corpus"], k)
+    return {
+        "coseno_min": round(float(cosenos.min()), 5),
+        "coseno_p1": round(float(np.percentile(cosenos, 1)), 5),
+        "coseno_medio": round(float(cosenos.mean()), 5),
+        f"recall@{k}_reembebido": recall(esperados, top_k(cuantizados["consultas"], cuantizados["corpus"], k)),
+        f"recall@{k}_indice_pytorch": recall(esperados, top_k(cuantizados["consultas"], referencia["corpus"], k))
+    }
+
+def print_report(resultados: Dict[str, Dict[str, Any]], comparacion: Optional[Dict[str, Any]]):
+    print(f"\n{'backend':<24}{'carga s':>9}{'RSS MB':>9}{'pico MB':>9}{'textos/s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for backend, r in resultados.items():
+        print(f"{backend:<24}{r['carga_s']:>9.2f}{r['rss_final_mb']:>9.0f}{r['rss_pico_mb']:>9.0f}"
+              f"{r['throughput_textos_s']:>10.1f}{r['latencia_p50_ms']:>9.2f}{r['latencia_p95_ms']:>9.2f}")
+    if comparacion:
+        print()
+        for clave, valor in comparacion.items():
+            print(f"{clave:<28}{valor}")
+    print()
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--textos", type=int, default=1000, help="Chunks sintéticos a codificar")
+    parser.add_argument("--consultas", type=int, default=200, help="Consultas para latencia y recall")
+    parser.add_argument("--lote", type=int, default=settings.embedding_batch_size, help="Tamaño de lote del encode")
+    parser.add_argument("--hilos", type=int, default=settings.embedding_onnx_threads, help="Hilos de inferencia (0: predeterminado)")
+    parser.add_argument("--k", type=int, default=5, help="Resultados por consulta para el recall")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help=f"Backends a comparar ({','.join(BACKENDS)})")
+    parser.add_argument("--modelo-onnx", default=settings.embedding_onnx_path, help="Directorio del modelo ONNX")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del corpus")
+    parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--datos", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.datos, args.lote, args.hilos, args.modelo_onnx)))
+        return
+
+    corpus, consultas = build_corpus(args.textos, args.consultas, args.seed)
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    resultados: Dict[str, Dict[str, Any]] = {}
+    comparacion = None
+    with tempfile.TemporaryDirectory(prefix="bench_embeddings_") as directorio:
+        datos = os.path.join(directorio, "datos.json")
+        with open(datos, "w", encoding="utf-8") as f:
+            json.dump({"corpus": corpus, "consultas": consultas}, f, ensure_ascii=False)
+
+        for backend in backends:
+            logger.info(f"Midiendo '{backend}' con {len(corpus)} textos y {len(consultas)} consultas")
+            proceso = subprocess.run(
+                [sys.executable, __file__, "--worker", backend, "--datos", datos, "--lote", str(args.lote),
+                 "--hilos", str(args.hilos), "--modelo-onnx", args.modelo_onnx],
+                capture_output=True, text=True
+            )
+            if proceso.returncode != 0:
+                logger.error(f"El backend '{backend}' falló:\n{proceso.stderr[-2000:]}")
+                continue
+            resultados[backend] = json.loads(proceso.stdout.strip().splitlines()[-1])
+
+        if all(backend in resultados for backend in BACKENDS):
+            comparacion = compare(datos, args.k)
+
+    print_report(resultados, comparacion)
+
+    if args.salida:
+        salida = {
+            "fecha": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "configuracion": {
+                "textos": args.textos,
+                "consultas": args.consultas,
+                "lote": args.lote,
+                "hilos": args.hilos,
+                "k": args.k,
+                "modelo": settings.embedding_model,
+                "modelo_onnx": args.modelo_onnx,
+                "seed": args.seed
+            },
+            "backends": resultados,
+            "comparacion": comparacion
+        }
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(salida, f, ensure_ascii=False, indent=2)
+        logger.info(f"Resultados guardados en {args.salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los backends del índice vectorial: colección única de ChromaDB, particiones por
+categoría e índice NumPy exacto (float32 y float16). Genera un corpus sintético de embeddings
+agrupados por categoría (con categorías pequeñas si la distribución es sesgada), lo carga en
+cada backend dentro de un directorio temporal y mide latencia p50/p95/p99 y recall@k contra
+búsqueda exacta, con y sin filtro de categoría.
+
+Uso:
+    python scripts/benchmark_partitions.py --chunks 20000 --consultas 300 --salida particiones.json
+    python scripts/benchmark_partitions.py --backends unica,numpy
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+# Añadir el directorio raíz al path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR))
+sys.path.append(str(ROOT_DIR / "scripts"))
+
+import numpy as np
+import logging
+
+from app.models import CategoriaPQRS
+from app.services.vector_index import ChromaIndex
+from app.services.partitioned_collection import PartitionedCollection
+from app.services.numpy_index import NumpyIndex
+from benchmark_api import percentile, git_commit
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Chroma avisa en cada consulta que pide más resultados de los que hay; no aporta aquí
+logging.getLogger("chromadb").setLevel(logging.ERROR)
+
+CATEGORIAS = [c.value for c in CategoriaPQRS]
+
+BACKENDS = ("unica", "particiones", "numpy", "numpy_f16")
+
+def create_backend(nombre: str, client, directorio: str):
+    if nombre == "unica":
+        return ChromaIndex(client, "bench")
+    if nombre == "particiones":
+        return PartitionedCollection(client, "bench")
+    if nombre == "numpy":
+        return NumpyIndex(os.path.join(directorio, "numpy"))
+    if nombre == "numpy_f16":
+        return NumpyIndex(os.path.join(directorio, "numpy_f16"), dtype="float16")
+    raise ValueError(f"Backend desconocido: {nombre}")
+
+def build_corpus(chunks: int, dimension: int, sesgada: bool, rng: np.random.Generator):
+    """Embeddings normalizados alrededor de un centro por categoría"""
+    if sesgada:
+        # Pocas categorías concentran la mayoría de los chunks, como en la base real
+        pesos = np.array([0.4, 0.25, 0.15, 0.08, 0.05, 0.04, 0.02, 0.01])[:len(CATEGORIAS)]
+    else:
+        pesos = np.ones(len(CATEGORIAS))
+    pesos = pesos / pesos.sum()
+    etiquetas = rng.choice(len(CATEGORIAS), size=chunks, p=pesos)
+    centros = rng.normal(size=(len(CATEGORIAS), dimension))
+    vectores = centros[etiquetas] * 0.6 + rng.normal(size=(chunks, dimension))
+    vectores /= np.linalg.norm(vectores, axis=1, keepdims=True)
+    return vectores.astype(np.float32), etiquetas, centros
+
+def load(coleccion, vectores: np.ndarray, etiquetas: np.ndarray, lote: int = 2000) -> float:
+    inicio = time.perf_counter()
+    for desde in range(0, len(vectores), lote):
+        hasta = min(desde + lote, len(vectores))
+        coleccion.upsert(
+            ids=[f"chunk_{i}" for i in range(desde, hasta)],
+            embeddings=vectores[desde:hasta].tolist(),
+            documents=[f"documento sintético {i}" for i in range(desde, hasta)],
+            metadatas=[{"titulo": f"doc_{i // 10}", "categoria": CATEGORIAS[etiquetas[i]], "chunk_index": i % 10}
+                       for i in range(desde, hasta)]
+        )
+    return time.perf_counter() - inicio
+
+def exact_top_k(vectores: np.ndarray, etiquetas: np.ndarray, consulta: np.ndarray, k: int,
+                categoria: Optional[int]) -> List[str]:
+    indices = np.arange(len(vectores)) if categoria is None else np.flatnonzero(etiquetas == categoria)
+    distancias = np.sum((vectores[indices] - consulta) ** 2, axis=1)
+    orden = indices[np.argsort(distancias)[:k]]
+    return [f"chunk_{i}" for i in orden]
+
+def measure(coleccion, consultas: List[Dict[str, Any]], k: int) -> Dict[str, Any]:
+    latencias, aciertos, esperados, incompletas = [], 0, 0, 0
+    for consulta in consultas:
+        where = {"categoria": CATEGORIAS[consulta["categoria"]]} if consulta["categoria"] is not None else None
+        t0 = time.perf_counter()
+        # Mismo include que la búsqueda del servicio: textos y metadatos también cuentan
+        resultado = coleccion.query(
+            query_embeddings=[consulta["vector"]], n_results=k, where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        latencias.append(time.perf_counter() - t0)
+        ids = resultado["ids"][0]
+        aciertos += len(set(ids) & set(consulta["exactos"]))
+        esperados += len(consulta["exactos"])
+        incompletas += len(ids) < len(consulta["exactos"])
+    ordenadas = sorted(latencias)
+    return {
+        "consultas": len(consultas),
+        "p50_ms": round(percentile(ordenadas, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordenadas, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordenadas, 99) * 1000, 3),
+        "media_ms": round(sum(ordenadas) / len(ordenadas) * 1000, 3),
+        "recall": round(aciertos / esperados, 4) if esperados else 0.0,
+        "incompletas": incompletas
+    }
+
+def print_report(resultados: Dict[str, Dict[str, Dict[str, Any]]]):
+    print(f"\n{'escenario':<28}{'backend':<14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'recall':>8}{'incompl.':>10}")
+    for escenario, por_backend in resultados.items():
+        for backend, r in por_backend.items():
+            print(f"{escenario:<28}{backend:<14}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                  f"{r['recall']:>8.3f}{r['incompletas']:>10}")
+    print()
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000, help="Chunks del corpus sintético")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimensión de los embeddings")
+    parser.add_argument("--consultas", type=int, default=200, help="Consultas por escenario")
+    parser.add_argument("--k", type=int, default=5, help="Resultados por consulta")
+    parser.add_argument("--uniforme", action="store_true", help="Repartir los chunks por igual entre categorías")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help=f"Backends a comparar ({','.join(BACKENDS)})")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del corpus y las consultas")
+    parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    rng = np.random.default_rng(args.seed)
+    vectores, etiquetas, centros = build_corpus(args.chunks, args.dimension, not args.uniforme, rng)
+    tamanos = {CATEGORIAS[i]: int(n) for i, n in enumerate(np.bincount(etiquetas, minlength=len(CATEGORIAS)))}
+    logger.info(f"Corpus sintético: {args.chunks} chunks de dimensión {args.dimension}; por categoría {tamanos}")
+
+    pequena = int(np.argmin(np.bincount(etiquetas, minlength=len(CATEGORIAS))))
+    def consultas_para(categoria_filtro) -> List[Dict[str, Any]]:
+        consultas = []
+        for _ in range(args.consultas):
+            origen = rng.integers(len(CATEGORIAS)) if categoria_filtro in (None, "aleatoria") else categoria_filtro
+            vector = centros[origen] * 0.6 + rng.normal(size=args.dimension)
+            vector = (vector / np.linalg.norm(vector)).astype(np.float32)
+            filtro = None if categoria_filtro is None else int(origen)
+            consultas.append({
+                "vector": vector.tolist(),
+                "categoria": filtro,
+                "exactos": exact_top_k(vectores, etiquetas, vector, args.k, filtro)
+            })
+        return consultas
+
+    escenarios = {
+        "sin_filtro": consultas_para(None),
+        "filtro_categoria": consultas_para("aleatoria"),
+        f"filtro_pequena ({CATEGORIAS[pequena]})": consultas_para(pequena)
+    }
+
+    directorio = tempfile.mkdtemp(prefix="bench_indice_")
+    try:
+        client = chromadb.PersistentClient(path=directorio, settings=ChromaSettings(anonymized_telemetry=False))
+        backends = {
+            nombre: create_backend(nombre, client, directorio)
+            for nombre in (b.strip() for b in args.backends.split(",")) if nombre
+        }
+        carga = {}
+        for nombre, coleccion in backends.items():
+            carga[nombre] = round(load(coleccion, vectores, etiquetas), 3)
+            logger.info(f"Carga '{nombre}': {carga[nombre]}s")
+
+        resultados: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for escenario, consultas in escenarios.items():
+            resultados[escenario] = {}
+            for nombre, coleccion in backends.items():
+                # Una pasada de calentamiento para no medir la carga del índice HNSW
+                measure(coleccion, consultas[:10], args.k)
+                resultados[escenario][nombre] = measure(coleccion, consultas, args.k)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print_report(resultados)
+
+    if args.salida:
+        salida = {
+            "fecha": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "configuracion": {
+                "chunks": args.chunks,
+                "dimension": args.dimension,
+                "consultas": args.consultas,
+                "k": args.k,
+                "distribucion": "uniforme" if args.uniforme else "sesgada",
+                "backends": list(backends),
+                "seed": args.seed,
+                "por_categoria": tamanos
+            },
+            "carga_s": carga,
+            "escenarios": resultados
+        }
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(salida, f, ensure_ascii=False, indent=2)
+        logger.info(f"Resultados guardados en {args.salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Script para verificar que el pipeline no bloquea el event loop.
+Lanza varias PQRS con un LLM simulado lento y mide la latencia de /health
+mientras las generaciones siguen en curso.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+
+# Añadir el directorio raíz al path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR))
+os.chdir(ROOT_DIR)
+
+import httpx
+from app.config import settings
+from app.main import app
+from app.services.llm_service import llm_service
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SlowCompletions:
+    """Simula chat.completions.create con una latencia fija"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.llamadas = 0
+
+    async def create(self, **kwargs):
+        self.llamadas += 1
+        await asyncio.sleep(self.delay)
+        message = SimpleNamespace(content="Estimado ciudadano, su solicitud fue recibida.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+async def run_check(generaciones: int, delay: float, probes: int) -> bool:
+    """Mide /health con varias generaciones lentas en vuelo"""
+    settings.response_cache_enabled = False
+    completions = SlowCompletions(delay)
+    llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    async with httpx.AsyncClient(app=app, base_url="http://test", timeout=delay * 10) as client:
+        async def submit(i: int):
+            return await client.post("/api/v1/pqrs/submit", json={
+                "tipo": "queja",
+                "categoria": "vias_pavimentos",
+                "titulo": f"Hueco en la vía número {i}",
+                "descripcion": f"Reporte de prueba de concurrencia número {i}",
+                "ciudadano_nombre": "Ciudadano de Prueba",
+                "ciudadano_email": "prueba@medellin.gov.co"
+            })
+
+        start = time.perf_counter()
+        pendientes = [asyncio.create_task(submit(i)) for i in range(generaciones)]
+        await asyncio.sleep(delay / 4)
+
+        latencias = []
+        for _ in range(probes):
+            t0 = time.perf_counter()
+            response = await client.get("/api/v1/health")
+            latencias.append(time.perf_counter() - t0)
+            assert response.status_code == 200
+
+        en_vuelo = sum(1 for task in pendientes if not task.done())
+        respuestas = await asyncio.gather(*pendientes)
+        total = time.perf_counter() - start
+
+    max_health = max(latencias)
+    logger.info(f"Generaciones: {generaciones} x {delay}s, completadas en {total:.2f}s")
+    logger.info(f"En vuelo durante las pruebas de /health: {en_vuelo}")
+    logger.info(f"/health: máx {max_health * 1000:.1f}ms, promedio {sum(latencias) / len(latencias) * 1000:.1f}ms")
+
+    # El endpoint responde 200 con la respuesta de fallback si el pipeline falla: se exige una generación real
+    fallidas = [r for r in respuestas if r.status_code != 200 or r.json()["pqrs_id"].startswith("PQRS_ERROR")]
+    logger.info(f"Llamadas al LLM simulado: {completions.llamadas}, respuestas de fallback: {len(fallidas)}")
+
+    ok = (
+        not fallidas
+        and completions.llamadas == generaciones
+        and en_vuelo == generaciones
+        and max_health < delay / 2
+        and total < delay * generaciones
+    )
+    logger.info("✅ El event loop permanece libre" if ok else "❌ El event loop se bloqueó")
+    return ok
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--generaciones", type=int, default=8, help="PQRS concurrentes en vuelo")
+    parser.add_argument("--delay", type=float, default=2.0, help="Latencia simulada del LLM en segundos")
+    parser.add_argument("--probes", type=int, default=10, help="Llamadas a /health durante la prueba")
+    args = parser.parse_args()
+
+    ok = asyncio.run(run_check(args.generaciones, args.delay, args.probes))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
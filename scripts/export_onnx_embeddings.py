@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Script para exportar el modelo de embeddings de sentence-transformers a ONNX cuantizado a int8,
+para usarlo con EMBEDDING_BACKEND=onnx en nodos sin torch. Exporta el transformer a ONNX en
+float32, cuantiza dinámicamente sus pesos a int8 con onnxruntime, guarda el tokenizador y la
+configuración del pooling, y valida el resultado contra el modelo PyTorch: la similitud coseno
+entre ambos vectores de cada texto de validación debe superar la tolerancia.
+
+Requiere torch, sentence-transformers y onnx solo en la máquina que exporta.
+
+Uso:
+    python scripts/export_onnx_embeddings.py
+    python scripts/export_onnx_embeddings.py --modelo all-MiniLM-L6-v2 --destino ./data/models/minilm-int8
+    python scripts/export_onnx_embeddings.py --tolerancia 0.98 --conservar-fp32
+"""
+
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from typing import List
+
+# Añadir el directorio raíz al path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR))
+
+import numpy as np
+import logging
+
+from app.config import settings
+from app.services.onnx_embedder import OnnxEmbedder, MODEL_FILE, TOKENIZER_FILE, CONFIG_FILE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Similitud coseno mínima entre el vector int8 y el de PyTorch para un mismo texto
+TOLERANCIA_COSENO = 0.98
+
+def sample_texts(limit: int = 0) -> List[str]:
+    """Párrafos y preguntas de los documentos de ejemplo, como textos de validación"""
+    textos = []
+    for archivo in sorted((ROOT_DIR / "data" / "sample_documents").glob("*.txt")):
+        for linea in archivo.read_text(encoding="utf-8").splitlines():
+            linea = linea.strip()
+            # Se omiten separadores y encabezados cortos
+            if len(linea) >= 30 and not set(linea) <= set("=-"):
+                textos.append(linea[3:] if linea[:3] in ("P: ", "R: ") else linea)
+    return textos[:limit] if limit else textos
+
+def export_fp32(modelo, destino: str):
+    """Exporta el transformer de sentence-transformers a ONNX con ejes dinámicos de lote y secuencia"""
+    import torch
+
+    transformer = modelo[0].auto_model.eval()
+
+    class SalidaTokens(torch.nn.Module):
+        def __init__(self, modelo_base):
+            super().__init__()
+            self.modelo_base = modelo_base
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.modelo_base(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    ejemplo = modelo.tokenizer(["texto de ejemplo para exportar"], return_tensors="pt")
+    ejes = {"input_ids": {0: "lote", 1: "secuencia"}, "attention_mask": {0: "lote", 1: "secuencia"},
+            "token_type_ids": {0: "lote", 1: "secuencia"}, "last_hidden_state": {0: "lote", 1: "secuencia"}}
+    opciones = {}
+    # Las versiones recientes de torch exportan con dynamo por defecto; se usa el exportador clásico
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        opciones["dynamo"] = False
+    with torch.no_grad():
+        torch.onnx.export(
+            SalidaTokens(transformer),
+            (ejemplo["input_ids"], ejemplo["attention_mask"],
+             ejemplo.get("token_type_ids", torch.zeros_like(ejemplo["input_ids"]))),
+            destino,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes=ejes,
+            opset_version=14,
+            do_constant_folding=True,
+            **opciones
+        )
+
+def validate(modelo, embedder: OnnxEmbedder, textos: List[str], batch_size: int) -> dict:
+    """Compara los vectores de PyTorch y ONNX texto a texto"""
+    referencia = modelo.encode(textos, batch_size=batch_size, normalize_embeddings=True)
+    cuantizados = embedder.encode(textos, batch_size=batch_size)
+    cosenos = np.sum(referencia * cuantizados, axis=1) / (
+        np.linalg.norm(referencia, axis=1) * np.linalg.norm(cuantizados, axis=1)
+    )
+    return {
+        "textos": len(textos),
+        "coseno_min": round(float(cosenos.min()), 5),
+        "coseno_medio": round(float(cosenos.mean()), 5),
+        "coseno_p1": round(float(np.percentile(cosenos, 1)), 5)
+    }
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modelo", default=settings.embedding_model, help="Modelo de sentence-transformers a exportar")
+    parser.add_argument("--destino", default=settings.embedding_onnx_path, help="Directorio de salida")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_COSENO, help="Coseno mínimo contra PyTorch por texto")
+    parser.add_argument("--conservar-fp32", action="store_true", help="Guardar también el modelo ONNX float32 sin cuantizar")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Pooling, Normalize
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    modelo = SentenceTransformer(args.modelo, device="cpu")
+    pooling = next((m for m in modelo if isinstance(m, Pooling)), None)
+    # sentence-transformers 2.x guarda un booleano por modo; las versiones recientes, el nombre del modo
+    config_pooling = pooling.get_config_dict() if pooling is not None else {}
+    if config_pooling.get("pooling_mode_mean_tokens") is not True and config_pooling.get("pooling_mode") != "mean":
+        logger.error(f"El modelo '{args.modelo}' no usa mean pooling; el backend ONNX no lo reproduce")
+        sys.exit(1)
+
+    os.makedirs(args.destino, exist_ok=True)
+    inicio = time.perf_counter()
+    with tempfile.TemporaryDirectory() as temporal:
+        ruta_fp32 = os.path.join(args.destino if args.conservar_fp32 else temporal, "model_fp32.onnx")
+        export_fp32(modelo, ruta_fp32)
+        logger.info(f"Modelo exportado a ONNX float32 en {time.perf_counter() - inicio:.1f}s")
+
+        # Cuantización dinámica: pesos int8 fijos, activaciones cuantizadas en cada inferencia.
+        # El cuantizador registra cada nodo en el logger raíz, así que se silencia mientras corre
+        logging.getLogger().setLevel(logging.WARNING)
+        quantize_dynamic(ruta_fp32, os.path.join(args.destino, MODEL_FILE), weight_type=QuantType.QInt8)
+        logging.getLogger().setLevel(logging.INFO)
+    modelo.tokenizer.backend_tokenizer.save(os.path.join(args.destino, TOKENIZER_FILE))
+
+    configuracion = {
+        "modelo": args.modelo,
+        "dimension": modelo.get_sentence_embedding_dimension(),
+        "max_seq_length": modelo.max_seq_length,
+        "normalize": any(isinstance(m, Normalize) for m in modelo),
+        "cuantizacion": "int8 dinámica (pesos QInt8)",
+        "exportado": datetime.now().isoformat()
+    }
+    with open(os.path.join(args.destino, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(configuracion, f, ensure_ascii=False, indent=2)
+
+    tamano = os.path.getsize(os.path.join(args.destino, MODEL_FILE)) / 1024 / 1024
+    logger.info(f"Modelo int8 guardado en {args.destino} ({tamano:.1f} MB)")
+
+    validacion = validate(modelo, OnnxEmbedder(args.destino), sample_texts(), batch_size=32)
+    configuracion["validacion"] = validacion
+    with open(os.path.join(args.destino, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(configuracion, f, ensure_ascii=False, indent=2)
+    logger.info(
+        f"Validación contra PyTorch en {validacion['textos']} textos: coseno mínimo {validacion['coseno_min']}, "
+        f"medio {validacion['coseno_medio']}"
+    )
+    if validacion["coseno_min"] < args.tolerancia:
+        logger.error(f"El coseno mínimo {validacion['coseno_min']} está por debajo de la tolerancia {args.tolerancia}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita la API de chat completions de OpenAI para pruebas y benchmarks.
+Las respuestas son deterministas (dependen solo del prompt) y la latencia se controla
+con un tiempo hasta el primer token y una velocidad de generación en tokens por segundo.
+
+Uso:
+    python scripts/fake_llm_server.py --port 8100 --latencia-ms 300 --tokens-por-segundo 50
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 python -m app.main
+"""
+
+import json
+import time
+import uuid
+import asyncio
+import random
+import hashlib
+import argparse
+from typing import Dict, Any, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, JSONResponse
+
+CATEGORIAS = [
+    "vias_pavimentos", "alumbrado_publico", "espacios_publicos", "puentes_obras_arte",
+    "drenajes_alcantarillado", "senalizacion", "mantenimiento_general", "otros"
+]
+
+FRASES = [
+    "Cordial saludo, agradecemos su comunicación con la Secretaría de Infraestructura.",
+    "Su solicitud ha sido registrada y será atendida según los procedimientos vigentes.",
+    "Un equipo técnico realizará la visita de inspección en los próximos días hábiles.",
+    "Puede hacer seguimiento con el número de radicado en el portal de la Alcaldía.",
+    "Para emergencias que representen riesgo inmediato comuníquese con la línea 123.",
+    "Los tiempos de atención dependen de la prioridad asignada en la evaluación técnica.",
+    "Le invitamos a adjuntar fotografías que faciliten la identificación del daño.",
+    "Agradecemos su participación ciudadana en el cuidado de la infraestructura de Medellín."
+]
+
+def respuesta_determinista(prompt: str, max_tokens: int) -> List[str]:
+    """Construye una respuesta fija para el prompt, como lista de tokens (palabras)"""
+    semilla = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+
+    # Prompts de clasificación: responder solo con una categoría
+    if "Clasifica esta PQRS" in prompt:
+        return [CATEGORIAS[semilla % len(CATEGORIAS)]]
+
+    frases = [FRASES[(semilla >> (3 * i)) % len(FRASES)] for i in range(6)]
+    palabras = " ".join(frases).split()
+    tokens = [palabra + " " for palabra in palabras]
+    return tokens[:max_tokens]
+
+def create_app(latencia_ms: float = 300.0, tokens_por_segundo: float = 50.0, tasa_error: float = 0.0, seed: int = 0) -> FastAPI:
+    """Crea la aplicación del servidor simulado; tasa_error es la fracción de peticiones que responden 503"""
+    app = FastAPI(title="LLM simulado")
+    app.state.stats = {"peticiones": 0, "streaming": 0, "tokens": 0, "errores": 0}
+    intervalo = 1.0 / tokens_por_segundo if tokens_por_segundo > 0 else 0.0
+    rng = random.Random(seed)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        tokens = respuesta_determinista(prompt, int(body.get("max_tokens") or 256))
+        modelo = body.get("model", "gpt-3.5-turbo")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        creado = int(time.time())
+
+        app.state.stats["peticiones"] += 1
+        if tasa_error > 0 and rng.random() < tasa_error:
+            app.state.stats["errores"] += 1
+            return JSONResponse(status_code=503, content={"error": {
+                "message": "Servicio sobrecargado (simulado)", "type": "server_error", "code": None
+            }})
+        app.state.stats["tokens"] += len(tokens)
+        await asyncio.sleep(latencia_ms / 1000)
+
+        if body.get("stream"):
+            app.state.stats["streaming"] += 1
+
+            async def eventos():
+                for i, token in enumerate(tokens):
+                    if i and intervalo:
+                        await asyncio.sleep(intervalo)
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": creado, "model": modelo,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                final = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": creado, "model": modelo,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(eventos(), media_type="text/event-stream")
+
+        await asyncio.sleep(intervalo * max(0, len(tokens) - 1))
+        tokens_prompt = len(prompt.split())
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": creado,
+            "model": modelo,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": tokens_prompt,
+                "completion_tokens": len(tokens),
+                "total_tokens": tokens_prompt + len(tokens)
+            }
+        }
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, Any]:
+        return app.state.stats
+
+    return app
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latencia-ms", type=float, default=300.0, help="Tiempo hasta el primer token")
+    parser.add_argument("--tokens-por-segundo", type=float, default=50.0, help="Velocidad de generación (0 = instantánea)")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de peticiones que responden 503")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla para los errores simulados")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.latencia_ms, args.tokens_por_segundo, args.tasa_error, args.seed), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
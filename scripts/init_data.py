@@ -238,6 +238,8 @@ async def init_database():
         # Cargar documentos de archivos
         sample_docs, specific_docs = load_sample_documents()
         
+        documentos = []
+        
         # Procesar archivos
         for doc_info in sample_docs:
             file_path = doc_info["file"]
@@ -248,18 +250,12 @@ async def init_database():
                 with open(file_path, 'r', encoding='utf-8') as f:
                     contenido = f.read()
                 
-                documento = DocumentoBase(
+                documentos.append(DocumentoBase(
                     titulo=doc_info["titulo"],
                     contenido=contenido,
                     categoria=doc_info["categoria"],
                     metadatos=doc_info["metadatos"]
-                )
-                
-                success = vector_store.add_document(documento)
-                if success:
-                    logger.info(f"✅ Documento '{documento.titulo}' añadido exitosamente")
-                else:
-                    logger.error(f"❌ Error añadiendo '{documento.titulo}'")
+                ))
             else:
                 logger.warning(f"⚠️  Archivo no encontrado: {file_path}")
         
@@ -267,18 +263,25 @@ async def init_database():
         for doc_data in specific_docs:
             logger.info(f"📝 Creando documento: {doc_data['titulo']}")
             
-            documento = DocumentoBase(
+            documentos.append(DocumentoBase(
                 titulo=doc_data["titulo"],
                 contenido=doc_data["contenido"],
                 categoria=doc_data["categoria"],
                 metadatos=doc_data["metadatos"]
-            )
-            
-            success = vector_store.add_document(documento)
-            if success:
-                logger.info(f"✅ Documento '{documento.titulo}' añadido exitosamente")
+            ))
+        
+        # Ingestar todos los documentos en lote
+        resultado = vector_store.add_documents(documentos)
+        for doc_result in resultado["resultados"]:
+            if doc_result["success"] and doc_result["estado"] == "sin_cambios":
+                logger.info(f"⏭️  Documento '{doc_result['titulo']}' sin cambios, se omite")
+            elif doc_result["success"]:
+                logger.info(f"✅ Documento '{doc_result['titulo']}' {doc_result['estado']} ({doc_result['chunks']} chunks, {doc_result['reembebidos']} re-embebidos)")
             else:
-                logger.error(f"❌ Error añadiendo '{documento.titulo}'")
+                logger.error(f"❌ Error añadiendo '{doc_result['titulo']}': {doc_result.get('error')}")
+        
+        rendimiento = resultado["rendimiento"]
+        logger.info(f"⚡ {rendimiento['chunks']} chunks en {rendimiento['tiempo']}s ({rendimiento['chunks_por_segundo']} chunks/s)")
         
         # Obtener estadísticas finales
         stats = vector_store.get_collection_stats()
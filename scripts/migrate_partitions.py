@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Script para migrar la base vectorial desde la colección única de ChromaDB a las particiones
+por categoría o al índice NumPy (o de vuelta con --revertir). Copia por páginas los embeddings,
+textos y metadatos sin re-embeber, verifica los conteos por categoría y, si se indica, elimina
+el origen. Los IDs de los chunks no cambian, así que el índice léxico, los centroides, el manifiesto y las estadísticas siguen siendo válidos.
+
+Uso:
+    python scripts/migrate_partitions.py                      # colección única -> particiones
+    python scripts/migrate_partitions.py --eliminar-origen    # y borrar la colección única
+    python scripts/migrate_partitions.py --revertir           # particiones -> colección única
+    python scripts/migrate_partitions.py --destino numpy      # colección única -> índice NumPy
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict
+
+# Añadir el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models import CategoriaPQRS
+from app.services.vector_store import COLLECTION_NAME
+from app.services.vector_index import ChromaIndex
+from app.services.partitioned_collection import PartitionedCollection, partition_name
+from app.services.numpy_index import NumpyIndex
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METADATA = {"description": "Documentos de infraestructura para PQRS"}
+
+def count_by_category(coleccion, page_size: int) -> Dict[str, int]:
+    """Cuenta los chunks por categoría leyendo solo los metadatos"""
+    conteos = {categoria.value: 0 for categoria in CategoriaPQRS}
+    offset = 0
+    while True:
+        page = coleccion.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for metadata in page["metadatas"]:
+            categoria = metadata.get("categoria", CategoriaPQRS.OTROS.value)
+            conteos[categoria] = conteos.get(categoria, 0) + 1
+        offset += len(page["ids"])
+    return conteos
+
+def copy_collection(origen, destino, page_size: int) -> int:
+    """Copia todos los chunks del origen al destino por páginas (upsert, se puede repetir sin duplicar)"""
+    copiados = 0
+    total = origen.count()
+    inicio = time.perf_counter()
+    offset = 0
+    while True:
+        page = origen.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        destino.upsert(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"]
+        )
+        copiados += len(page["ids"])
+        offset += len(page["ids"])
+        logger.info(f"Copiados {copiados}/{total} chunks ({copiados / (time.perf_counter() - inicio):.0f} chunks/s)")
+    return copiados
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--destino", choices=["particiones", "numpy"], default="particiones", help="Disposición a la que migrar")
+    parser.add_argument("--revertir", action="store_true", help="Migrar del destino a la colección única")
+    parser.add_argument("--eliminar-origen", action="store_true", help="Eliminar el origen si la verificación es correcta")
+    parser.add_argument("--lote", type=int, default=1000, help="Chunks por página de copia")
+    args = parser.parse_args()
+
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+    client = chromadb.PersistentClient(
+        path=settings.chroma_db_path,
+        settings=ChromaSettings(anonymized_telemetry=False)
+    )
+
+    if args.destino == "numpy":
+        alternativa = NumpyIndex(
+            path=os.path.join(settings.chroma_db_path, "numpy_index"),
+            dtype=settings.numpy_index_dtype,
+            compact_ratio=settings.numpy_index_compact_ratio
+        )
+    else:
+        alternativa = PartitionedCollection(client, COLLECTION_NAME, metadata=METADATA)
+
+    if args.revertir:
+        origen, destino = alternativa, ChromaIndex(client, COLLECTION_NAME, metadata=METADATA)
+    else:
+        try:
+            client.get_collection(name=COLLECTION_NAME)
+        except Exception:
+            logger.error(f"No existe la colección única '{COLLECTION_NAME}' en {settings.chroma_db_path}")
+            sys.exit(1)
+        origen, destino = ChromaIndex(client, COLLECTION_NAME, metadata=METADATA), alternativa
+
+    total_origen = origen.count()
+    if total_origen == 0:
+        logger.info("El origen está vacío; no hay nada que migrar")
+        sys.exit(0)
+    if destino.count() > 0:
+        logger.warning(f"El destino ya tiene {destino.count()} chunks; los IDs repetidos se sobrescribirán")
+
+    descripcion = "particiones por categoría" if args.destino == "particiones" else "índice NumPy"
+    logger.info(f"Migrando {total_origen} chunks {f'de {descripcion} a la colección única' if args.revertir else f'a {descripcion}'}")
+    inicio = time.perf_counter()
+    copy_collection(origen, destino, args.lote)
+
+    # Verificación: mismos chunks por categoría en origen y destino
+    conteos_origen = count_by_category(origen, args.lote)
+    conteos_destino = count_by_category(destino, args.lote)
+    diferencias = {c: (conteos_origen.get(c, 0), conteos_destino.get(c, 0))
+                   for c in set(conteos_origen) | set(conteos_destino)
+                   if conteos_origen.get(c, 0) != conteos_destino.get(c, 0)}
+    for categoria, conteo in sorted(conteos_destino.items()):
+        if conteo:
+            logger.info(f"   - {categoria}: {conteo} chunks")
+
+    if diferencias or destino.count() < total_origen:
+        logger.error(f"La verificación falló (origen, destino por categoría): {diferencias}; el origen se conserva")
+        sys.exit(1)
+    logger.info(f"Migración verificada: {destino.count()} chunks en {time.perf_counter() - inicio:.2f}s")
+
+    if args.eliminar_origen:
+        if args.revertir and args.destino == "particiones":
+            for categoria in CategoriaPQRS:
+                client.delete_collection(name=partition_name(COLLECTION_NAME, categoria.value))
+        elif args.revertir:
+            alternativa.drop()
+        else:
+            client.delete_collection(name=COLLECTION_NAME)
+        logger.info("Origen eliminado")
+
+    if args.revertir:
+        logger.info("Configure VECTOR_BACKEND=chroma y VECTOR_PARTITIONED=False y reinicie el servicio")
+    elif args.destino == "numpy":
+        logger.info("Configure VECTOR_BACKEND=numpy y reinicie el servicio")
+    else:
+        logger.info("Configure VECTOR_BACKEND=chroma y VECTOR_PARTITIONED=True y reinicie el servicio")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Script para procesar en bloque un histórico de PQRS sin pasar por la API HTTP.
+Lee registros JSONL o CSV como flujo, los responde (o solo los reclasifica) con
+el mismo pipeline del servicio, escribe los resultados de forma incremental en
+JSONL o Parquet y guarda un checkpoint para reanudar una ejecución interrumpida.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Set, Tuple
+
+# Añadir el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models import PQRSRequest
+from app.services.llm_service import llm_service
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# El detalle por PQRS de los servicios no aporta en una ejecución masiva
+logging.getLogger("app.services").setLevel(logging.WARNING)
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Lee los registros de un archivo JSONL o CSV uno a uno"""
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for record in csv.DictReader(f):
+                yield {k: v for k, v in record.items() if v not in (None, "")}
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for linea in f:
+                if linea.strip():
+                    yield json.loads(linea)
+
+def count_records(path: str) -> int:
+    """Cuenta los registros de entrada para estimar el tiempo restante"""
+    return sum(1 for _ in read_records(path))
+
+class ResultWriter:
+    """Escribe resultados de forma incremental en JSONL o en partes Parquet"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        if self.parquet:
+            # Un archivo por lote dentro de un directorio: pandas y pyarrow lo leen como un solo dataset
+            os.makedirs(path, exist_ok=True)
+            self._parte = len(list(Path(path).glob("part-*.parquet")))
+
+    def completed_ids(self) -> Set[str]:
+        """IDs ya presentes en la salida (por si el checkpoint quedó atrás de la última escritura)"""
+        if not os.path.exists(self.path):
+            return set()
+        if self.parquet:
+            import pandas as pd
+            ids = set()
+            for parte in sorted(Path(self.path).glob("part-*.parquet")):
+                ids.update(pd.read_parquet(parte, columns=["id"])["id"].astype(str))
+            return ids
+        with open(self.path, "r", encoding="utf-8") as f:
+            return {str(json.loads(linea)["id"]) for linea in f if linea.strip()}
+
+    def write(self, filas: List[Dict[str, Any]]):
+        if not filas:
+            return
+        if self.parquet:
+            import pandas as pd
+            destino = Path(self.path) / f"part-{self._parte:05d}.parquet"
+            tmp = destino.with_suffix(".tmp")
+            pd.DataFrame(filas).to_parquet(tmp, index=False)
+            os.replace(tmp, destino)
+            self._parte += 1
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for fila in filas:
+                    f.write(json.dumps(fila, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+class Checkpoint:
+    """Registro append-only de los IDs completados"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Set[str]:
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, "r", encoding="utf-8") as f:
+            return {linea.strip() for linea in f if linea.strip()}
+
+    def append(self, ids: List[str]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(f"{record_id}\n" for record_id in ids)
+            f.flush()
+            os.fsync(f.fileno())
+
+def parse_record(record: Dict[str, Any], numero: int, id_campo: str) -> Tuple[str, PQRSRequest]:
+    """Extrae el ID y valida el registro como PQRSRequest"""
+    record_id = str(record.get(id_campo) or f"registro_{numero}")
+    datos = {k: v for k, v in record.items() if k in PQRSRequest.__fields__}
+    datos.setdefault("ciudadano_nombre", "")
+    datos.setdefault("ciudadano_email", "")
+    return record_id, PQRSRequest(**datos)
+
+async def process_batch(lote: List[Tuple[str, PQRSRequest]], solo_clasificar: bool) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Procesa un lote; devuelve (filas exitosas, errores)"""
+    procesado = datetime.now().isoformat()
+    solicitudes = [pqrs for _, pqrs in lote]
+    filas, errores = [], []
+
+    if solo_clasificar:
+        # Reclasificar: classify_pqrs_batch respeta la categoría informada, así que se descarta la del registro
+        categorias = await llm_service.classify_pqrs_batch([pqrs.copy(update={"categoria": None}) for pqrs in solicitudes])
+        for (record_id, _), categoria in zip(lote, categorias):
+            filas.append({"id": record_id, "categoria_detectada": categoria.value, "procesado": procesado})
+        return filas, errores
+
+    async for item in llm_service.generate_pqrs_batch(solicitudes):
+        record_id = lote[item.indice][0]
+        if not item.success:
+            errores.append({"id": record_id, "error": item.error, "procesado": procesado})
+            continue
+
+        respuesta = item.respuesta
+        if respuesta.pqrs_id.startswith("PQRS_ERROR") or respuesta.degradaciones:
+            # Respuesta de respaldo o de plantilla: no se da por procesada, para reintentarla en otra ejecución
+            motivo = ", ".join(respuesta.degradaciones) or "respuesta de error"
+            errores.append({"id": record_id, "error": f"Respuesta degradada ({motivo})", "procesado": procesado})
+            continue
+
+        filas.append({
+            "id": record_id,
+            "pqrs_id": respuesta.pqrs_id,
+            "categoria_detectada": respuesta.categoria_detectada.value,
+            "respuesta": respuesta.respuesta,
+            "confianza": respuesta.confianza,
+            "documentos_referencia": respuesta.documentos_referencia,
+            "recomendaciones": respuesta.recomendaciones,
+            "tiempo_respuesta": round(respuesta.tiempo_respuesta, 3),
+            "procesado": procesado
+        })
+    return filas, errores
+
+async def run(args) -> bool:
+    settings.batch_generation_concurrency = args.paralelismo
+    writer = ResultWriter(args.salida)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.salida.rstrip('/')}.checkpoint")
+    errores_path = f"{args.salida.rstrip('/')}.errores.jsonl"
+
+    completados = checkpoint.load() | writer.completed_ids()
+    total = None if args.sin_conteo else count_records(args.entrada)
+    if completados:
+        logger.info(f"Reanudando: {len(completados)} registros ya procesados se omitirán")
+
+    inicio = time.time()
+    procesados = exitosos = fallidos = 0
+    lote: List[Tuple[str, PQRSRequest]] = []
+
+    async def flush():
+        nonlocal procesados, exitosos, fallidos
+        filas, errores = await process_batch(lote, args.solo_clasificar)
+        # Primero la salida y después el checkpoint: si se interrumpe entre ambos, la salida manda
+        writer.write(filas)
+        checkpoint.append([fila["id"] for fila in filas])
+        if errores:
+            with open(errores_path, "a", encoding="utf-8") as f:
+                for error in errores:
+                    f.write(json.dumps(error, ensure_ascii=False) + "\n")
+        procesados += len(lote)
+        exitosos += len(filas)
+        fallidos += len(errores)
+        lote.clear()
+
+        elapsed = time.time() - inicio
+        velocidad = procesados / elapsed if elapsed > 0 else 0.0
+        progreso = f"{procesados}"
+        eta = ""
+        if total is not None:
+            restantes = max(0, total - len(completados) - procesados)
+            progreso += f"/{total - len(completados)}"
+            if velocidad > 0:
+                segundos = restantes / velocidad
+                eta = f", ETA {segundos / 60:.1f} min" if segundos >= 60 else f", ETA {segundos:.0f}s"
+        logger.info(f"Procesados {progreso} ({exitosos} ok, {fallidos} con error), {velocidad:.2f} PQRS/s{eta}")
+
+    for numero, record in enumerate(read_records(args.entrada)):
+        try:
+            record_id, pqrs = parse_record(record, numero, args.id_campo)
+        except Exception as e:
+            record_id = str(record.get(args.id_campo) or f"registro_{numero}")
+            if record_id not in completados:
+                with open(errores_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"id": record_id, "error": f"Registro inválido: {e}"}, ensure_ascii=False) + "\n")
+                fallidos += 1
+            continue
+
+        if record_id in completados:
+            continue
+        lote.append((record_id, pqrs))
+        if len(lote) >= args.lote:
+            await flush()
+
+    if lote:
+        await flush()
+
+    elapsed = time.time() - inicio
+    logger.info(
+        f"Finalizado: {exitosos} PQRS escritas en {args.salida}, {fallidos} con error "
+        f"en {elapsed:.1f}s ({procesados / elapsed if elapsed > 0 else 0.0:.2f} PQRS/s)"
+    )
+    if fallidos:
+        logger.info(f"Errores registrados en {errores_path}; vuelva a ejecutar para reintentarlos")
+    return fallidos == 0
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("entrada", help="Archivo de PQRS (.jsonl o .csv)")
+    parser.add_argument("salida", help="Archivo de resultados (.jsonl o .parquet)")
+    parser.add_argument("--paralelismo", type=int, default=settings.batch_generation_concurrency, help="Generaciones concurrentes")
+    parser.add_argument("--lote", type=int, default=32, help="Registros por lote (embeddings y recuperación compartidos)")
+    parser.add_argument("--id-campo", default="id", help="Campo con el identificador de cada registro")
+    parser.add_argument("--checkpoint", default=None, help="Archivo de checkpoint (por defecto <salida>.checkpoint)")
+    parser.add_argument("--solo-clasificar", action="store_true", help="Solo reclasificar, sin generar respuestas")
+    parser.add_argument("--sin-conteo", action="store_true", help="No contar la entrada previamente (sin ETA)")
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -65,7 +65,7 @@ async function handleFileUpload(event) {
     }
 
     try {
-        showAdminLoading('Subiendo documento...', 'Procesando archivo y generando embeddings');
+        showAdminLoading('Subiendo documento...', 'Enviando archivo al servidor');
 
         const response = await fetch('/api/v1/documents/upload', {
             method: 'POST',
@@ -75,21 +75,29 @@ async function handleFileUpload(event) {
         hideAdminLoading();
 
         if (response.ok) {
-            const result = await response.json();
+            const job = await response.json();
             
             NotificationSystem.show(
-                `Documento "${result.titulo}" subido exitosamente`,
-                'success'
+                `Documento "${job.titulo}" recibido; procesando en segundo plano`,
+                'info'
             );
 
-            // Show upload results
-            showUploadResults(result);
-            
             // Reset form
             event.target.reset();
             
-            // Refresh stats
-            refreshStats();
+            // Follow the ingestion job until it finishes
+            const result = await pollIngestionJob(job.job_id);
+            
+            if (result.estado === 'completado') {
+                NotificationSystem.show(
+                    `Documento "${result.titulo}" procesado: ${result.chunks_hechos} chunks`,
+                    'success'
+                );
+                showUploadResults(result);
+                refreshStats();
+            } else {
+                throw new Error(result.error || 'Error procesando el documento');
+            }
             
         } else {
             const error = await response.json();
@@ -106,6 +114,36 @@ async function handleFileUpload(event) {
     }
 }
 
+const JOB_STAGE_LABELS = {
+    en_cola: 'En cola',
+    extrayendo: 'Extrayendo texto',
+    embebiendo: 'Generando embeddings',
+    completado: 'Completado',
+    fallido: 'Fallido'
+};
+
+async function pollIngestionJob(jobId, intervalMs = 1000) {
+    const uploadResults = document.getElementById('uploadResults');
+    const uploadMessage = document.getElementById('uploadMessage');
+
+    while (true) {
+        const job = await Utils.apiRequest(`/documents/jobs/${jobId}`);
+
+        if (job.estado === 'completado' || job.estado === 'fallido') {
+            return job;
+        }
+
+        if (uploadResults && uploadMessage) {
+            const etapa = JOB_STAGE_LABELS[job.etapa] || job.etapa;
+            uploadMessage.textContent =
+                `"${job.titulo}": ${etapa} — ${job.chunks_hechos} chunks (${job.chunks_por_segundo} chunks/s)`;
+            uploadResults.style.display = 'block';
+        }
+
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 async function handleDocumentSearch(event) {
     event.preventDefault();
     
@@ -268,6 +306,32 @@ function updateStatsCard(cardId, value) {
     }
 }
 
+function formatKnowledgeBaseStats(estadisticas) {
+    if (!estadisticas) return '';
+
+    const categorias = Object.entries(estadisticas.por_categoria)
+        .filter(([, valores]) => valores.chunks > 0)
+        .map(([categoria, valores]) => `${categoria}: ${valores.documentos} doc. / ${valores.chunks} fragmentos`)
+        .join('<br>');
+    const ultimaIngesta = estadisticas.ultima_ingesta
+        ? new Date(estadisticas.ultima_ingesta).toLocaleString()
+        : 'Sin ingestas registradas';
+
+    return `
+        <li><strong>Documentos fuente:</strong> ${estadisticas.documentos}</li>
+        <li><strong>Texto indexado:</strong> ${formatBytes(estadisticas.bytes_texto)} (~${estadisticas.tokens_estimados} tokens)</li>
+        <li><strong>Memoria de embeddings:</strong> ${formatBytes(estadisticas.memoria_embeddings_bytes)}</li>
+        <li><strong>Última ingesta:</strong> ${ultimaIngesta}</li>
+        ${categorias ? `<li><strong>Por categoría:</strong><br>${categorias}</li>` : ''}
+    `;
+}
+
+function formatBytes(bytes) {
+    if (bytes < 1024) return `${bytes} B`;
+    if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+    return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+}
+
 function updateDetailedStats(data) {
     const detailedStats = document.getElementById('detailedStats');
     if (!detailedStats) return;
@@ -280,6 +344,7 @@ function updateDetailedStats(data) {
                 </h6>
                 <ul class="list-unstyled small">
                     <li><strong>Total documentos:</strong> ${data.vector_store.total_documentos}</li>
+                    ${formatKnowledgeBaseStats(data.vector_store.estadisticas)}
                     <li><strong>Estado:</strong> <span class="badge bg-${getStatusColor(data.vector_store.status)}">${data.vector_store.status}</span></li>
                 </ul>
             </div>
@@ -317,13 +382,13 @@ async function clearDatabase() {
     try {
         showAdminLoading('Limpiando base de datos...', 'Esta operación puede tomar unos momentos');
         
-        const response = await Utils.apiRequest('/documents/clear', {
+        const response = await Utils.apiRequest('/documents?confirmar=true', {
             method: 'DELETE'
         });
         
         hideAdminLoading();
         
-        NotificationSystem.show(response.mensaje, 'success');
+        NotificationSystem.show(`${response.mensaje} (${response.eliminados} chunks en ${response.tiempo}s)`, 'success');
         
         // Hide confirmation modal
         const confirmModal = bootstrap.Modal.getInstance(document.getElementById('confirmModal'));
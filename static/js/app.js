@@ -120,6 +120,58 @@ const Utils = {
         }
     },
 
+    // Server-Sent Events request wrapper (POST + fetch streaming)
+    streamRequest: async function(endpoint, body, handlers = {}) {
+        const url = `${API_BASE}${endpoint}`;
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify(body)
+        });
+
+        if (!response.ok || !response.body) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder('utf-8');
+        let buffer = '';
+
+        const dispatch = (block) => {
+            let event = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            });
+            if (dataLines.length > 0 && handlers[event]) {
+                handlers[event](JSON.parse(dataLines.join('\n')));
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                dispatch(buffer.slice(0, separator));
+                buffer = buffer.slice(separator + 2);
+            }
+        }
+
+        if (buffer.trim()) {
+            dispatch(buffer);
+        }
+    },
+
     // Form data to object
     formDataToObject: function(formData) {
         const object = {};
@@ -43,22 +43,43 @@ document.addEventListener('DOMContentLoaded', function() {
         chatInput.value = '';
         chatInput.style.height = 'auto';
 
+        // Show typing indicator until the first token arrives
+        const typingIndicator = addTypingIndicator();
+        let messageContent = null;
+        let respuesta = '';
+
+        const renderResponse = (text) => {
+            if (!messageContent) {
+                if (typingIndicator) {
+                    typingIndicator.remove();
+                }
+                messageContent = appendBotMessage('');
+            }
+            messageContent.innerHTML = formatBotMessage(text);
+            scrollToBottom();
+        };
+
         try {
-            // Send to API
-            const response = await Utils.apiRequest('/chat', {
-                method: 'POST',
-                body: JSON.stringify({
-                    mensaje: message,
-                    contexto: null
-                })
+            // Stream tokens from the API as they are generated
+            await Utils.streamRequest('/chat/stream', {
+                mensaje: message,
+                contexto: null
+            }, {
+                token: (data) => {
+                    respuesta += data.texto;
+                    renderResponse(respuesta);
+                },
+                final: (data) => renderResponse(data.respuesta),
+                error: (data) => renderResponse(data.respuesta)
             });
 
-            // Add bot response
-            addBotMessage(response.respuesta);
+            if (!messageContent) {
+                renderResponse(respuesta || 'Lo siento, no recibí respuesta. Por favor intenta nuevamente.');
+            }
 
         } catch (error) {
             console.error('Chat error:', error);
-            addBotMessage('Lo siento, hubo un error procesando tu consulta. Por favor intenta nuevamente.');
+            renderResponse('Lo siento, hubo un error procesando tu consulta. Por favor intenta nuevamente.');
         } finally {
             setInputState(true);
         }
@@ -98,27 +119,35 @@ document.addEventListener('DOMContentLoaded', function() {
                 typingIndicator.remove();
             }
 
-            const messageHtml = `
-                <div class="message bot-message">
-                    <div class="d-flex mb-3">
-                        <div class="me-2">
-                            <i class="fas fa-robot text-primary"></i>
+            appendBotMessage(message);
+        }, 1000 + Math.random() * 1000); // Random delay between 1-2 seconds
+    }
+
+    function appendBotMessage(message) {
+        const messageHtml = `
+            <div class="message bot-message">
+                <div class="d-flex mb-3">
+                    <div class="me-2">
+                        <i class="fas fa-robot text-primary"></i>
+                    </div>
+                    <div class="flex-grow-1">
+                        <div class="bot-message-content bg-light p-3 rounded" style="max-width: 80%;">
+                            ${formatBotMessage(message)}
                         </div>
-                        <div class="flex-grow-1">
-                            <div class="bg-light p-3 rounded" style="max-width: 80%;">
-                                ${formatBotMessage(message)}
-                            </div>
-                            <div class="small text-muted mt-1">
-                                ${new Date().toLocaleTimeString('es-CO', { hour: '2-digit', minute: '2-digit' })}
-                            </div>
+                        <div class="small text-muted mt-1">
+                            ${new Date().toLocaleTimeString('es-CO', { hour: '2-digit', minute: '2-digit' })}
                         </div>
                     </div>
                 </div>
-            `;
+            </div>
+        `;
 
-            chatMessages.insertAdjacentHTML('beforeend', messageHtml);
-            scrollToBottom();
-        }, 1000 + Math.random() * 1000); // Random delay between 1-2 seconds
+        chatMessages.insertAdjacentHTML('beforeend', messageHtml);
+        scrollToBottom();
+
+        // Return the content element so streamed tokens can update it
+        const contents = chatMessages.querySelectorAll('.bot-message-content');
+        return contents[contents.length - 1];
     }
 
     function addTypingIndicator() {
@@ -26,18 +26,48 @@ document.addEventListener('DOMContentLoaded', function() {
             Utils.showLoading('Procesando su PQRS...', 'Nuestro sistema de IA está analizando su solicitud');
             setSubmitButtonState(true);
 
-            // Submit PQRS
-            const response = await Utils.apiRequest('/pqrs/submit', {
-                method: 'POST',
-                body: JSON.stringify(pqrsData)
+            // Submit PQRS and render tokens as they arrive
+            let response = null;
+            let failed = false;
+            let respuestaParcial = '';
+
+            await Utils.streamRequest('/pqrs/submit/stream', pqrsData, {
+                metadata: (metadata) => {
+                    // Retrieval is done: hide loading and start the live response
+                    Utils.hideLoading();
+                    displayStreamingResponse(metadata);
+                },
+                token: (data) => {
+                    respuestaParcial += data.texto;
+                    updateStreamingResponse(respuestaParcial);
+                },
+                final: (data) => {
+                    response = data;
+                },
+                error: (data) => {
+                    response = data;
+                    failed = true;
+                }
             });
 
             // Hide loading
             Utils.hideLoading();
+
+            if (!response) {
+                throw new Error('Respuesta incompleta del servidor');
+            }
             
             // Show response
             displayPQRSResponse(response);
             
+            if (failed) {
+                NotificationSystem.show(
+                    'No fue posible generar la respuesta automática. Por favor, intente nuevamente.',
+                    'warning'
+                );
+                return;
+            }
+
             // Show success notification
             NotificationSystem.show(
                 `PQRS enviada exitosamente. ID: ${response.pqrs_id}`,
@@ -236,6 +266,48 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 300);
     }
 
+    function displayStreamingResponse(metadata) {
+        const confidenceColor = Utils.getConfidenceColor(metadata.confianza);
+        const categoryName = Utils.formatCategoryName(metadata.categoria_detectada);
+
+        responseContent.innerHTML = `
+            <div class="pqrs-response">
+                <div class="row mb-3">
+                    <div class="col-md-6">
+                        <h6 class="text-primary mb-1">
+                            <i class="fas fa-tag me-2"></i>Categoría Detectada
+                        </h6>
+                        <span class="category-badge">${categoryName}</span>
+                    </div>
+                    <div class="col-md-6 text-md-end">
+                        <h6 class="text-primary mb-1">
+                            <i class="fas fa-chart-line me-2"></i>Confianza
+                        </h6>
+                        <small class="text-${confidenceColor} fw-bold">
+                            ${Utils.formatConfidence(metadata.confianza)}
+                        </small>
+                    </div>
+                </div>
+
+                <div class="mb-4">
+                    <h6 class="text-primary mb-3">
+                        <i class="fas fa-spinner fa-spin me-2"></i>Generando respuesta...
+                    </h6>
+                    <div id="streamingResponseText" class="bg-white p-4 rounded border"></div>
+                </div>
+            </div>
+        `;
+        responseSection.style.display = 'block';
+        responseSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
+    }
+
+    function updateStreamingResponse(text) {
+        const streamingText = document.getElementById('streamingResponseText');
+        if (streamingText) {
+            streamingText.innerHTML = formatResponseText(Utils.sanitizeHtml(text));
+        }
+    }
+
     function formatResponseText(text) {
         // Convert line breaks to HTML
         return text
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "scripts"))
+
+# Los datos de las pruebas van a un directorio temporal, nunca a ./data
+_datos = tempfile.mkdtemp(prefix="rag_tests_")
+os.environ.setdefault("CHROMA_DB_PATH", os.path.join(_datos, "vectordb"))
+os.environ.setdefault("INGESTION_JOBS_DIR", os.path.join(_datos, "ingestion_jobs"))
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.main import app
+from app.services import llm_service as modulo
+
+DOCUMENTO = {
+    "documento": "Los huecos en la vía se reparan en un plazo de 15 días hábiles.",
+    "metadata": {"titulo": "Manual de mantenimiento vial", "categoria": "vias_pavimentos"},
+    "similitud": 0.8
+}
+
+class FakeLLM:
+    """Sustituye a ResilientLLMClient: lanza un error inesperado para los prompts indicados"""
+
+    def __init__(self, fallar_si: str):
+        self.fallar_si = fallar_si
+
+    async def complete(self, endpoint, prompt, max_tokens, temperature, hedge=False):
+        if self.fallar_si in prompt:
+            raise RuntimeError("respuesta malformada del proveedor")
+        return "Respuesta generada."
+
+def _solicitud(titulo: str) -> dict:
+    return {
+        "tipo": "queja",
+        "categoria": "vias_pavimentos",
+        "titulo": titulo,
+        "descripcion": "Hay un daño frente al parque del barrio",
+        "ciudadano_nombre": "Ciudadano de Prueba",
+        "ciudadano_email": "prueba@medellin.gov.co"
+    }
+
+LOTE = {"solicitudes": [_solicitud("Hueco en la vía"), _solicitud("Daño en el semáforo"), _solicitud("Andén roto")]}
+
+@pytest.fixture(autouse=True)
+def servicio(monkeypatch):
+    monkeypatch.setattr(settings, "response_cache_enabled", False)
+    monkeypatch.setattr(modulo.vector_store, "encode_queries", lambda queries: [[0.1, 0.2] for _ in queries])
+    monkeypatch.setattr(
+        modulo.vector_store, "search_similar_batch",
+        lambda queries, embeddings, n_results, categorias, hibrido: [[DOCUMENTO] for _ in queries]
+    )
+    monkeypatch.setattr(modulo.llm_service, "llm", FakeLLM(fallar_si="semáforo"))
+
+def _post(url: str, cuerpo: dict) -> httpx.Response:
+    async def enviar():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(url, json=cuerpo)
+    return asyncio.run(enviar())
+
+def test_error_de_una_pqrs_no_tumba_el_lote():
+    respuesta = _post("/api/v1/pqrs/submit/batch", LOTE)
+    assert respuesta.status_code == 200
+
+    cuerpo = respuesta.json()
+    assert (cuerpo["total"], cuerpo["exitosos"], cuerpo["fallidos"]) == (3, 2, 1)
+    assert [item["indice"] for item in cuerpo["resultados"]] == [0, 1, 2]
+
+    fallido = cuerpo["resultados"][1]
+    assert not fallido["success"]
+    assert fallido["respuesta"] is None
+    assert fallido["error"] == "Error generando respuesta"
+    for item in (cuerpo["resultados"][0], cuerpo["resultados"][2]):
+        assert item["success"]
+        assert item["respuesta"]["respuesta"]
+
+def test_stream_emite_el_error_en_su_linea():
+    respuesta = _post("/api/v1/pqrs/submit/batch?stream=true", LOTE)
+    assert respuesta.headers["content-type"].startswith("application/x-ndjson")
+
+    items = {item["indice"]: item for item in map(json.loads, respuesta.text.splitlines())}
+    assert sorted(items) == [0, 1, 2]
+    assert items[1] == {"indice": 1, "success": False, "respuesta": None, "error": "Error generando respuesta"}
+    assert items[0]["success"] and items[2]["success"]
+
+def test_fallo_de_embeddings_marca_todas_las_pqrs(monkeypatch):
+    def fallar(queries):
+        raise RuntimeError("modelo no disponible")
+
+    monkeypatch.setattr(modulo.vector_store, "encode_queries", fallar)
+    cuerpo = _post("/api/v1/pqrs/submit/batch", LOTE).json()
+
+    assert (cuerpo["exitosos"], cuerpo["fallidos"]) == (0, 3)
+    assert {item["error"] for item in cuerpo["resultados"]} == {"Error generando embeddings del lote"}
+
+def test_lote_por_encima_del_maximo(monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_items", 2)
+    assert _post("/api/v1/pqrs/submit/batch", LOTE).status_code == 400
+
+def test_lote_vacio_o_con_una_pqrs_invalida():
+    assert _post("/api/v1/pqrs/submit/batch", {"solicitudes": []}).status_code == 422
+
+    invalida = {k: v for k, v in _solicitud("Sin descripción").items() if k != "descripcion"}
+    respuesta = _post("/api/v1/pqrs/submit/batch", {"solicitudes": [_solicitud("Hueco"), invalida]})
+    assert respuesta.status_code == 422
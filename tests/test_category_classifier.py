@@ -0,0 +1,75 @@
+from app.services.category_classifier import CentroidClassifier
+
+VIAS = [[1.0, 0.1, 0.0], [0.9, 0.0, 0.1]]
+ALUMBRADO = [[0.0, 1.0, 0.1], [0.1, 0.9, 0.0]]
+
+def crear_clasificador(path=None) -> CentroidClassifier:
+    clasificador = CentroidClassifier(path)
+    clasificador.rebuild([(VIAS + ALUMBRADO, ["vias_pavimentos"] * 2 + ["alumbrado_publico"] * 2)])
+    return clasificador
+
+def test_empieza_desactualizado_hasta_reconstruir():
+    clasificador = CentroidClassifier()
+    assert clasificador.stale
+    clasificador.rebuild([])
+    assert not clasificador.stale
+
+def test_clasifica_por_centroide_mas_cercano():
+    categoria, margen, similitud = crear_clasificador().classify([0.95, 0.05, 0.0])
+    assert categoria == "vias_pavimentos"
+    assert margen > 0.5
+    assert similitud > 0.9
+
+def test_una_sola_categoria_no_clasifica():
+    clasificador = CentroidClassifier()
+    clasificador.rebuild([(VIAS, ["vias_pavimentos"] * 2)])
+    assert clasificador.classify([1.0, 0.0, 0.0])[0] is None
+
+def test_update_incremental_mantiene_vigente():
+    clasificador = crear_clasificador()
+    clasificador.update([[0.0, 0.0, 1.0]], ["drenajes_alcantarillado"])
+    assert not clasificador.stale
+    assert clasificador.classify([0.0, 0.1, 1.0])[0] == "drenajes_alcantarillado"
+
+def test_invalidate_exige_reconstruir_e_ignora_updates():
+    clasificador = crear_clasificador()
+    clasificador.invalidate()
+    clasificador.update([[0.0, 0.0, 1.0]], ["drenajes_alcantarillado"])
+    assert clasificador.stale
+    assert "drenajes_alcantarillado" not in clasificador.get_stats()["chunks_por_categoria"]
+
+def test_rebuild_con_cambios_concurrentes_queda_desactualizado():
+    clasificador = CentroidClassifier()
+
+    def lotes():
+        yield VIAS, ["vias_pavimentos"] * 2
+        # La colección cambia mientras se recorre
+        clasificador.invalidate()
+        yield ALUMBRADO, ["alumbrado_publico"] * 2
+
+    clasificador.rebuild(lotes())
+    assert clasificador.stale
+    assert clasificador.classify([1.0, 0.0, 0.0])[0] == "vias_pavimentos"
+
+def test_guarda_y_carga_con_la_misma_revision(tmp_path):
+    ruta = str(tmp_path / "centroides.npz")
+    crear_clasificador(ruta).save(4, revision=3)
+
+    cargado = CentroidClassifier(ruta)
+    assert cargado.load(4, revision=3)
+    assert not cargado.stale
+    assert cargado.classify([0.0, 1.0, 0.0])[0] == "alumbrado_publico"
+
+def test_load_rechaza_otra_revision_o_conteo(tmp_path):
+    ruta = str(tmp_path / "centroides.npz")
+    crear_clasificador(ruta).save(4, revision=3)
+    # Un chunk reemplazado por otro de otra categoría no cambia el conteo, pero sí la revisión
+    assert not CentroidClassifier(ruta).load(4, revision=4)
+    assert not CentroidClassifier(ruta).load(5, revision=3)
+
+def test_no_guarda_sumas_desactualizadas(tmp_path):
+    ruta = tmp_path / "centroides.npz"
+    clasificador = crear_clasificador(str(ruta))
+    clasificador.invalidate()
+    clasificador.save(4, revision=3)
+    assert not ruta.exists()
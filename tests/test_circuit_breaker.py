@@ -0,0 +1,87 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.llm_client import CircuitBreaker, ResilientLLMClient
+
+def test_abre_tras_fallos_consecutivos():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.estado == CircuitBreaker.CERRADO
+    breaker.record_failure()
+    assert breaker.estado == CircuitBreaker.ABIERTO
+    assert not breaker.allow()
+
+def test_un_exito_reinicia_los_fallos():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.estado == CircuitBreaker.CERRADO
+
+def test_semiabierto_deja_pasar_una_sola_sonda():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert breaker.estado == CircuitBreaker.SEMIABIERTO
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.estado == CircuitBreaker.CERRADO
+    assert breaker.allow()
+
+def test_sonda_fallida_vuelve_a_abrir():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.estado == CircuitBreaker.ABIERTO
+    assert not breaker.allow()
+
+def test_release_libera_la_sonda_sin_cerrar():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.estado == CircuitBreaker.SEMIABIERTO
+    assert breaker.allow()
+
+def test_sonda_cancelada_no_deja_el_circuito_bloqueado():
+    """Una sonda cancelada libera el semiabierto y la siguiente llamada sana cierra el circuito"""
+    llm = ResilientLLMClient("modelo-de-prueba")
+    llm.breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    llm.breaker.record_failure()
+    time.sleep(0.02)
+
+    class Completions:
+        def __init__(self):
+            self.lento = True
+
+        async def create(self, **kwargs):
+            if self.lento:
+                await asyncio.sleep(10)
+            message = SimpleNamespace(content="ok")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    completions = Completions()
+    llm.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    async def escenario():
+        sonda = asyncio.create_task(llm.complete("chat", "hola", max_tokens=5, temperature=0.0))
+        await asyncio.sleep(0.05)
+        sonda.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await sonda
+
+        completions.lento = False
+        return await llm.complete("chat", "hola", max_tokens=5, temperature=0.0)
+
+    assert asyncio.run(escenario()) == "ok"
+    assert llm.breaker.estado == CircuitBreaker.CERRADO
@@ -0,0 +1,7 @@
+import asyncio
+
+from check_concurrency import run_check
+
+def test_event_loop_libre_con_generaciones_lentas():
+    """/health responde rápido mientras varias PQRS esperan a un LLM lento"""
+    assert asyncio.run(run_check(generaciones=8, delay=1.0, probes=5))
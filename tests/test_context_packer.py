@@ -0,0 +1,94 @@
+import pytest
+
+from app.services.context_packer import ContextPacker, MIN_TOKENS_RECORTE
+
+class CodificacionPorCaracter:
+    """Codificación falsa de un token por carácter: los límites se pueden calcular a mano"""
+
+    def encode(self, texto):
+        return [ord(c) for c in texto]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+@pytest.fixture
+def packer():
+    packer = ContextPacker("modelo-de-prueba")
+    packer._encoding = CodificacionPorCaracter()
+    packer._encoding_loaded = True
+    return packer
+
+def _doc(titulo: str, contenido: str) -> dict:
+    return {"documento": contenido, "metadata": {"titulo": titulo}}
+
+FRASES = "Se reparó el hueco de la calle. Se pintó la señal de pare. Se cambió la luminaria del parque."
+
+def test_todo_cabe(packer):
+    documentos = [_doc("A", "Primero."), _doc("B", "Segundo.")]
+    contexto, usados, stats = packer.pack(documentos, 1000)
+
+    assert contexto == "Documento: A\nContenido: Primero.\n\nDocumento: B\nContenido: Segundo."
+    assert usados == documentos
+    assert not stats["recortado"]
+    assert stats["tokens_contexto"] == len(contexto)
+
+def test_presupuesto_exacto_incluye_el_documento_entero(packer):
+    documento = _doc("A", FRASES)
+    exacto = len(packer.format_block(documento, FRASES))
+
+    contexto, _, stats = packer.pack([documento], exacto)
+    assert contexto.endswith(FRASES)
+    assert not stats["recortado"]
+
+    contexto, usados, stats = packer.pack([documento], exacto - 1)
+    assert usados == [documento]
+    assert stats["recortado"]
+    # Se recorta en el último final de frase que cabe
+    assert contexto.endswith("Se pintó la señal de pare.")
+
+def test_el_separador_cuenta_en_el_presupuesto(packer):
+    primero, segundo = _doc("A", "x" * 50), _doc("B", "y" * 50)
+    justo = len(packer.format_block(primero, "x" * 50)) + 2 + len(packer.format_block(segundo, "y" * 50))
+
+    assert len(packer.pack([primero, segundo], justo)[1]) == 2
+    _, usados, stats = packer.pack([primero, segundo], justo - 1)
+    assert usados == [primero, segundo]
+    assert stats["recortado"]
+
+def test_espacio_insuficiente_descarta_y_no_sigue(packer):
+    grande, pequeno = _doc("A", "x" * 500), _doc("B", "corto")
+    encabezado = len(packer.format_block(grande, ""))
+
+    # Queda un token menos que el mínimo para el contenido: no se incluye nada, ni el documento corto
+    contexto, usados, stats = packer.pack([grande, pequeno], encabezado + MIN_TOKENS_RECORTE - 1)
+    assert (contexto, usados) == ("", [])
+    assert stats["tokens_contexto"] == 0
+    assert stats["documentos_recuperados"] == 2
+
+    contexto, usados, _ = packer.pack([grande, pequeno], encabezado + MIN_TOKENS_RECORTE)
+    assert usados == [grande]
+    assert contexto.endswith("x" * MIN_TOKENS_RECORTE)
+
+def test_recorte_sin_final_de_frase_cercano_corta_en_el_tope(packer):
+    texto = "Frase corta. " + "sin puntuación " * 20
+    recortado = packer.truncate(texto, 60)
+    # El único punto queda en la primera mitad: se corta en el tope de tokens
+    assert recortado == texto[:60].strip()
+
+@pytest.mark.parametrize("presupuesto", [0, 30, 45, 70, 100, 150, 220, 400])
+def test_nunca_excede_el_presupuesto(packer, presupuesto):
+    documentos = [_doc(f"Doc {i}", FRASES * (i + 1)) for i in range(3)]
+    contexto, usados, stats = packer.pack(documentos, presupuesto)
+
+    assert stats["tokens_contexto"] <= presupuesto
+    assert usados == documentos[:len(usados)]
+
+def test_sin_tiktoken_estima_por_caracteres():
+    packer = ContextPacker("modelo-de-prueba")
+    packer._encoding_loaded = True
+
+    assert packer.count("a" * 9) == 3
+    assert packer.truncate("palabra " * 20, 5) == ("palabra " * 20)[:20].strip()
+    contexto, _, stats = packer.pack([_doc("A", "x" * 400)], 60)
+    assert stats["recortado"]
+    assert packer.count(contexto) <= 60
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.config import settings
+from app.models import PQRSRequest, CategoriaPQRS
+from app.services import llm_service as modulo
+from app.services.deadline import Deadline, deadline_scope, item_scope, current_deadline, remaining, has_time, degrade
+from app.services.llm_client import LLMUnavailableError
+from app.services.llm_service import LLMService, CHAT_SIN_TIEMPO
+
+DOCUMENTO = {
+    "documento": "Los huecos en la vía se reparan en un plazo de 15 días hábiles.",
+    "metadata": {"titulo": "Manual de mantenimiento vial", "categoria": "vias_pavimentos"},
+    "similitud": 0.8
+}
+
+class FakeLLM:
+    """Sustituye a ResilientLLMClient: registra las llamadas y falla para los prompts indicados"""
+
+    def __init__(self, fallar_si: str = None, pausa_stream: float = 0.0):
+        self.llamadas = []
+        self.fallar_si = fallar_si
+        self.pausa_stream = pausa_stream
+
+    async def complete(self, endpoint, prompt, max_tokens, temperature, hedge=False):
+        self.llamadas.append((endpoint, max_tokens))
+        if self.fallar_si and self.fallar_si in prompt:
+            raise LLMUnavailableError("proveedor degradado")
+        return "Respuesta generada."
+
+    async def stream(self, endpoint, prompt, max_tokens, temperature):
+        self.llamadas.append((endpoint, max_tokens))
+        for token in ["Primera ", "parte ", "de ", "la ", "respuesta."]:
+            yield token
+            await asyncio.sleep(self.pausa_stream)
+
+def _pqrs(titulo: str = "Hueco en la vía principal") -> PQRSRequest:
+    return PQRSRequest(
+        tipo="queja",
+        categoria="vias_pavimentos",
+        titulo=titulo,
+        descripcion="Hay un hueco grande frente al parque del barrio",
+        ciudadano_nombre="Ciudadano de Prueba",
+        ciudadano_email="prueba@medellin.gov.co"
+    )
+
+@pytest.fixture
+def servicio(monkeypatch):
+    monkeypatch.setattr(settings, "response_cache_enabled", False)
+
+    async def buscar(query, n_results=5, categoria=None, hibrido=None):
+        return [DOCUMENTO][:n_results]
+
+    monkeypatch.setattr(modulo.vector_store, "search_similar_async", buscar)
+    monkeypatch.setattr(modulo.vector_store, "encode_queries", lambda queries: [[0.1, 0.2] for _ in queries])
+    monkeypatch.setattr(
+        modulo.vector_store, "search_similar_batch",
+        lambda queries, embeddings, n_results, categorias, hibrido: [[DOCUMENTO][:n_results] for _ in queries]
+    )
+    servicio = LLMService()
+    servicio.llm = FakeLLM()
+    return servicio
+
+def test_deadline_sin_plazo_siempre_tiene_tiempo():
+    deadline = Deadline()
+    assert deadline.remaining() is None
+    assert deadline.has_time(1e9)
+
+def test_deadline_vencido_devuelve_cero():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    assert deadline.remaining() == 0.0
+    assert not deadline.has_time(0.001)
+
+def test_degrade_no_repite_nombres():
+    deadline = Deadline(10)
+    deadline.degrade("recuperacion_reducida")
+    deadline.degrade("recuperacion_reducida")
+    assert deadline.degradaciones == ["recuperacion_reducida"]
+
+def test_funciones_fuera_de_una_solicitud():
+    assert current_deadline() is None
+    assert remaining() is None
+    assert has_time(1e9)
+    degrade("respuesta_plantilla")
+
+def test_deadline_scope_se_restablece_al_salir():
+    with deadline_scope(10) as externo:
+        with deadline_scope(1) as interno:
+            assert current_deadline() is interno
+            assert remaining() <= 1
+        assert current_deadline() is externo
+    assert current_deadline() is None
+
+def test_deadline_scope_se_hereda_en_tareas():
+    async def escenario():
+        async def tarea():
+            degrade("clasificacion_local")
+
+        with deadline_scope(10) as deadline:
+            await asyncio.gather(tarea(), tarea())
+        return deadline.degradaciones
+
+    assert asyncio.run(escenario()) == ["clasificacion_local"]
+
+def test_item_scope_comparte_el_plazo_pero_no_las_degradaciones():
+    with deadline_scope(10) as lote:
+        lote.degrade("recuperacion_reducida")
+        with item_scope() as item:
+            assert item.expira == lote.expira
+            degrade("respuesta_plantilla")
+        assert item.degradaciones == ["recuperacion_reducida", "respuesta_plantilla"]
+        assert lote.degradaciones == ["recuperacion_reducida"]
+
+def test_max_tokens_sin_plazo_no_cambia(servicio):
+    assert servicio._generation_max_tokens(800) == 800
+
+def test_max_tokens_se_reduce_con_plazo_corto(servicio):
+    with deadline_scope(10) as deadline:
+        max_tokens = servicio._generation_max_tokens(800)
+    assert settings.deadline_min_generation_tokens <= max_tokens < 800
+    assert deadline.degradaciones == ["max_tokens_reducido"]
+
+def test_max_tokens_none_si_no_alcanza_el_minimo(servicio):
+    with deadline_scope(2):
+        assert servicio._generation_max_tokens(800) is None
+
+def test_pqrs_sin_tiempo_responde_con_plantilla(servicio):
+    async def escenario():
+        with deadline_scope(2):
+            return await servicio.generate_pqrs_response(_pqrs())
+
+    respuesta = asyncio.run(escenario())
+    assert servicio.llm.llamadas == []
+    assert "Ciudadano de Prueba" in respuesta.respuesta
+    assert not respuesta.pqrs_id.startswith("PQRS_ERROR")
+    assert "recuperacion_reducida" in respuesta.degradaciones
+    assert "respuesta_plantilla" in respuesta.degradaciones
+
+def test_stream_pqrs_sin_tiempo_usa_la_plantilla(servicio):
+    async def escenario():
+        with deadline_scope(2):
+            return [evento async for evento in servicio.stream_pqrs_response(_pqrs())]
+
+    eventos = asyncio.run(escenario())
+    assert [evento["event"] for evento in eventos] == ["metadata", "token", "final"]
+    assert servicio.llm.llamadas == []
+    assert "respuesta_plantilla" in eventos[-1]["data"]["degradaciones"]
+
+def test_stream_pqrs_usa_max_tokens_reducido(servicio):
+    async def escenario():
+        with deadline_scope(10):
+            return [evento async for evento in servicio.stream_pqrs_response(_pqrs())]
+
+    eventos = asyncio.run(escenario())
+    assert eventos[-1]["event"] == "final"
+    assert servicio.llm.llamadas[0][1] < 800
+    assert "max_tokens_reducido" in eventos[-1]["data"]["degradaciones"]
+
+def test_stream_se_corta_al_agotarse_el_plazo(servicio):
+    servicio.llm = FakeLLM(pausa_stream=5)
+
+    async def escenario():
+        with deadline_scope(settings.deadline_safety_seconds + 0.2) as deadline:
+            inicio = time.perf_counter()
+            tokens = [token async for token in servicio._stream_completion("prompt", max_tokens=100, temperature=0.7)]
+            return tokens, time.perf_counter() - inicio, deadline.degradaciones
+
+    tokens, duracion, degradaciones = asyncio.run(escenario())
+    assert tokens == ["Primera "]
+    assert duracion < 1
+    assert degradaciones == ["respuesta_truncada"]
+
+def test_chat_sin_tiempo_no_llama_al_llm(servicio):
+    async def escenario():
+        with deadline_scope(2) as deadline:
+            respuesta = await servicio.chat_response("¿Cuánto tardan en reparar un hueco?")
+        return respuesta, deadline.degradaciones
+
+    respuesta, degradaciones = asyncio.run(escenario())
+    assert respuesta == CHAT_SIN_TIEMPO
+    assert servicio.llm.llamadas == []
+    assert degradaciones == ["recuperacion_reducida", "respuesta_omitida"]
+
+def test_chat_stream_sin_tiempo_no_llama_al_llm(servicio):
+    async def escenario():
+        with deadline_scope(2):
+            return [evento async for evento in servicio.stream_chat_response("¿Cuánto tardan en reparar un hueco?")]
+
+    eventos = asyncio.run(escenario())
+    assert eventos[-1] == {"event": "final", "data": {"respuesta": CHAT_SIN_TIEMPO}}
+    assert servicio.llm.llamadas == []
+
+def test_lote_registra_las_degradaciones_de_cada_pqrs(servicio):
+    servicio.llm = FakeLLM(fallar_si="semáforo")
+
+    async def escenario():
+        with deadline_scope(None):
+            return [item async for item in servicio.generate_pqrs_batch([_pqrs(), _pqrs("Daño en el semáforo")])]
+
+    items = {item.indice: item for item in asyncio.run(escenario())}
+    assert items[0].respuesta.degradaciones == []
+    assert items[1].respuesta.degradaciones == ["respuesta_plantilla"]
+
+def test_lote_sin_tiempo_reduce_la_busqueda_y_no_genera(servicio):
+    async def escenario():
+        with deadline_scope(2) as deadline:
+            items = [item async for item in servicio.generate_pqrs_batch([_pqrs(), _pqrs("Daño en el semáforo")])]
+        return items, deadline.degradaciones
+
+    items, degradaciones = asyncio.run(escenario())
+    assert all(item.success for item in items)
+    assert servicio.llm.llamadas == []
+    assert degradaciones == ["recuperacion_reducida"]
+    for item in items:
+        assert item.respuesta.degradaciones == ["recuperacion_reducida", "respuesta_plantilla"]
+        assert len(item.respuesta.documentos_referencia) <= settings.deadline_reduced_results
+
+def test_lote_sin_tiempo_omite_la_clasificacion_con_llm(servicio, monkeypatch):
+    monkeypatch.setattr(settings, "local_classifier_enabled", False)
+    pqrs = _pqrs().copy(update={"categoria": None})
+
+    async def escenario():
+        with deadline_scope(2) as deadline:
+            categorias = await servicio.classify_pqrs_batch([pqrs])
+        return categorias, deadline.degradaciones
+
+    categorias, degradaciones = asyncio.run(escenario())
+    assert categorias == [CategoriaPQRS.OTROS]
+    assert servicio.llm.llamadas == []
+    assert degradaciones == ["clasificacion_omitida"]
+
+def test_chat_stream_aplica_el_plazo_del_encabezado(servicio, monkeypatch):
+    import httpx
+    from app.main import app
+
+    llm = FakeLLM()
+    monkeypatch.setattr(modulo.llm_service, "llm", llm)
+
+    async def escenario():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            return await client.post(
+                "/api/v1/chat/stream",
+                json={"mensaje": "¿Cuánto tardan en reparar un hueco?"},
+                headers={"X-Request-Timeout": "2"}
+            )
+
+    respuesta = asyncio.run(escenario())
+    final = respuesta.text.strip().split("\n\n")[-1]
+    assert final.startswith("event: final")
+    assert json.loads(final.split("data: ", 1)[1])["degradaciones"] == ["recuperacion_reducida", "respuesta_omitida"]
+    assert llm.llamadas == []
@@ -0,0 +1,62 @@
+import pytest
+
+from app.config import settings
+from app.services import document_extraction
+from app.services.document_extraction import iter_text_segments, shutdown_process_pool
+
+@pytest.fixture
+def bloques_pequenos(monkeypatch):
+    monkeypatch.setattr(document_extraction, "TEXT_BLOCK_SIZE", 16)
+    monkeypatch.setattr(document_extraction, "TEXT_MAX_SEGMENT", 64)
+
+def _segmentos(tmp_path, texto: str):
+    ruta = tmp_path / "documento.txt"
+    ruta.write_text(texto, encoding="utf-8")
+    return list(iter_text_segments(str(ruta), ".txt"))
+
+def test_texto_corta_en_parrafos(tmp_path, bloques_pequenos):
+    parrafos = [f"Párrafo número {i} del documento." for i in range(6)]
+    segmentos = _segmentos(tmp_path, "\n\n".join(parrafos))
+    assert "\n\n".join(segmentos) == "\n\n".join(parrafos)
+    assert all(len(s) < 64 + 16 for s in segmentos)
+
+def test_texto_sin_parrafos_corta_en_lineas(tmp_path, bloques_pequenos):
+    lineas = [f"Línea {i:02d} de un acta sin párrafos" for i in range(20)]
+    segmentos = _segmentos(tmp_path, "\n".join(lineas))
+    assert len(segmentos) > 1
+    # Ninguna línea queda partida
+    assert [linea for s in segmentos for linea in s.split("\n")] == lineas
+
+def test_texto_sin_lineas_corta_en_espacios(tmp_path, bloques_pequenos):
+    palabras = [f"palabra{i:03d}" for i in range(60)]
+    segmentos = _segmentos(tmp_path, " ".join(palabras))
+    assert len(segmentos) > 1
+    assert [p for s in segmentos for p in s.split(" ")] == palabras
+
+def test_texto_sin_espacios_corta_en_el_tope(tmp_path, bloques_pequenos):
+    texto = "x" * 300
+    segmentos = _segmentos(tmp_path, texto)
+    assert "".join(segmentos) == texto
+    assert all(len(s) <= 64 for s in segmentos)
+
+def test_docx_conserva_el_orden_de_parrafos_y_tablas(tmp_path, monkeypatch):
+    docx = pytest.importorskip("docx")
+    monkeypatch.setattr(settings, "extraction_docx_elements_per_task", 3)
+    monkeypatch.setattr(settings, "extraction_block_chars", 1)
+
+    documento = docx.Document()
+    esperado = []
+    for i in range(4):
+        documento.add_paragraph(f"Párrafo {i}")
+        esperado.append(f"Párrafo {i}")
+        tabla = documento.add_table(rows=1, cols=2)
+        tabla.cell(0, 0).text = f"Tramo {i}"
+        tabla.cell(0, 1).text = f"{i * 100} m"
+        esperado.append(f"Tramo {i} | {i * 100} m")
+    ruta = tmp_path / "documento.docx"
+    documento.save(str(ruta))
+
+    try:
+        assert list(iter_text_segments(str(ruta), ".docx")) == esperado
+    finally:
+        shutdown_process_pool()
@@ -0,0 +1,55 @@
+import os
+import threading
+
+from app.services.document_manifest import DocumentManifest
+
+def test_guarda_y_carga(tmp_path):
+    ruta = str(tmp_path / "manifest.json")
+    manifiesto = DocumentManifest(ruta)
+    manifiesto.load(collection_empty=True)
+    manifiesto.set("Doc A", {"hashes": ["a1", "a2"]})
+    manifiesto.save()
+
+    cargado = DocumentManifest(ruta)
+    cargado.load(collection_empty=False)
+    assert cargado.complete
+    assert cargado.get("Doc A") == {"hashes": ["a1", "a2"]}
+
+def test_sin_archivo_solo_es_completo_con_la_coleccion_vacia(tmp_path):
+    manifiesto = DocumentManifest(str(tmp_path / "manifest.json"))
+    manifiesto.load(collection_empty=True)
+    assert manifiesto.complete
+    manifiesto.load(collection_empty=False)
+    assert not manifiesto.complete
+
+def test_clear_incompleto_se_persiste(tmp_path):
+    ruta = str(tmp_path / "manifest.json")
+    manifiesto = DocumentManifest(ruta)
+    manifiesto.set("Doc A", {})
+    manifiesto.clear(complete=False)
+    manifiesto.save()
+
+    cargado = DocumentManifest(ruta)
+    cargado.load(collection_empty=True)
+    assert not cargado.complete
+    assert cargado.titles() == []
+
+def test_guardados_concurrentes_no_dejan_temporales(tmp_path):
+    ruta = str(tmp_path / "manifest.json")
+    manifiesto = DocumentManifest(ruta)
+
+    def escribir(hilo: int):
+        for i in range(50):
+            manifiesto.set(f"Doc {hilo}-{i}", {"hashes": [str(i)]})
+            manifiesto.save()
+
+    hilos = [threading.Thread(target=escribir, args=(h,)) for h in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    cargado = DocumentManifest(ruta)
+    cargado.load(collection_empty=False)
+    assert len(cargado.titles()) == 200
+    assert os.listdir(tmp_path) == ["manifest.json"]
@@ -0,0 +1,61 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services.vector_store import vector_store
+
+@pytest.fixture
+def llamadas(monkeypatch):
+    registro = []
+
+    def delete_documents(titulo=None, categoria=None, where=None):
+        registro.append(("delete", titulo, categoria, where))
+        return {"success": True, "eliminados": 0 if titulo == "inexistente" else 3, "tiempo": 0.01}
+
+    def clear_collection():
+        registro.append(("clear",))
+        return {"success": True, "eliminados": 10, "tiempo": 0.01}
+
+    monkeypatch.setattr(vector_store, "delete_documents", delete_documents)
+    monkeypatch.setattr(vector_store, "clear_collection", clear_collection)
+    return registro
+
+def _delete(url: str) -> httpx.Response:
+    async def enviar():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.delete(url)
+    return asyncio.run(enviar())
+
+def test_limpiar_sin_filtro_exige_confirmar(llamadas):
+    assert _delete("/api/v1/documents").status_code == 400
+    assert llamadas == []
+
+    respuesta = _delete("/api/v1/documents?confirmar=true")
+    assert respuesta.status_code == 200
+    assert respuesta.json()["eliminados"] == 10
+    assert llamadas == [("clear",)]
+
+def test_limpiar_con_filtro(llamadas):
+    assert _delete("/api/v1/documents?categoria=vias_pavimentos").status_code == 200
+    assert _delete('/api/v1/documents?filtro={"fuente": "manual"}').status_code == 200
+    assert llamadas[0][2].value == "vias_pavimentos"
+    assert llamadas[1][3] == {"fuente": "manual"}
+
+def test_limpiar_con_filtro_invalido(llamadas):
+    assert _delete("/api/v1/documents?filtro=[1, 2]").status_code == 400
+    assert llamadas == []
+
+def test_titulo_clear_no_limpia_la_base(llamadas):
+    assert _delete("/api/v1/documents/clear").status_code == 200
+    assert llamadas == [("delete", "clear", None, None)]
+
+@pytest.mark.parametrize("ruta", ["Normas/2024 vías", "Normas%2F2024%20v%C3%ADas"])
+def test_titulo_con_barra(llamadas, ruta):
+    respuesta = _delete(f"/api/v1/documents/{ruta}")
+    assert respuesta.status_code == 200
+    assert llamadas == [("delete", "Normas/2024 vías", None, None)]
+
+def test_titulo_inexistente(llamadas):
+    assert _delete("/api/v1/documents/inexistente").status_code == 404
@@ -0,0 +1,97 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+def _encoder(lotes: list, espera: float = 0.0):
+    """encode_fn falso: registra cada lote y devuelve un vector derivado de cada texto"""
+    def encode(textos):
+        lotes.append(list(textos))
+        if espera:
+            time.sleep(espera)
+        return [[float(len(texto)), float(i)] for i, texto in enumerate(textos)]
+    return encode
+
+def test_agrupa_llamadas_concurrentes_en_un_lote():
+    lotes = []
+    batcher = EmbeddingBatcher(_encoder(lotes), max_batch_size=8, max_wait_ms=200)
+    textos = ["a", "bb", "ccc", "dddd"]
+
+    async def enviar():
+        return await asyncio.gather(*(batcher.encode_async(texto) for texto in textos))
+
+    vectores = asyncio.run(enviar())
+
+    assert lotes == [textos]
+    # Cada llamada recibe el vector de su propio texto
+    assert [vector[0] for vector in vectores] == [1.0, 2.0, 3.0, 4.0]
+    stats = batcher.get_stats()
+    assert (stats["lotes"], stats["textos"], stats["tamano_max_lote"]) == (1, 4, 4)
+    assert stats["histograma_tamano_lote"]["<=4"] == 1
+
+def test_respeta_el_tamano_maximo_de_lote():
+    lotes = []
+    batcher = EmbeddingBatcher(_encoder(lotes), max_batch_size=2, max_wait_ms=200)
+
+    async def enviar():
+        return await asyncio.gather(*(batcher.encode_async(str(i)) for i in range(5)))
+
+    assert len(asyncio.run(enviar())) == 5
+    assert [len(lote) for lote in lotes] == [2, 2, 1]
+    assert batcher.get_stats()["tamano_max_lote"] == 2
+
+def test_encode_sincrono_desde_varios_hilos():
+    lotes = []
+    batcher = EmbeddingBatcher(_encoder(lotes), max_batch_size=16, max_wait_ms=100)
+    textos = ["x" * n for n in range(1, 7)]
+
+    with ThreadPoolExecutor(max_workers=len(textos)) as pool:
+        vectores = list(pool.map(batcher.encode, textos))
+
+    assert [vector[0] for vector in vectores] == [float(n) for n in range(1, 7)]
+    assert sum(len(lote) for lote in lotes) == len(textos)
+    assert len(lotes) < len(textos)
+
+def test_error_del_encode_llega_a_todo_el_lote():
+    llamadas = []
+
+    def encode(textos):
+        llamadas.append(list(textos))
+        if len(llamadas) == 1:
+            raise RuntimeError("modelo no disponible")
+        return [[1.0] for _ in textos]
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=8, max_wait_ms=200)
+
+    async def enviar():
+        return await asyncio.gather(*(batcher.encode_async(t) for t in ("a", "b")), return_exceptions=True)
+
+    resultados = asyncio.run(enviar())
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+
+    # El hilo del batcher sigue atendiendo después del error
+    assert batcher.encode("c") == [1.0]
+
+def test_llamada_cancelada_no_afecta_al_resto():
+    lotes = []
+    batcher = EmbeddingBatcher(_encoder(lotes, espera=0.1), max_batch_size=8, max_wait_ms=50)
+
+    async def enviar():
+        impaciente = asyncio.ensure_future(asyncio.wait_for(batcher.encode_async("corta"), timeout=0.01))
+        paciente = asyncio.ensure_future(batcher.encode_async("larga"))
+        with pytest.raises(asyncio.TimeoutError):
+            await impaciente
+        return await paciente
+
+    assert asyncio.run(enviar())[0] == 5.0
+    assert sorted(lotes[0]) == ["corta", "larga"]
+
+def test_un_solo_hilo_de_trabajo():
+    batcher = EmbeddingBatcher(_encoder([]), max_wait_ms=0)
+    batcher.encode("a")
+    hilo = batcher._thread
+    batcher.encode("b")
+    assert batcher._thread is hilo
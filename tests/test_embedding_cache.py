@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from app.services import embedding_cache
+from app.services.embedding_cache import EmbeddingCache
+
+VECTOR = [0.5, 0.25, -1.0]
+
+@pytest.fixture
+def ruta(tmp_path):
+    return str(tmp_path / "embeddings.sqlite3")
+
+def _filas(cache: EmbeddingCache) -> int:
+    return cache._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+def test_hit_en_memoria_con_texto_normalizado():
+    cache = EmbeddingCache("modelo")
+    cache.set("Hueco en  la VÍA", VECTOR)
+    assert cache.get("  hueco en la vía ") == VECTOR
+    assert cache.get("otro texto") is None
+
+    stats = cache.get_stats()
+    assert (stats["hits_memoria"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    assert not stats["persistente"]
+
+def test_clave_depende_del_modelo():
+    assert EmbeddingCache("modelo-a").key("texto") != EmbeddingCache("modelo-b").key("texto")
+
+def test_lru_desaloja_la_menos_usada():
+    cache = EmbeddingCache("modelo", max_size=2)
+    cache.set("a", [1.0])
+    cache.set("b", [2.0])
+    assert cache.get("a") == [1.0]
+    cache.set("c", [3.0])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1.0]
+    assert cache.get_stats()["desalojados"] == 1
+
+def test_entrada_vencida_en_memoria():
+    cache = EmbeddingCache("modelo", ttl=60)
+    cache.set("texto", VECTOR)
+    clave = cache.key("texto")
+    cache._memory[clave] = (VECTOR, time.time() - 120)
+
+    assert cache.get("texto") is None
+    assert cache.get_stats()["expirados"] == 1
+    assert cache.get_stats()["entradas_memoria"] == 0
+
+def test_escrituras_pendientes_hasta_el_volcado(ruta):
+    cache = EmbeddingCache("modelo", db_path=ruta)
+    cache.set("texto", VECTOR)
+    assert cache.get_stats()["pendientes_disco"] == 1
+    assert _filas(cache) == 0
+
+    cache.flush()
+    assert cache.get_stats()["pendientes_disco"] == 0
+    assert _filas(cache) == 1
+
+def test_volcado_en_segundo_plano_al_llenar_el_lote(ruta, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "FLUSH_BATCH_SIZE", 2)
+    cache = EmbeddingCache("modelo", db_path=ruta)
+    cache.set("a", [1.0])
+    cache.set("b", [2.0])
+
+    # Esperar a que termine el hilo de volcado
+    with cache._flush_lock:
+        pass
+    assert _filas(cache) == 2
+
+def test_hit_en_disco_sube_a_memoria(ruta):
+    cache = EmbeddingCache("modelo", db_path=ruta)
+    cache.set("texto", VECTOR)
+    cache.flush()
+
+    # Otra instancia (p. ej. tras un reinicio) solo tiene el nivel de disco
+    reiniciada = EmbeddingCache("modelo", db_path=ruta)
+    assert reiniciada.get("texto") == pytest.approx(VECTOR)
+    assert reiniciada.get("texto") == pytest.approx(VECTOR)
+
+    stats = reiniciada.get_stats()
+    assert (stats["hits_disco"], stats["hits_memoria"]) == (1, 1)
+
+def test_fila_vencida_en_disco_no_cuenta_como_hit(ruta):
+    cache = EmbeddingCache("modelo", ttl=60, db_path=ruta)
+    cache.set("texto", VECTOR)
+    cache.flush()
+    cache._db.execute("UPDATE embeddings SET creado = ?", (time.time() - 120,))
+    cache._db.commit()
+
+    reiniciada = EmbeddingCache("modelo", ttl=60, db_path=ruta)
+    assert reiniciada.get("texto") is None
+    assert reiniciada.get_stats()["expirados"] == 1
+
+def test_poda_filas_vencidas_y_sobrantes(ruta, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "PRUNE_INTERVAL", 0.0)
+    cache = EmbeddingCache("modelo", ttl=60, db_path=ruta, max_disk_rows=2)
+    ahora = time.time()
+    cache._pending = [
+        (cache.key("vencida"), b"\x00" * 4, ahora - 120),
+        (cache.key("antigua"), b"\x00" * 4, ahora - 30),
+        (cache.key("media"), b"\x00" * 4, ahora - 20),
+        (cache.key("nueva"), b"\x00" * 4, ahora - 10)
+    ]
+    cache.flush()
+
+    claves = {fila[0] for fila in cache._db.execute("SELECT clave FROM embeddings")}
+    assert claves == {cache.key("media"), cache.key("nueva")}
+    assert cache.get_stats()["podados_disco"] == 2
+
+def test_clear_vacia_ambos_niveles(ruta):
+    cache = EmbeddingCache("modelo", db_path=ruta)
+    cache.set("a", [1.0])
+    cache.flush()
+    cache.set("b", [2.0])
+
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert _filas(cache) == 0
+    assert cache.get_stats()["pendientes_disco"] == 0
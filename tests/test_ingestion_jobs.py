@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.models import CategoriaPQRS
+from app.services import ingestion_jobs as modulo
+from app.services.ingestion_jobs import IngestionJobQueue, IngestionJobStore
+
+@pytest.fixture
+def hilos_del_store(monkeypatch):
+    """Registra el hilo desde el que se llama cada operación del store"""
+    registro = []
+    for nombre in ("insert", "update", "get", "list"):
+        original = getattr(IngestionJobStore, nombre)
+
+        def envolver(original=original, nombre=nombre):
+            def llamada(self, *args, **kwargs):
+                registro.append((nombre, threading.current_thread()))
+                return original(self, *args, **kwargs)
+            return llamada
+
+        monkeypatch.setattr(IngestionJobStore, nombre, envolver())
+    return registro
+
+def _ingesta_falsa(monkeypatch, success=True):
+    def add_document_stream(documento, segmentos, content_hash, progress=None):
+        if progress:
+            progress("indexando", 2)
+        return {
+            "resultados": [{"success": success, "chunks": 2, "error": None if success else "sin texto"}],
+            "rendimiento": {"chunks_por_segundo": 10.0}
+        }
+
+    monkeypatch.setattr(modulo.vector_store, "add_document_stream", add_document_stream)
+    monkeypatch.setattr(modulo, "iter_text_segments", lambda path, extension: iter(["texto"]))
+
+def _procesar(tmp_path) -> tuple:
+    cola = IngestionJobQueue(str(tmp_path / "jobs"), workers=1)
+    archivo = tmp_path / "subida.txt"
+    archivo.write_text("texto", encoding="utf-8")
+
+    async def ejecutar():
+        await cola.start()
+        hilo_loop = threading.current_thread()
+        enviado = await cola.submit(
+            path=str(archivo),
+            size=5,
+            content_hash="abc",
+            titulo="Manual de vías",
+            categoria=CategoriaPQRS.VIAS_PAVIMENTOS,
+            filename="subida.txt",
+            content_type="text/plain",
+            extension=".txt"
+        )
+        await cola._queue.join()
+        final = await cola.get(enviado["job_id"])
+        listado = await cola.list()
+        await cola.stop()
+        return hilo_loop, enviado, final, listado
+
+    return asyncio.run(ejecutar()), archivo
+
+def test_store_no_se_usa_desde_el_event_loop(tmp_path, monkeypatch, hilos_del_store):
+    _ingesta_falsa(monkeypatch)
+    (hilo_loop, enviado, final, listado), archivo = _procesar(tmp_path)
+
+    assert enviado["estado"] == "en_cola"
+    assert final["estado"] == "completado"
+    assert final["chunks_hechos"] == 2
+    assert [job["job_id"] for job in listado] == [enviado["job_id"]]
+    assert not archivo.exists()
+
+    nombres = {nombre for nombre, _ in hilos_del_store}
+    assert {"insert", "update", "get", "list"} <= nombres
+    assert all(hilo is not hilo_loop for _, hilo in hilos_del_store)
+
+def test_fallo_de_ingesta_queda_registrado(tmp_path, monkeypatch, hilos_del_store):
+    _ingesta_falsa(monkeypatch, success=False)
+    (hilo_loop, _, final, _), _ = _procesar(tmp_path)
+
+    assert final["estado"] == "fallido"
+    assert final["error"] == "sin texto"
+    assert all(hilo is not hilo_loop for _, hilo in hilos_del_store)
@@ -0,0 +1,69 @@
+from app.services.kb_stats import KnowledgeBaseStats
+
+def registrar(stats: KnowledgeBaseStats):
+    stats.add(
+        ["a1", "a2", "b1"],
+        ["uno", "dos", "tres"],
+        [
+            {"titulo": "Doc A", "categoria": "vias_pavimentos"},
+            {"titulo": "Doc A", "categoria": "vias_pavimentos"},
+            {"titulo": "Doc B", "categoria": "alumbrado_publico"}
+        ],
+        dimension=384
+    )
+
+def test_agregados_incrementales():
+    stats = KnowledgeBaseStats()
+    registrar(stats)
+    resumen = stats.get_stats()
+    assert resumen["chunks"] == 3
+    assert resumen["documentos"] == 2
+    assert resumen["bytes_texto"] == len("unodostres")
+    assert resumen["memoria_embeddings_bytes"] == 3 * 384 * 4
+    assert resumen["por_categoria"]["vias_pavimentos"] == {"chunks": 2, "documentos": 1, "bytes": 6}
+
+def test_mover_y_borrar_descuentan():
+    stats = KnowledgeBaseStats()
+    registrar(stats)
+    stats.set_categories(["a2"], ["alumbrado_publico"])
+    resumen = stats.get_stats()
+    assert resumen["por_categoria"]["vias_pavimentos"]["chunks"] == 1
+    assert resumen["por_categoria"]["alumbrado_publico"] == {"chunks": 2, "documentos": 2, "bytes": 7}
+
+    stats.remove(["a1", "a2"])
+    resumen = stats.get_stats()
+    assert resumen["documentos"] == 1
+    assert resumen["por_categoria"]["vias_pavimentos"] == {"chunks": 0, "documentos": 0, "bytes": 0}
+    assert [d["titulo"] for d in stats.get_documents()] == ["Doc B"]
+
+def test_reemplazar_un_chunk_no_lo_cuenta_dos_veces():
+    stats = KnowledgeBaseStats()
+    registrar(stats)
+    stats.add(["a1"], ["unooo"], [{"titulo": "Doc A", "categoria": "vias_pavimentos"}])
+    resumen = stats.get_stats()
+    assert resumen["chunks"] == 3
+    assert resumen["bytes_texto"] == len("unooodostres")
+
+def test_guarda_y_carga(tmp_path):
+    ruta = str(tmp_path / "kb_stats.json")
+    stats = KnowledgeBaseStats(ruta, save_interval=3600)
+    registrar(stats)
+    stats.save(revision=7)
+
+    cargado = KnowledgeBaseStats(ruta)
+    assert not cargado.load(total_chunks=4, revision=7)
+    # Mismo número de chunks pero la colección cambió después del guardado
+    assert not cargado.load(total_chunks=3, revision=8)
+    assert cargado.load(total_chunks=3, revision=7)
+    assert cargado.get_stats()["por_categoria"] == stats.get_stats()["por_categoria"]
+
+def test_maybe_save_respeta_el_intervalo(tmp_path):
+    ruta = tmp_path / "kb_stats.json"
+    stats = KnowledgeBaseStats(str(ruta), save_interval=3600)
+    registrar(stats)
+    stats.maybe_save(revision=1)
+    assert ruta.exists()
+
+    stats.remove(["b1"])
+    stats.maybe_save(revision=2)
+    assert KnowledgeBaseStats(str(ruta)).load(total_chunks=3, revision=1)
@@ -0,0 +1,70 @@
+import os
+
+from app.services.lexical_index import LexicalIndex, tokenize
+
+def crear_indice(path=None) -> LexicalIndex:
+    indice = LexicalIndex(path, save_interval=3600)
+    indice.add(
+        ["c1", "c2", "c3"],
+        [
+            "Reparación del alumbrado público en el barrio",
+            "Huecos en la vía principal y pavimento deteriorado",
+            "Semáforo dañado en la intersección de la vía"
+        ],
+        ["alumbrado_publico", "vias_pavimentos", "senalizacion"]
+    )
+    return indice
+
+def test_tokenize_quita_tildes_y_palabras_vacias():
+    assert tokenize("Reparación de la Vía") == tokenize("reparacion via")
+
+def test_busqueda_ordena_por_bm25():
+    indice = crear_indice()
+    resultados = indice.search("alumbrado público", n_results=3)
+    assert resultados[0][0] == "c1"
+    assert {chunk_id for chunk_id, _ in indice.search("vía", n_results=3)} == {"c2", "c3"}
+
+def test_filtro_por_categoria():
+    indice = crear_indice()
+    assert [chunk_id for chunk_id, _ in indice.search("vía", categoria="senalizacion")] == ["c3"]
+
+def test_reemplazar_y_borrar():
+    indice = crear_indice()
+    indice.add(["c1"], ["Poda de árboles en el parque"], ["espacios_publicos"])
+    assert indice.search("alumbrado") == []
+    assert indice.search("parque")[0][0] == "c1"
+
+    indice.remove(["c1", "inexistente"])
+    assert len(indice) == 2
+    assert indice.search("parque") == []
+
+def test_maybe_save_respeta_el_intervalo(tmp_path):
+    ruta = str(tmp_path / "lexico.npz")
+    indice = crear_indice(ruta)
+    indice.maybe_save(1)
+    assert os.path.exists(ruta)
+
+    indice.add(["c4"], ["Alcantarilla tapada"], ["drenajes_alcantarillado"])
+    indice.maybe_save(2)
+    # Dentro del intervalo no se vuelve a escribir: el archivo sigue con tres chunks
+    assert not LexicalIndex(ruta).load(4, 2)
+
+    indice.save(2)
+    cargado = LexicalIndex(ruta)
+    assert cargado.load(4, 2)
+    assert cargado.search("alcantarilla")[0][0] == "c4"
+    assert cargado.search("vía", categoria="senalizacion")[0][0] == "c3"
+
+def test_load_rechaza_otra_revision_con_el_mismo_conteo(tmp_path):
+    ruta = str(tmp_path / "lexico.npz")
+    crear_indice(ruta).save(5)
+    # El texto de un chunk cambió (revisión 6) sin cambiar el número de chunks
+    assert not LexicalIndex(ruta).load(3, 6)
+    assert LexicalIndex(ruta).load(3, 5)
+
+def test_save_sin_cambios_actualiza_la_revision(tmp_path):
+    ruta = str(tmp_path / "lexico.npz")
+    indice = crear_indice(ruta)
+    indice.save(1)
+    indice.save(2)
+    assert LexicalIndex(ruta).load(3, 2)
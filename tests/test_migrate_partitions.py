@@ -0,0 +1,141 @@
+import os
+import sys
+
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+from chromadb.config import Settings as ChromaSettings
+
+import migrate_partitions as migracion
+from app.config import settings
+from app.services.vector_store import COLLECTION_NAME
+from app.services.vector_index import ChromaIndex
+from app.services.numpy_index import NumpyIndex
+from app.services.partitioned_collection import PartitionedCollection, partition_name
+
+# 3 chunks de vías, 2 de alumbrado y 1 con una categoría desconocida
+CHUNKS = [
+    ("vias_0", "vias_pavimentos", [1.0, 0.0, 0.0]),
+    ("vias_1", "vias_pavimentos", [0.9, 0.1, 0.0]),
+    ("vias_2", "vias_pavimentos", [0.8, 0.2, 0.0]),
+    ("alumbrado_0", "alumbrado_publico", [0.0, 1.0, 0.0]),
+    ("alumbrado_1", "alumbrado_publico", [0.1, 0.9, 0.0]),
+    ("otro_0", "categoria_retirada", [0.0, 0.0, 1.0])
+]
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "chroma_db_path", str(tmp_path))
+    return chromadb.PersistentClient(path=str(tmp_path), settings=ChromaSettings(anonymized_telemetry=False))
+
+def _llenar(indice, chunks=CHUNKS):
+    indice.upsert(
+        ids=[chunk_id for chunk_id, _, _ in chunks],
+        embeddings=[vector for _, _, vector in chunks],
+        documents=[f"Texto de {chunk_id}" for chunk_id, _, _ in chunks],
+        metadatas=[{"categoria": categoria, "titulo": chunk_id.split("_")[0]} for chunk_id, categoria, _ in chunks]
+    )
+
+def _unica(cliente) -> ChromaIndex:
+    return ChromaIndex(cliente, COLLECTION_NAME, metadata=migracion.METADATA)
+
+def _migrar(monkeypatch, *argumentos):
+    monkeypatch.setattr(sys, "argv", ["migrate_partitions.py", "--lote", "2", *argumentos])
+    migracion.main()
+
+def _existe(cliente, nombre: str) -> bool:
+    return nombre in {coleccion.name for coleccion in cliente.list_collections()}
+
+def test_copia_por_paginas_entre_particiones(cliente):
+    origen = PartitionedCollection(cliente, COLLECTION_NAME)
+    _llenar(origen)
+    destino = ChromaIndex(cliente, "destino")
+
+    # Páginas de 2 con particiones de 3, 2 y 1 chunks: la paginación cruza las particiones
+    assert migracion.copy_collection(origen, destino, page_size=2) == len(CHUNKS)
+    assert sorted(destino.get(include=[])["ids"]) == sorted(chunk_id for chunk_id, _, _ in CHUNKS)
+
+def test_conteo_por_categoria(cliente):
+    coleccion = _unica(cliente)
+    _llenar(coleccion)
+    conteos = migracion.count_by_category(coleccion, page_size=4)
+    assert conteos["vias_pavimentos"] == 3
+    assert conteos["alumbrado_publico"] == 2
+    assert conteos["categoria_retirada"] == 1
+    assert conteos["senalizacion"] == 0
+
+def test_migra_a_particiones_y_elimina_el_origen(cliente, monkeypatch):
+    _llenar(_unica(cliente))
+    _migrar(monkeypatch, "--eliminar-origen")
+
+    particionada = PartitionedCollection(cliente, COLLECTION_NAME)
+    conteos = particionada.partition_counts()
+    assert (conteos["vias_pavimentos"], conteos["alumbrado_publico"], conteos["otros"]) == (3, 2, 1)
+    assert not _existe(cliente, COLLECTION_NAME)
+
+    # Los embeddings se copian tal cual, sin re-embeber
+    copia = particionada.get(ids=["alumbrado_1"], include=["embeddings", "documents"])
+    assert copia["embeddings"][0] == pytest.approx([0.1, 0.9, 0.0])
+    assert copia["documents"] == ["Texto de alumbrado_1"]
+
+class _SoloVias:
+    """Envuelve un índice y oculta en get() los chunks que no son de vías"""
+
+    def __init__(self, indice):
+        self.indice = indice
+
+    def count(self):
+        return self.indice.count()
+
+    def get(self, **kwargs):
+        if kwargs.get("offset"):
+            return {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+        return self.indice.get(where={"categoria": "vias_pavimentos"}, include=kwargs["include"])
+
+def test_verificacion_fallida_conserva_el_origen(cliente, monkeypatch):
+    _llenar(_unica(cliente))
+    copiar = migracion.copy_collection
+
+    def copia_incompleta(origen, destino, page_size):
+        # Simula una página perdida: solo se copian los chunks de vías
+        return copiar(_SoloVias(origen), destino, page_size)
+
+    monkeypatch.setattr(migracion, "copy_collection", copia_incompleta)
+    with pytest.raises(SystemExit) as salida:
+        _migrar(monkeypatch, "--eliminar-origen")
+
+    assert salida.value.code == 1
+    assert _existe(cliente, COLLECTION_NAME)
+    assert _unica(cliente).count() == len(CHUNKS)
+
+def test_revertir_devuelve_los_chunks_a_la_coleccion_unica(cliente, monkeypatch):
+    _llenar(PartitionedCollection(cliente, COLLECTION_NAME))
+    _migrar(monkeypatch, "--revertir", "--eliminar-origen")
+
+    unica = _unica(cliente)
+    assert unica.count() == len(CHUNKS)
+    assert unica.get(ids=["otro_0"])["metadatas"][0]["categoria"] == "categoria_retirada"
+    assert not _existe(cliente, partition_name(COLLECTION_NAME, "vias_pavimentos"))
+
+def test_migra_al_indice_numpy(cliente, monkeypatch, tmp_path):
+    _llenar(_unica(cliente))
+    _migrar(monkeypatch, "--destino", "numpy")
+
+    indice = NumpyIndex(path=os.path.join(str(tmp_path), "numpy_index"))
+    assert indice.count() == len(CHUNKS)
+    resultado = indice.query(query_embeddings=[[0.0, 1.0, 0.0]], n_results=1)
+    assert resultado["ids"] == [["alumbrado_0"]]
+    # Sin --eliminar-origen la colección única se conserva
+    assert _unica(cliente).count() == len(CHUNKS)
+
+def test_sin_coleccion_unica_termina_con_error(cliente, monkeypatch):
+    with pytest.raises(SystemExit) as salida:
+        _migrar(monkeypatch)
+    assert salida.value.code == 1
+
+def test_origen_vacio_no_migra(cliente, monkeypatch):
+    _unica(cliente)
+    with pytest.raises(SystemExit) as salida:
+        _migrar(monkeypatch)
+    assert salida.value.code == 0
+    assert PartitionedCollection(cliente, COLLECTION_NAME).count() == 0
@@ -0,0 +1,121 @@
+import threading
+
+import numpy as np
+
+from app.services.numpy_index import NumpyIndex
+
+def vectores(n: int, dim: int = 8) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    datos = rng.normal(size=(n, dim)).astype(np.float32)
+    return datos / np.linalg.norm(datos, axis=1, keepdims=True)
+
+def metadatos(n: int):
+    categorias = ["vias_pavimentos", "alumbrado_publico"]
+    return [{"titulo": f"Doc {i % 5}", "categoria": categorias[i % 2]} for i in range(n)]
+
+def test_consulta_exacta(tmp_path):
+    indice = NumpyIndex(str(tmp_path))
+    datos = vectores(20)
+    indice.upsert([f"c{i}" for i in range(20)], datos, [f"texto {i}" for i in range(20)], metadatos(20))
+
+    resultado = indice.query(datos[[3, 7]], n_results=3)
+    assert [ids[0] for ids in resultado["ids"]] == ["c3", "c7"]
+    assert resultado["distances"][0][0] < 1e-5
+    assert resultado["documents"][0][0] == "texto 3"
+
+def test_filtro_por_categoria(tmp_path):
+    indice = NumpyIndex(str(tmp_path))
+    datos = vectores(20)
+    indice.upsert([f"c{i}" for i in range(20)], datos, metadatas=metadatos(20))
+
+    resultado = indice.query(datos[[2]], n_results=20, where={"categoria": "alumbrado_publico"})
+    assert len(resultado["ids"][0]) == 10
+    assert all(int(chunk_id[1:]) % 2 == 1 for chunk_id in resultado["ids"][0])
+
+def test_reemplazar_borrar_y_compactar(tmp_path):
+    indice = NumpyIndex(str(tmp_path), compact_ratio=0.3)
+    datos = vectores(20)
+    indice.upsert([f"c{i}" for i in range(20)], datos, metadatas=metadatos(20))
+    indice.upsert(["c0"], datos[[5]], metadatas=metadatos(1))
+    indice.delete(ids=[f"c{i}" for i in range(10, 20)])
+    assert indice.count() == 10
+
+    resultado = indice.get(ids=["c0"], include=["embeddings"])
+    assert np.allclose(resultado["embeddings"][0], datos[5])
+
+    # Al reabrir se recupera el mismo contenido desde SQLite y el archivo de vectores
+    reabierto = NumpyIndex(str(tmp_path))
+    assert reabierto.count() == 10
+    assert reabierto.query(datos[[4]], n_results=1)["ids"][0] == ["c4"]
+
+def test_get_mantiene_alineadas_las_listas_con_escrituras_concurrentes(tmp_path):
+    indice = NumpyIndex(str(tmp_path))
+    n = 50
+    # Cada vector codifica su chunk en la primera componente
+    base = np.zeros((n, 8), dtype=np.float32)
+    base[:, 0] = np.arange(n)
+    indice.upsert([f"c{i}" for i in range(n)], base, metadatas=metadatos(n))
+
+    detener = threading.Event()
+
+    def reescribir():
+        i = 0
+        while not detener.is_set():
+            chunk = i % n
+            indice.delete(ids=[f"c{chunk}"])
+            indice.upsert([f"c{chunk}"], base[[chunk]], metadatas=metadatos(1))
+            i += 1
+
+    escritor = threading.Thread(target=reescribir)
+    escritor.start()
+    try:
+        for _ in range(100):
+            resultado = indice.get(include=["embeddings", "metadatas"])
+            assert len(resultado["ids"]) == len(resultado["embeddings"]) == len(resultado["metadatas"])
+            for chunk_id, embedding in zip(resultado["ids"], resultado["embeddings"]):
+                assert int(embedding[0]) == int(chunk_id[1:])
+    finally:
+        detener.set()
+        escritor.join()
+
+def _indice_con_fuente(tmp_path, n: int = 30) -> NumpyIndex:
+    indice = NumpyIndex(str(tmp_path))
+    metas = metadatos(n)
+    for i, meta in enumerate(metas):
+        meta["fuente"] = "manual" if i % 3 == 0 else "norma"
+    indice.upsert([f"c{i}" for i in range(n)], vectores(n), [f"texto {i}" for i in range(n)], metas)
+    return indice
+
+def test_get_con_filtro_y_limite_pagina_las_coincidencias(tmp_path):
+    indice = _indice_con_fuente(tmp_path)
+    todos = indice.get(where={"fuente": "manual"})["ids"]
+    assert todos == [f"c{i}" for i in range(0, 30, 3)]
+
+    pagina = indice.get(where={"$and": [{"categoria": "vias_pavimentos"}, {"fuente": "manual"}]}, limit=2, offset=1)
+    assert pagina["ids"] == ["c6", "c12"]
+    assert pagina["documents"] == ["texto 6", "texto 12"]
+    assert pagina["metadatas"][0]["fuente"] == "manual"
+
+    assert indice.get(ids=["c9", "c3", "c4"], limit=1, include=[])["ids"] == ["c3"]
+
+def test_get_con_limite_solo_carga_el_contenido_de_las_filas_elegidas(tmp_path):
+    indice = _indice_con_fuente(tmp_path)
+    lector = indice._reader()
+    consultas = []
+
+    class Espia:
+        def execute(self, sql, params=()):
+            consultas.append((sql, list(params)))
+            return lector.execute(sql, params)
+
+    indice._reader = lambda: Espia()
+    assert len(indice.get(where={"fuente": "norma"}, limit=3)["ids"]) == 3
+
+    con_documento = [params for sql, params in consultas if "documento" in sql]
+    assert con_documento == [["c1", "c2", "c4"]]
+
+def test_delete_con_filtro_de_metadatos(tmp_path):
+    indice = _indice_con_fuente(tmp_path)
+    indice.delete(where={"fuente": "manual"})
+    assert indice.count() == 20
+    assert indice.get(where={"fuente": "manual"}, include=[])["ids"] == []
@@ -0,0 +1,54 @@
+import asyncio
+
+import process_pqrs_backlog as backlog
+from app.models import PQRSBatchItem, PQRSResponse, CategoriaPQRS
+
+def _lote(n: int):
+    return [
+        backlog.parse_record({
+            "id": f"r{i}",
+            "tipo": "queja",
+            "categoria": "vias_pavimentos",
+            "titulo": "Hueco en la vía principal",
+            "descripcion": "Hay un hueco grande frente al parque del barrio"
+        }, i, "id")
+        for i in range(n)
+    ]
+
+def _respuesta(pqrs_id: str = "PQRS_1", degradaciones=None) -> PQRSResponse:
+    return PQRSResponse(
+        pqrs_id=pqrs_id,
+        respuesta="Respuesta generada.",
+        confianza=0.8,
+        categoria_detectada=CategoriaPQRS.VIAS_PAVIMENTOS,
+        tiempo_respuesta=0.1,
+        degradaciones=degradaciones or []
+    )
+
+def test_respuestas_degradadas_van_a_errores(monkeypatch):
+    async def generar(solicitudes):
+        yield PQRSBatchItem(indice=0, success=True, respuesta=_respuesta())
+        yield PQRSBatchItem(indice=1, success=True, respuesta=_respuesta(degradaciones=["respuesta_plantilla"]))
+        yield PQRSBatchItem(indice=2, success=True, respuesta=_respuesta(pqrs_id="PQRS_ERROR_1"))
+        yield PQRSBatchItem(indice=3, success=False, error="Error generando respuesta")
+
+    monkeypatch.setattr(backlog.llm_service, "generate_pqrs_batch", generar)
+    filas, errores = asyncio.run(backlog.process_batch(_lote(4), solo_clasificar=False))
+
+    assert [fila["id"] for fila in filas] == ["r0"]
+    assert [error["id"] for error in errores] == ["r1", "r2", "r3"]
+    assert "respuesta_plantilla" in errores[0]["error"]
+
+def test_solo_clasificar_ignora_la_categoria_del_registro(monkeypatch):
+    recibidas = []
+
+    async def clasificar(solicitudes):
+        recibidas.extend(pqrs.categoria for pqrs in solicitudes)
+        return [CategoriaPQRS.ALUMBRADO_PUBLICO for _ in solicitudes]
+
+    monkeypatch.setattr(backlog.llm_service, "classify_pqrs_batch", clasificar)
+    filas, errores = asyncio.run(backlog.process_batch(_lote(2), solo_clasificar=True))
+
+    assert recibidas == [None, None]
+    assert [fila["categoria_detectada"] for fila in filas] == ["alumbrado_publico"] * 2
+    assert errores == []
@@ -0,0 +1,90 @@
+import time
+
+from app.models import PQRSRequest
+from app.services.llm_service import LLMService
+from app.services.vector_store import vector_store
+from app.services.response_cache import SemanticResponseCache, despersonalizar, personalizar
+
+CLAVE = ("pqrs", "vias_pavimentos", "queja", None)
+
+def test_hit_por_encima_del_umbral():
+    cache = SemanticResponseCache(threshold=0.95)
+    cache.store([1.0, 0.0], CLAVE, {"respuesta": "A"}, version=1)
+    cached = cache.lookup([0.99, 0.05], CLAVE, version=1)
+    assert cached["valor"] == {"respuesta": "A"}
+    assert cached["similitud"] >= 0.95
+
+def test_miss_por_debajo_del_umbral_o_con_otra_clave():
+    cache = SemanticResponseCache(threshold=0.95)
+    cache.store([1.0, 0.0], CLAVE, {"respuesta": "A"}, version=1)
+    assert cache.lookup([0.7, 0.7], CLAVE, version=1) is None
+    assert cache.lookup([1.0, 0.0], ("pqrs", "vias_pavimentos", "peticion", None), version=1) is None
+    assert cache.get_stats()["misses"] == 2
+
+def test_entrada_vencida_no_oculta_otra_vigente():
+    cache = SemanticResponseCache(threshold=0.9, ttl=60)
+    cache.store([1.0, 0.0], CLAVE, {"respuesta": "vencida"}, version=1)
+    cache.store([0.95, 0.3], CLAVE, {"respuesta": "vigente"}, version=1)
+    primera = next(iter(cache._entries.values()))
+    primera["creado"] = time.time() - 120
+
+    # La vencida es la más similar a la consulta, pero se descarta antes de comparar
+    cached = cache.lookup([1.0, 0.0], CLAVE, version=1)
+    assert cached["valor"] == {"respuesta": "vigente"}
+    assert cache.get_stats()["entradas"] == 1
+
+def test_cambio_de_version_invalida():
+    cache = SemanticResponseCache()
+    cache.store([1.0, 0.0], CLAVE, {"respuesta": "A"}, version=1)
+    assert cache.lookup([1.0, 0.0], CLAVE, version=2) is None
+    assert cache.get_stats()["invalidaciones"] == 1
+
+def test_desaloja_la_menos_usada():
+    cache = SemanticResponseCache(threshold=0.99, max_size=2)
+    cache.store([1.0, 0.0, 0.0], CLAVE, {"respuesta": "A"}, version=1)
+    cache.store([0.0, 1.0, 0.0], CLAVE, {"respuesta": "B"}, version=1)
+    assert cache.lookup([1.0, 0.0, 0.0], CLAVE, version=1)
+    cache.store([0.0, 0.0, 1.0], CLAVE, {"respuesta": "C"}, version=1)
+    assert cache.lookup([0.0, 1.0, 0.0], CLAVE, version=1) is None
+    assert cache.lookup([1.0, 0.0, 0.0], CLAVE, version=1)["valor"] == {"respuesta": "A"}
+
+def test_personalizar_reemplaza_el_nombre_cacheado():
+    texto = despersonalizar("Estimada Ana María Pérez: Ana, su solicitud fue recibida.", "Ana María Pérez")
+    assert "Ana" not in texto
+    assert personalizar(texto, "Luis Gómez") == "Estimada Luis Gómez: Luis, su solicitud fue recibida."
+
+def _pqrs(ubicacion=None) -> PQRSRequest:
+    return PQRSRequest(
+        tipo="queja",
+        categoria="vias_pavimentos",
+        titulo="Hueco en la vía principal",
+        descripcion="Hay un hueco grande frente al parque del barrio",
+        ubicacion=ubicacion,
+        ciudadano_nombre="Ciudadano de Prueba",
+        ciudadano_email="prueba@medellin.gov.co"
+    )
+
+def test_clave_pqrs_incluye_la_ubicacion_normalizada():
+    servicio = LLMService()
+    clave = lambda pqrs: servicio._cached_pqrs_response(pqrs, [1.0, 0.0], time.time())[0]
+
+    assert clave(_pqrs("Calle 10 # 43-20, Laureles")) == clave(_pqrs("  calle 10  # 43-20, laureles"))
+    assert clave(_pqrs("Calle 10 # 43-20, Laureles")) != clave(_pqrs("Carrera 70, Belén"))
+    assert clave(_pqrs("   ")) == clave(_pqrs())
+
+def test_no_reutiliza_la_respuesta_de_otra_ubicacion():
+    servicio = LLMService()
+    laureles = _pqrs("Laureles")
+    clave, _ = servicio._cached_pqrs_response(laureles, [1.0, 0.0], time.time())
+    servicio.response_cache.store([1.0, 0.0], clave, {
+        "respuesta": "Respuesta para Laureles",
+        "documentos_referencia": [],
+        "confianza": 0.8,
+        "categoria_detectada": "vias_pavimentos",
+        "recomendaciones": []
+    }, vector_store.version)
+
+    _, cached = servicio._cached_pqrs_response(_pqrs("Belén"), [1.0, 0.0], time.time())
+    assert cached is None
+    _, cached = servicio._cached_pqrs_response(_pqrs("laureles"), [1.0, 0.0], time.time())
+    assert cached.respuesta == "Respuesta para Laureles"
@@ -0,0 +1,151 @@
+import json
+import hashlib
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.models import DocumentoBase, CategoriaPQRS
+from app.services.vector_store import VectorStoreService
+
+# Párrafos de ~600 caracteres: con chunk_size=1000 cada uno queda en su propio chunk
+PARRAFOS = [(f"Tramo {i}: " + f"reparación de la calzada del tramo {i} con parcheo y sello de fisuras. " * 8).strip() for i in range(4)]
+
+class ModeloFalso:
+    """Modelo de embeddings determinista que cuenta los textos que codifica"""
+
+    def __init__(self):
+        self.codificados = []
+
+    def encode(self, textos, batch_size=None):
+        self.codificados.extend(textos)
+        return np.array([
+            np.frombuffer(hashlib.sha256(texto.encode("utf-8")).digest()[:16], dtype=np.uint8) / 255.0
+            for texto in textos
+        ], dtype=np.float32)
+
+def _servicio() -> VectorStoreService:
+    servicio = VectorStoreService()
+    servicio._embeddings_model = ModeloFalso()
+    servicio.initialize()
+    return servicio
+
+@pytest.fixture
+def servicio(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "chroma_db_path", str(tmp_path))
+    monkeypatch.setattr(settings, "vector_backend", "numpy")
+    monkeypatch.setattr(settings, "embedding_cache_persist", False)
+    return _servicio()
+
+def _documento(parrafos=PARRAFOS, categoria=CategoriaPQRS.VIAS_PAVIMENTOS, titulo="Manual de vías", **metadatos):
+    return DocumentoBase(titulo=titulo, contenido="\n\n".join(parrafos), categoria=categoria, metadatos=metadatos)
+
+def _ingestar(servicio, documento) -> dict:
+    servicio._embeddings_model.codificados.clear()
+    return servicio.add_documents([documento])["resultados"][0]
+
+def _chunks(servicio, titulo="Manual de vías") -> dict:
+    existentes = servicio.collection.get(where={"titulo": titulo}, include=["documents", "metadatas"])
+    return {m["chunk_index"]: (d, m) for d, m in zip(existentes["documents"], existentes["metadatas"])}
+
+def test_ingesta_nueva(servicio):
+    resultado = _ingestar(servicio, _documento())
+
+    assert (resultado["estado"], resultado["chunks"], resultado["reembebidos"]) == ("nuevo", 4, 4)
+    assert len(servicio._embeddings_model.codificados) == 4
+    assert sorted(_chunks(servicio)) == [0, 1, 2, 3]
+    assert servicio.kb_stats.get_stats()["chunks"] == 4
+    assert servicio.lexical_index.get_stats()["chunks"] == 4
+
+def test_reingesta_identica_no_escribe(servicio):
+    _ingestar(servicio, _documento())
+    version = servicio.version
+
+    resultado = _ingestar(servicio, _documento())
+    assert (resultado["estado"], resultado["chunks"]) == ("sin_cambios", 4)
+    assert servicio._embeddings_model.codificados == []
+    assert servicio.version == version
+
+def test_reingesta_reembebe_solo_los_chunks_modificados(servicio):
+    _ingestar(servicio, _documento())
+    editados = list(PARRAFOS)
+    editados[2] = editados[2].replace("parcheo", "fresado")
+
+    resultado = _ingestar(servicio, _documento(editados))
+    assert resultado["estado"] == "actualizado"
+    assert (resultado["reembebidos"], resultado["reutilizados"], resultado["eliminados"]) == (1, 3, 0)
+    assert servicio._embeddings_model.codificados == [editados[2]]
+    assert _chunks(servicio)[2][0] == editados[2]
+
+def test_version_mas_corta_elimina_chunks_sobrantes(servicio):
+    _ingestar(servicio, _documento())
+
+    resultado = _ingestar(servicio, _documento(PARRAFOS[:2]))
+    assert (resultado["chunks"], resultado["reembebidos"], resultado["eliminados"]) == (2, 0, 2)
+    assert sorted(_chunks(servicio)) == [0, 1]
+    assert servicio.collection.count() == 2
+    assert servicio.kb_stats.get_stats()["chunks"] == 2
+    assert servicio.lexical_index.get_stats()["chunks"] == 2
+
+def test_cambio_de_metadatos_no_reembebe(servicio):
+    _ingestar(servicio, _documento())
+
+    resultado = _ingestar(servicio, _documento(categoria=CategoriaPQRS.SENALIZACION, fuente="manual"))
+    assert (resultado["estado"], resultado["reembebidos"], resultado["reutilizados"]) == ("actualizado", 0, 4)
+    assert servicio._embeddings_model.codificados == []
+    metadatas = [m for _, m in _chunks(servicio).values()]
+    assert {m["categoria"] for m in metadatas} == {"senalizacion"}
+    assert {m["fuente"] for m in metadatas} == {"manual"}
+
+def test_eliminar_por_titulo(servicio):
+    _ingestar(servicio, _documento())
+    _ingestar(servicio, _documento(PARRAFOS[:1], titulo="Otro manual"))
+
+    resultado = servicio.delete_documents(titulo="Manual de vías")
+    assert (resultado["success"], resultado["eliminados"]) == (True, 4)
+    assert servicio.collection.count() == 1
+    assert servicio.manifest.get("Manual de vías") is None
+    assert servicio.manifest.get("Otro manual") is not None
+    assert servicio.kb_stats.get_stats()["chunks"] == 1
+    assert servicio.lexical_index.get_stats()["chunks"] == 1
+
+    # Tras eliminarlo, volver a ingestarlo es una ingesta nueva
+    assert _ingestar(servicio, _documento())["estado"] == "nuevo"
+
+def test_eliminar_por_paginas(servicio):
+    _ingestar(servicio, _documento())
+    resultado = servicio.delete_documents(categoria=CategoriaPQRS.VIAS_PAVIMENTOS, page_size=3)
+    assert resultado["eliminados"] == 4
+    assert servicio.collection.count() == 0
+
+def test_eliminar_sin_filtro_falla(servicio):
+    _ingestar(servicio, _documento())
+    assert not servicio.delete_documents()["success"]
+    assert servicio.collection.count() == 4
+
+def test_eliminar_por_campo_de_chunk_verifica_contra_la_coleccion(servicio):
+    _ingestar(servicio, _documento())
+    assert servicio.delete_documents(where={"chunk_index": 3})["eliminados"] == 1
+    assert not servicio.manifest.complete
+
+    # El estado previo se reconstruye desde la colección: solo falta el chunk borrado
+    resultado = _ingestar(servicio, _documento())
+    assert (resultado["estado"], resultado["reembebidos"], resultado["reutilizados"]) == ("actualizado", 1, 3)
+    assert servicio._embeddings_model.codificados == [PARRAFOS[3]]
+    assert servicio.collection.count() == 4
+
+def test_clear_collection(servicio):
+    _ingestar(servicio, _documento())
+    resultado = servicio.clear_collection()
+    assert (resultado["success"], resultado["eliminados"]) == (True, 4)
+    assert servicio.collection.count() == 0
+    assert servicio.kb_stats.get_stats()["chunks"] == 0
+    assert _ingestar(servicio, _documento())["estado"] == "nuevo"
+
+def test_revision_persistida_sobrevive_al_reinicio(servicio, tmp_path):
+    _ingestar(servicio, _documento())
+    servicio.delete_documents(where={"chunk_index": 0})
+    version = servicio.version
+    assert json.loads((tmp_path / "revision.json").read_text())["revision"] == version
+
+    assert _servicio().version == version